@@ -1,20 +1,86 @@
 
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, make_response, send_file
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, make_response, send_file, g, has_request_context, abort
+from flask import before_render_template, template_rendered, stream_template
+from flask.templating import Environment as FlaskEnvironment
+from jinja2 import FileSystemBytecodeCache
+import atexit
+import click
+import hashlib
+import json
+import mimetypes
+import queue
 import sqlite3
+import re
+import threading
+import time
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 import os
+import posixpath
+from concurrent.futures import Future
 from functools import wraps
-import qrcode
-from io import BytesIO
-import base64
 from zoneinfo import ZoneInfo
-from werkzeug.utils import secure_filename
+from werkzeug.utils import secure_filename, safe_join
+import zlib
+
+from models import Address, Order, OrderItem, Payment, Product
+import postal
+
+try:
+    import brotli
+except ImportError:  # brotli เป็น optional dependency
+    brotli = None
+
+
+class TimedEnvironment(FlaskEnvironment):
+    """Jinja environment ที่จับเวลา compile ของแต่ละ template (bytecode cache hit จะไม่ผ่านตรงนี้)"""
+
+    def compile(self, source, name=None, filename=None, raw=False, defer_init=False):
+        start = time.perf_counter()
+        try:
+            return super().compile(source, name, filename, raw, defer_init)
+        finally:
+            if name and not raw:
+                record_template_time(name, 'compile', (time.perf_counter() - start) * 1000)
+
 
 app = Flask(__name__)
+app.jinja_environment = TimedEnvironment
 app.secret_key = "sweetdreams_bakery_secret_2024"
 app.permanent_session_lifetime = timedelta(days=7)
-DB_NAME = "bakery.db"
+DB_NAME = os.environ.get("BAKERY_DB", "bakery.db")
+
+# SQL profiler: เปิดด้วย BAKERY_SQL_PROFILE=1, log คำสั่งที่ช้ากว่า BAKERY_SLOW_QUERY_MS
+app.config['SQL_PROFILE'] = os.environ.get('BAKERY_SQL_PROFILE') == '1'
+app.config['SLOW_QUERY_MS'] = float(os.environ.get('BAKERY_SLOW_QUERY_MS', 50))
+# Jinja bytecode cache ถาวร (ตั้ง BAKERY_JINJA_CACHE_DIR= ว่างเพื่อปิด) และ warmup ตอนบูต worker
+app.config['JINJA_CACHE_DIR'] = os.environ.get('BAKERY_JINJA_CACHE_DIR', os.path.join(app.root_path, '.jinja_cache'))
+app.config['WARMUP_ON_START'] = os.environ.get('BAKERY_WARMUP', '1') == '1'
+# บีบอัด response (gzip/brotli) ปิดด้วย BAKERY_COMPRESS=0 เช่นเมื่อ nginx บีบให้อยู่แล้ว
+app.config['COMPRESS'] = os.environ.get('BAKERY_COMPRESS', '1') == '1'
+app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('BAKERY_COMPRESS_MIN_SIZE', 500))
+app.config['COMPRESS_LEVEL'] = int(os.environ.get('BAKERY_COMPRESS_LEVEL', 6))
+app.config['COMPRESS_BROTLI_QUALITY'] = int(os.environ.get('BAKERY_COMPRESS_BROTLI_QUALITY', 4))
+# ส่งไฟล์สลิปผ่าน web server: BAKERY_X_SENDFILE=1 (Apache/lighttpd) หรือ
+# BAKERY_SLIP_ACCEL_REDIRECT=/_slips/ (nginx internal location ที่ alias ไปยัง uploads/slips/)
+app.config['USE_X_SENDFILE'] = os.environ.get('BAKERY_X_SENDFILE') == '1'
+app.config['SLIP_ACCEL_REDIRECT'] = os.environ.get('BAKERY_SLIP_ACCEL_REDIRECT', '')
+# ฐานข้อมูล archive ของคำสั่งซื้อที่ปิดแล้ว (attach ตอนดูประวัติ) และอายุขั้นต่ำก่อนย้าย
+app.config['ARCHIVE_DB'] = os.environ.get('BAKERY_ARCHIVE_DB', os.path.splitext(DB_NAME)[0] + '_archive.db')
+app.config['ARCHIVE_AFTER_DAYS'] = int(os.environ.get('BAKERY_ARCHIVE_AFTER_DAYS', 180))
+# write queue: writer thread เดียวต่อ process รวมหลาย write unit ต่อ transaction (group commit)
+app.config['WRITE_QUEUE'] = os.environ.get('BAKERY_WRITE_QUEUE') == '1'
+app.config['WRITE_QUEUE_MAX_BATCH'] = int(os.environ.get('BAKERY_WRITE_QUEUE_MAX_BATCH', 64))
+app.config['WRITE_QUEUE_MAX_DELAY_MS'] = float(os.environ.get('BAKERY_WRITE_QUEUE_MAX_DELAY_MS', 2))
+app.config['WRITE_QUEUE_TIMEOUT'] = float(os.environ.get('BAKERY_WRITE_QUEUE_TIMEOUT', 30))
+# connection อ่านอย่างเดียวของหน้าร้าน: BAKERY_READ_DB ชี้ไปสำเนาที่ replicate ได้ (ว่าง = ใช้ DB_NAME)
+app.config['READ_DB'] = os.environ.get('BAKERY_READ_DB', '')
+app.config['READ_POOL_SIZE'] = int(os.environ.get('BAKERY_READ_POOL_SIZE', 8))
+# โฟลเดอร์เก็บ snapshot จาก flask backup-db
+app.config['BACKUP_DIR'] = os.environ.get('BAKERY_BACKUP_DIR', os.path.join(app.root_path, 'backups'))
+# ข้อมูลรหัสไปรษณีย์ (postal_code,district,province) สำหรับ typeahead และตรวจที่อยู่ (ดู postal.py)
+app.config['POSTAL_DATA'] = os.environ.get('BAKERY_POSTAL_DATA', os.path.join(app.root_path, 'data', 'thai_postal_codes.csv'))
 
 @app.template_filter('to_bangkok')
 def to_bangkok_filter(value, fmt='%d/%m/%Y %H:%M'):
@@ -68,7 +134,7 @@ def init_db():
         name TEXT NOT NULL,
         name_en TEXT,
         description TEXT,
-        price DECIMAL(10,2) NOT NULL,
+        price INTEGER NOT NULL,  -- สตางค์
         image TEXT,
         category_id INTEGER,
         is_available BOOLEAN DEFAULT 1,
@@ -83,7 +149,7 @@ def init_db():
     CREATE TABLE IF NOT EXISTS orders (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         user_id INTEGER,
-        total_amount DECIMAL(10,2) NOT NULL,
+        total_amount INTEGER NOT NULL,  -- สตางค์
         status TEXT DEFAULT 'pending',
         customer_name TEXT NOT NULL,
         customer_phone TEXT NOT NULL,
@@ -103,8 +169,8 @@ def init_db():
         order_id INTEGER,
         product_id INTEGER,
         quantity INTEGER NOT NULL,
-        unit_price DECIMAL(10,2) NOT NULL,
-        total_price DECIMAL(10,2) NOT NULL,
+        unit_price INTEGER NOT NULL,  -- สตางค์
+        total_price INTEGER NOT NULL,  -- สตางค์
         options TEXT,
         FOREIGN KEY (order_id) REFERENCES orders (id),
         FOREIGN KEY (product_id) REFERENCES products (id)
@@ -116,7 +182,7 @@ def init_db():
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     order_id INTEGER NOT NULL,
     payment_method TEXT NOT NULL,
-    amount DECIMAL(10,2) NOT NULL,
+    amount INTEGER NOT NULL,  -- สตางค์
     status TEXT DEFAULT 'pending',
     slip_image TEXT,
     paid_at TIMESTAMP,
@@ -211,16 +277,16 @@ def seed_products():
     cursor.execute("SELECT id, name FROM categories")
     categories = {name: id for id, name in cursor.fetchall()}
     products = [
-        # name, name_en, description, price, image, category_id, is_available, is_featured, stock_quantity
-        ("เค้กช็อกโกแลต", "Chocolate Cake", "เค้กช็อกโกแลตเข้มข้น", 120, "chocolate_cake.jpg", categories.get("เค้ก"), 1, 1, 10),
-        ("ขนมปังฝรั่งเศส", "Baguette", "ขนมปังฝรั่งเศสอบสด", 60, "baguette.jpg", categories.get("ขนมปัง"), 1, 0, 15),
-        ("ลาเต้เย็น", "Iced Latte", "กาแฟลาเต้เย็นหอมกรุ่น", 65, "iced_latte.jpg", categories.get("เครื่องดื่ม"), 1, 1, 20),
-        ("บราวนี่", "Brownie", "บราวนี่ช็อกโกแลตเข้มข้น", 55, "brownie.jpg", categories.get("ขนมหวาน"), 1, 0, 12),
-        ("เค้กส้ม", "Orange Cake", "เค้กส้มสดใหม่", 110, "orange_cake.jpg", categories.get("เค้ก"), 1, 1, 8),
-        ("ครัวซองต์", "Croissant", "ครัวซองต์เนยสด", 45, "croissant.jpg", categories.get("ขนมปัง"), 1, 0, 18),
-        ("ชาเขียวเย็น", "Iced Green Tea", "ชาเขียวเย็นสูตรพิเศษ", 55, "iced_greentea.jpg", categories.get("เครื่องดื่ม"), 1, 0, 25),
-        ("มาการอง", "Macaron", "มาการองหลากรส", 35, "macaron.jpg", categories.get("ขนมหวาน"), 1, 0, 30),
-        ("เค้กเรดเวลเวท", "Red Velvet Cake", "เค้กเรดเวลเวทเนื้อนุ่ม", 130, "red_velvet.jpg", categories.get("เค้ก"), 1, 1, 7),
+        # name, name_en, description, price (สตางค์), image, category_id, is_available, is_featured, stock_quantity
+        ("เค้กช็อกโกแลต", "Chocolate Cake", "เค้กช็อกโกแลตเข้มข้น", 12000, "chocolate_cake.jpg", categories.get("เค้ก"), 1, 1, 10),
+        ("ขนมปังฝรั่งเศส", "Baguette", "ขนมปังฝรั่งเศสอบสด", 6000, "baguette.jpg", categories.get("ขนมปัง"), 1, 0, 15),
+        ("ลาเต้เย็น", "Iced Latte", "กาแฟลาเต้เย็นหอมกรุ่น", 6500, "iced_latte.jpg", categories.get("เครื่องดื่ม"), 1, 1, 20),
+        ("บราวนี่", "Brownie", "บราวนี่ช็อกโกแลตเข้มข้น", 5500, "brownie.jpg", categories.get("ขนมหวาน"), 1, 0, 12),
+        ("เค้กส้ม", "Orange Cake", "เค้กส้มสดใหม่", 11000, "orange_cake.jpg", categories.get("เค้ก"), 1, 1, 8),
+        ("ครัวซองต์", "Croissant", "ครัวซองต์เนยสด", 4500, "croissant.jpg", categories.get("ขนมปัง"), 1, 0, 18),
+        ("ชาเขียวเย็น", "Iced Green Tea", "ชาเขียวเย็นสูตรพิเศษ", 5500, "iced_greentea.jpg", categories.get("เครื่องดื่ม"), 1, 0, 25),
+        ("มาการอง", "Macaron", "มาการองหลากรส", 3500, "macaron.jpg", categories.get("ขนมหวาน"), 1, 0, 30),
+        ("เค้กเรดเวลเวท", "Red Velvet Cake", "เค้กเรดเวลเวทเนื้อนุ่ม", 13000, "red_velvet.jpg", categories.get("เค้ก"), 1, 1, 7),
     ]
     for product in products:
         # ตรวจสอบก่อน insert ว่ามีชื่อซ้ำหรือยัง
@@ -255,7 +321,378 @@ def create_default_images_folder():
         os.makedirs(images_path, exist_ok=True)
         print(f"Created images folder: {images_path}")
 
-UPLOAD_FOLDER1 = 'static/uploads/slips'
+# ========================
+# Schema Version & Migrations
+# ========================
+
+# migration ที่เพิ่มหลัง schema แรกของ init_db(): {version: function(conn)}
+# เวอร์ชันเก็บใน PRAGMA user_version ของไฟล์ฐานข้อมูล
+MIGRATIONS = {}
+
+def migration(version):
+    def decorator(f):
+        MIGRATIONS[version] = f
+        return f
+    return decorator
+
+def latest_schema_version():
+    return max(MIGRATIONS, default=1)
+
+def get_schema_version():
+    conn = sqlite3.connect(DB_NAME)
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    conn.close()
+    return version
+
+def enable_wal():
+    """journal_mode=WAL (ค่าติดกับไฟล์): ผู้อ่านกับผู้เขียนไม่บล็อกกัน และ backup-db อ่าน snapshot เดียวโดยไม่ต้องเริ่มใหม่"""
+    conn = sqlite3.connect(DB_NAME)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.close()
+
+def setup_database(force=False):
+    """สร้าง/อัปเกรด schema และข้อมูลเริ่มต้น ข้ามทั้งหมดถ้า schema_version เป็นปัจจุบันแล้ว"""
+    enable_wal()
+    version = get_schema_version()
+    target = latest_schema_version()
+    if version >= target and not force:
+        setup_archive()  # ไฟล์ archive อาจเพิ่งถูกย้าย/ตั้งค่าใหม่ แม้ schema หลักเป็นปัจจุบันแล้ว
+        return False
+
+    init_db()
+    conn = sqlite3.connect(DB_NAME)
+    try:
+        for v in sorted(MIGRATIONS):
+            if v > version:
+                MIGRATIONS[v](conn)
+                conn.execute(f"PRAGMA user_version = {int(v)}")
+                conn.commit()
+        conn.execute(f"PRAGMA user_version = {int(max(version, target))}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    setup_archive()
+    if version < 11:
+        # migration 11 สร้าง slip_hashes ว่าง hash สลิปที่อัปโหลดไว้ก่อนหน้าทันที (รันซ้ำด้วย flask hash-slips ได้)
+        conn = get_db_connection(with_archive=True)
+        try:
+            backfill_slip_hashes(conn)
+        finally:
+            conn.close()
+
+    seed_categories()
+    seed_products()
+    create_admin_user()
+    create_default_images_folder()
+    return True
+
+@migration(2)
+def add_listing_indexes(conn):
+    """index สำหรับหน้ารายการแอดมินที่เรียงตามเวลาและ subquery ราย order"""
+    conn.executescript("""
+        CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders(created_at);
+        CREATE INDEX IF NOT EXISTS idx_orders_user_created ON orders(user_id, created_at);
+        CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items(order_id);
+        CREATE INDEX IF NOT EXISTS idx_payments_order_id ON payments(order_id);
+        CREATE INDEX IF NOT EXISTS idx_payments_paid_at ON payments(paid_at);
+    """)
+
+@migration(3)
+def add_catalog_versioning(conn):
+    """products.updated_at สำหรับ Last-Modified และเลข version ของแคตตาล็อกที่ trigger เพิ่มให้ทุกครั้งที่แก้"""
+    conn.executescript("""
+        ALTER TABLE products ADD COLUMN updated_at TIMESTAMP;
+        UPDATE products SET updated_at = created_at;
+
+        CREATE TABLE IF NOT EXISTS catalog_meta (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL DEFAULT 1,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        INSERT OR IGNORE INTO catalog_meta (id) VALUES (1);
+    """)
+    for table in ('products', 'categories'):
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_catalog_version
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE catalog_meta SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+                END
+            """)
+
+@migration(4)
+def add_product_image_store(conn):
+    """เก็บรูปสินค้าตาม hash ของเนื้อไฟล์ + refcount ที่ trigger ดูแลจากคอลัมน์ products.image"""
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS product_images (
+            content_hash TEXT PRIMARY KEY,
+            filename TEXT UNIQUE NOT NULL,
+            size_bytes INTEGER NOT NULL,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TRIGGER IF NOT EXISTS trg_products_image_insert
+        AFTER INSERT ON products WHEN NEW.image IS NOT NULL
+        BEGIN
+            UPDATE product_images SET refcount = refcount + 1 WHERE filename = NEW.image;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_products_image_update
+        AFTER UPDATE OF image ON products WHEN NEW.image IS NOT OLD.image
+        BEGIN
+            UPDATE product_images SET refcount = refcount - 1 WHERE filename = OLD.image;
+            UPDATE product_images SET refcount = refcount + 1 WHERE filename = NEW.image;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_products_image_delete
+        AFTER DELETE ON products WHEN OLD.image IS NOT NULL
+        BEGIN
+            UPDATE product_images SET refcount = refcount - 1 WHERE filename = OLD.image;
+        END;
+    """)
+    rehash_product_images(conn)
+
+@migration(5)
+def add_slip_image_index(conn):
+    """ตรวจสิทธิ์ดูสลิปด้วยชื่อไฟล์ใน query เดียว และย้ายสลิปเดิมออกจาก static/"""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_payments_slip_image ON payments(slip_image)")
+    move_legacy_slips()
+
+@migration(6)
+def add_orderable_flag(conn):
+    """products.is_orderable = เปิดขาย และมีสต็อก ดูแลด้วย trigger ให้ตรงกับ stock_quantity เสมอ"""
+    conn.executescript("""
+        ALTER TABLE products ADD COLUMN is_orderable INTEGER NOT NULL DEFAULT 0;
+        UPDATE products SET is_orderable = (is_available = 1 AND stock_quantity > 0);
+
+        CREATE TRIGGER IF NOT EXISTS trg_products_orderable_insert
+        AFTER INSERT ON products
+        BEGIN
+            UPDATE products SET is_orderable = (NEW.is_available = 1 AND NEW.stock_quantity > 0)
+            WHERE id = NEW.id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_products_orderable_update
+        AFTER UPDATE OF is_available, stock_quantity ON products
+        WHEN NEW.is_orderable IS NOT (NEW.is_available = 1 AND NEW.stock_quantity > 0)
+        BEGIN
+            UPDATE products SET is_orderable = (NEW.is_available = 1 AND NEW.stock_quantity > 0)
+            WHERE id = NEW.id;
+        END;
+
+        -- หน้าร้านอ่านเฉพาะสินค้าที่สั่งได้, หน้าสต็อกต่ำอ่านตามจำนวนคงเหลือ
+        CREATE INDEX IF NOT EXISTS idx_products_orderable_category
+            ON products(category_id, created_at) WHERE is_orderable = 1;
+        CREATE INDEX IF NOT EXISTS idx_products_orderable_stock
+            ON products(stock_quantity) WHERE is_orderable = 1;
+        CREATE INDEX IF NOT EXISTS idx_products_sold_out
+            ON products(updated_at) WHERE is_available = 1 AND is_orderable = 0;
+    """)
+
+@migration(7)
+def add_inventory_ledger(conn):
+    """บัญชีสต็อกแบบเพิ่มแถวอย่างเดียว + snapshot, products.stock_quantity เป็น cache ที่ trigger บวกให้"""
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS inventory_movements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER NOT NULL,
+            delta INTEGER NOT NULL,
+            reason TEXT NOT NULL CHECK (reason IN ('sale', 'cancel', 'restock', 'adjustment')),
+            order_id INTEGER,
+            user_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (product_id) REFERENCES products (id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_inventory_movements_product ON inventory_movements(product_id, id);
+
+        -- ยอดคงเหลือ ณ movement ล่าสุดที่รวมแล้ว: สต็อกปัจจุบัน = snapshot ล่าสุด + movement หลังจากนั้น
+        CREATE TABLE IF NOT EXISTS inventory_snapshots (
+            product_id INTEGER NOT NULL,
+            last_movement_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            taken_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (product_id, last_movement_id)
+        ) WITHOUT ROWID;
+
+        INSERT OR IGNORE INTO inventory_snapshots (product_id, last_movement_id, quantity)
+        SELECT id, 0, COALESCE(stock_quantity, 0) FROM products;
+
+        CREATE TRIGGER IF NOT EXISTS trg_products_opening_snapshot
+        AFTER INSERT ON products
+        BEGIN
+            INSERT OR IGNORE INTO inventory_snapshots (product_id, last_movement_id, quantity)
+            VALUES (NEW.id, (SELECT COALESCE(MAX(id), 0) FROM inventory_movements), COALESCE(NEW.stock_quantity, 0));
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_inventory_movements_apply
+        AFTER INSERT ON inventory_movements
+        BEGIN
+            UPDATE products
+            SET stock_quantity = stock_quantity + NEW.delta,
+                updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now')
+            WHERE id = NEW.product_id;
+        END;
+
+        CREATE VIEW IF NOT EXISTS inventory_levels AS
+        SELECT s.product_id,
+               s.quantity + COALESCE((SELECT SUM(m.delta) FROM inventory_movements m
+                                      WHERE m.product_id = s.product_id AND m.id > s.last_movement_id), 0) AS quantity,
+               s.last_movement_id AS snapshot_movement_id,
+               (SELECT COUNT(*) FROM inventory_movements m
+                WHERE m.product_id = s.product_id AND m.id > s.last_movement_id) AS tail_length
+        FROM inventory_snapshots s
+        WHERE s.last_movement_id = (SELECT MAX(last_movement_id) FROM inventory_snapshots
+                                    WHERE product_id = s.product_id);
+    """)
+
+@migration(8)
+def delete_orphaned_order_rows(conn):
+    """ลบ order_items/payments ที่ค้างจาก delete_order เวอร์ชันเก่า (ลบแค่ orders)"""
+    conn.executescript("""
+        DELETE FROM order_items WHERE order_id NOT IN (SELECT id FROM orders);
+        DELETE FROM payments WHERE order_id NOT IN (SELECT id FROM orders);
+    """)
+
+# คอลัมน์เงินทั้งหมดเก็บเป็นจำนวนเต็มสตางค์ (ใช้ทั้งกับฐานหลักและไฟล์ archive)
+MONEY_COLUMNS = {
+    'products': ('price',),
+    'orders': ('total_amount',),
+    'order_items': ('unit_price', 'total_price'),
+    'payments': ('amount',),
+}
+
+def convert_money_to_satang(conn, schema='main'):
+    """แปลงคอลัมน์เงินที่เก็บเป็นบาท (REAL/NUMERIC) เป็นสตางค์ ปัดครึ่งขึ้นที่ทศนิยมตำแหน่งที่ 2"""
+    for table, columns in MONEY_COLUMNS.items():
+        if not table_columns(conn, schema, table):
+            continue
+        assignments = ', '.join(f"{c} = CAST(ROUND({c} * 100) AS INTEGER)" for c in columns)
+        conn.execute(f"UPDATE {schema}.{table} SET {assignments}")
+
+@migration(9)
+def store_money_as_satang(conn):
+    """ราคา/ยอดเงินเป็นจำนวนเต็มสตางค์ บวกลบและ SUM ได้ค่าตรงเสมอ (แปลงเป็นบาทตอนแสดงผลเท่านั้น)"""
+    convert_money_to_satang(conn)
+
+PICKUP_ADDRESS = "รับที่ร้าน Sweet Dreams Bakery"
+SHIPPING_COLUMNS = ('ship_recipient_name', 'ship_phone', 'ship_address', 'ship_city', 'ship_province',
+                    'ship_postal_code')
+
+def parse_legacy_address(text):
+    """แยก customer_address รูปแบบเดิม 'ผู้รับ, ที่อยู่, อำเภอ, รหัสไปรษณีย์, จังหวัด' เป็น snapshot
+
+    ที่อยู่อาจมี ', ' อยู่ข้างใน จึงยึดส่วนแรกและสามส่วนท้าย ข้อความที่ไม่ตรงรูปแบบเก็บทั้งก้อนเป็น ship_address
+    """
+    parts = [part.strip() for part in text.split(', ')]
+    if len(parts) < 5:
+        return {'ship_address': text}
+    return {
+        'ship_recipient_name': parts[0] or None,
+        'ship_address': ', '.join(parts[1:-3]) or None,
+        'ship_city': parts[-3] or None,
+        'ship_postal_code': parts[-2] or None,
+        'ship_province': parts[-1] or None,
+    }
+
+def backfill_order_addresses(conn, schema='main'):
+    """เติม snapshot ที่อยู่ของคำสั่งซื้อเก่าจาก customer_address และจับคู่ address_id กับสมุดที่อยู่ที่ข้อความตรงกัน"""
+    rows = conn.execute(f"""
+        SELECT id, customer_address FROM {schema}.orders
+        WHERE ship_address IS NULL AND delivery_method = 'delivery'
+          AND customer_address IS NOT NULL AND customer_address NOT IN ('', ?)
+    """, (PICKUP_ADDRESS,)).fetchall()
+    assignments = ', '.join(f"{c} = :{c}" for c in SHIPPING_COLUMNS)
+    conn.executemany(
+        f"UPDATE {schema}.orders SET {assignments} WHERE id = :id",
+        [dict(dict.fromkeys(SHIPPING_COLUMNS), id=row[0], **parse_legacy_address(row[1])) for row in rows])
+    conn.execute(f"""
+        UPDATE {schema}.orders SET address_id = (
+            SELECT a.id FROM main.addresses a
+            WHERE a.user_id = {schema}.orders.user_id
+              AND a.recipient_name || ', ' || a.address || ', ' || COALESCE(a.city, '') || ', ' ||
+                  COALESCE(a.postal_code, '') || ', ' || COALESCE(a.province, '') = {schema}.orders.customer_address
+            ORDER BY a.id DESC LIMIT 1)
+        WHERE address_id IS NULL AND ship_address IS NOT NULL
+    """)
+    return len(rows)
+
+@migration(10)
+def add_order_address_snapshot(conn):
+    """orders เก็บ address_id และสำเนาที่อยู่ ณ ตอนสั่ง หน้าแสดงคำสั่งซื้อไม่ต้อง query สมุดที่อยู่อีก"""
+    conn.execute("ALTER TABLE orders ADD COLUMN address_id INTEGER REFERENCES addresses(id)")
+    for column in SHIPPING_COLUMNS:
+        conn.execute(f"ALTER TABLE orders ADD COLUMN {column} TEXT")
+    backfill_order_addresses(conn)
+
+@migration(11)
+def add_slip_hash_index(conn):
+    """sha256 + dHash ของสลิปทุกไฟล์ + index ราย band สำหรับหาสลิปที่คล้ายกัน และ flag บน payments
+    สลิปที่มีอยู่แล้ว setup_database hash ต่อให้ทันทีหลัง migration นี้ (backfill_slip_hashes)"""
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS slip_hashes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT UNIQUE NOT NULL,
+            order_id INTEGER,
+            content_hash TEXT NOT NULL,
+            dhash BLOB NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE INDEX IF NOT EXISTS idx_slip_hashes_content_hash ON slip_hashes(content_hash);
+
+        CREATE TABLE IF NOT EXISTS slip_hash_bands (
+            band_key INTEGER NOT NULL,
+            slip_id INTEGER NOT NULL,
+            PRIMARY KEY (band_key, slip_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_slip_hash_bands_slip_id ON slip_hash_bands(slip_id);
+
+        ALTER TABLE payments ADD COLUMN slip_duplicate_order_id INTEGER;
+        ALTER TABLE payments ADD COLUMN slip_duplicate_distance INTEGER;
+    """)
+
+@migration(12)
+def add_production_plan(conn):
+    """ยอดขายรายวันที่รวมแล้ว + แผนการอบที่คำนวณรายคืน (ดู planning.py)"""
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS daily_product_sales (
+            product_id INTEGER NOT NULL,
+            sales_date TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            PRIMARY KEY (product_id, sales_date)
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS production_plan (
+            product_id INTEGER NOT NULL,
+            plan_date TEXT NOT NULL,
+            forecast REAL NOT NULL,
+            quantity INTEGER NOT NULL,
+            moving_average REAL NOT NULL,
+            seasonality REAL NOT NULL,
+            computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (plan_date, product_id)
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS planning_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            through_date TEXT,
+            aggregated_from TEXT,
+            products INTEGER NOT NULL,
+            horizon INTEGER NOT NULL,
+            window_days INTEGER NOT NULL,
+            elapsed_ms REAL NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+# สลิปเก็บนอก static/ ให้เข้าถึงได้เฉพาะผ่าน /slips/ ที่ตรวจสิทธิ์
+UPLOAD_FOLDER1 = 'uploads/slips'
+LEGACY_SLIP_FOLDER = 'static/uploads/slips'
 UPLOAD_FOLDER2 = 'static/images/products'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 MAX_FILE_SIZE = 2 * 1024 * 1024 
@@ -263,6 +700,90 @@ MAX_FILE_SIZE = 2 * 1024 * 1024
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# ========================
+# Product Image Store (content-addressed)
+# ========================
+
+# ชื่อไฟล์ = sha256 ของเนื้อไฟล์ (32 ตัวแรก) ไฟล์เดียวกันเก็บครั้งเดียว และ URL ไม่มีวันเปลี่ยนเนื้อหา
+HASHED_IMAGE_RE = re.compile(r'^[0-9a-f]{32}\.(png|jpg|gif)$')
+
+def normalize_image_extension(filename):
+    ext = filename.rsplit('.', 1)[1].lower()
+    return 'jpg' if ext == 'jpeg' else ext
+
+def store_product_image(conn, data, ext):
+    """เก็บรูปตาม hash คืนชื่อไฟล์ ถ้ามีไฟล์เนื้อหาเดียวกันอยู่แล้วใช้ไฟล์เดิม
+
+    refcount เพิ่มเองผ่าน trigger เมื่อ products.image ชี้มาที่ไฟล์นี้ (ต้อง commit ใน transaction เดียวกัน)
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    filename = f"{digest[:32]}.{ext}"
+    conn.execute("""
+        INSERT OR IGNORE INTO product_images (content_hash, filename, size_bytes) VALUES (?, ?, ?)
+    """, (digest, filename, len(data)))
+    filename = conn.execute("SELECT filename FROM product_images WHERE content_hash = ?",
+                            (digest,)).fetchone()[0]
+    path = os.path.join(UPLOAD_FOLDER2, filename)
+    if not os.path.exists(path):
+        os.makedirs(UPLOAD_FOLDER2, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return filename
+
+def save_product_image(conn, image_file):
+    """รับไฟล์จากฟอร์ม คืนชื่อไฟล์ที่เก็บแล้ว หรือ None ถ้าไม่มีไฟล์/นามสกุลไม่อนุญาต"""
+    if not image_file or not allowed_file(image_file.filename):
+        return None
+    return store_product_image(conn, image_file.read(), normalize_image_extension(image_file.filename))
+
+def rehash_product_images(conn):
+    """ย้ายรูปที่ products อ้างถึงด้วยชื่อเดิมเข้า store ตาม hash และอัปเดต products.image
+
+    ไฟล์ชื่อเดิมไม่ถูกลบ (ฐานข้อมูลอื่นอาจยังอ้างอยู่) ใช้ `flask rehash-images --prune` เพื่อลบ
+    """
+    renamed = 0
+    rows = conn.execute("SELECT DISTINCT image FROM products WHERE image IS NOT NULL AND image != ''").fetchall()
+    for (image,) in rows:
+        path = os.path.join(UPLOAD_FOLDER2, image)
+        if HASHED_IMAGE_RE.match(image) or '.' not in image or not os.path.isfile(path):
+            continue
+        with open(path, 'rb') as f:
+            filename = store_product_image(conn, f.read(), normalize_image_extension(image))
+        conn.execute("""
+            UPDATE products SET image = ?, updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE image = ?
+        """, (filename, image))
+        renamed += 1
+    return renamed
+
+def prune_product_images(conn):
+    """ลบรูปที่ refcount เป็น 0 และไฟล์ชื่อเดิมที่ไม่มีสินค้าอ้างถึงแล้ว คืนรายชื่อไฟล์ที่ลบ"""
+    removed = [row[0] for row in conn.execute(
+        "DELETE FROM product_images WHERE refcount <= 0 RETURNING filename"
+    ).fetchall()]
+    conn.commit()
+    referenced = {row[0] for row in conn.execute("SELECT DISTINCT image FROM products WHERE image IS NOT NULL")}
+    stored = {row[0] for row in conn.execute("SELECT filename FROM product_images")}
+    if os.path.isdir(UPLOAD_FOLDER2):
+        for name in os.listdir(UPLOAD_FOLDER2):
+            if name not in referenced and name not in stored and name not in removed:
+                removed.append(name)
+    for name in removed:
+        path = os.path.join(UPLOAD_FOLDER2, name)
+        if os.path.isfile(path):
+            os.remove(path)
+    return removed
+
+def attach_payment_slip(conn, order_id, filename, fingerprint=None):
+    """write unit: ผูกสลิปกับ payment และรอตรวจสอบ (พร้อม flag ถ้าสลิปคล้ายของคำสั่งซื้ออื่น)"""
+    conn.execute("""
+        UPDATE payments
+        SET slip_image = ?, status = 'verifying'
+        WHERE order_id = ?
+    """, (filename, order_id))
+    record_slip_hash(conn, order_id, filename, fingerprint)
+
 @app.route('/upload_slip/<int:order_id>', methods=['POST'])
 @login_required
 def upload_slip(order_id):
@@ -287,29 +808,792 @@ def upload_slip(order_id):
         # บันทึกไฟล์
         file.save(filepath)
 
-        # อัปเดต DB: กำหนด status เป็น 'verifying'
-        conn = get_db_connection()
-        conn.execute("""
-            UPDATE payments
-            SET slip_image = ?, status = 'verifying'
-            WHERE order_id = ?
-        """, (filename, order_id))
-        conn.commit()
-        conn.close()
+        # อัปเดต DB: กำหนด status เป็น 'verifying' (hash นอก write unit เพราะต้อง decode รูป)
+        run_write(attach_payment_slip, order_id, filename, slip_fingerprint(filepath))
 
         return jsonify({'success': True, 'message': 'อัปโหลดสลิปเรียบร้อย', 'filename': filename})
     else:
         return jsonify({'success': False, 'message': 'ไฟล์ต้องเป็น PNG, JPG, JPEG'}), 400
 
+# ========================
+# Payment Slips (เฉพาะแอดมินและเจ้าของคำสั่งซื้อ)
+# ========================
+
+SLIP_MAX_AGE = 24 * 60 * 60
+SLIP_THUMBNAIL_SIZE = (320, 320)
+
+def can_view_slip(filename):
+    """แอดมินหรือเจ้าของ order ของสลิปนี้ ใช้ query เดียวผ่าน idx_payments_slip_image"""
+    conn = get_db_connection()
+    owner = conn.execute("""
+        SELECT o.user_id
+        FROM payments p
+        JOIN orders o ON o.id = p.order_id
+        WHERE p.slip_image = ?
+        LIMIT 1
+    """, (filename,)).fetchone()
+    if owner is None:
+        # สลิปของคำสั่งซื้อที่ถูกย้ายไป archive แล้ว
+        attach_archive(conn)
+        owner = conn.execute("""
+            SELECT o.user_id
+            FROM archive.payments p
+            JOIN archive.orders o ON o.id = p.order_id
+            WHERE p.slip_image = ?
+            LIMIT 1
+        """, (filename,)).fetchone()
+    conn.close()
+    return owner is not None and (session.get('role') == 'admin' or owner['user_id'] == session.get('user_id'))
+
+def move_legacy_slips():
+    """ย้ายสลิปที่ค้างใน static/uploads/slips ไป uploads/slips (ชื่อไฟล์ใน payments.slip_image ไม่เปลี่ยน)
+    ไฟล์ที่ชื่อชนกับไฟล์ที่มีอยู่แล้วปล่อยไว้ที่เดิมและเขียน log"""
+    if not os.path.isdir(LEGACY_SLIP_FOLDER):
+        return
+    os.makedirs(UPLOAD_FOLDER1, exist_ok=True)
+    for name in os.listdir(LEGACY_SLIP_FOLDER):
+        source = os.path.join(LEGACY_SLIP_FOLDER, name)
+        target = os.path.join(UPLOAD_FOLDER1, name)
+        if not os.path.isfile(source):
+            continue
+        if os.path.exists(target):
+            app.logger.warning("Slip %s already exists in %s, left in %s", name, UPLOAD_FOLDER1, LEGACY_SLIP_FOLDER)
+            continue
+        os.replace(source, target)
+    for folder in (LEGACY_SLIP_FOLDER, os.path.dirname(LEGACY_SLIP_FOLDER)):
+        try:
+            os.rmdir(folder)
+        except OSError:
+            break
+
+def find_slip_path(filename):
+    path = safe_join(UPLOAD_FOLDER1, filename)
+    if path and os.path.isfile(path):
+        return path
+    return None
+
+def make_slip_thumbnail(path, filename):
+    """ย่อสลิปเป็น JPEG สำหรับ grid ใน admin_payments สร้างครั้งแรกแล้วเก็บไว้ใน uploads/slips/thumbs"""
+    thumb_dir = os.path.join(UPLOAD_FOLDER1, 'thumbs')
+    thumb_path = os.path.join(thumb_dir, filename.rsplit('.', 1)[0] + '.jpg')
+    if os.path.exists(thumb_path) and os.path.getmtime(thumb_path) >= os.path.getmtime(path):
+        return thumb_path
+    from PIL import Image, ImageOps
+    os.makedirs(thumb_dir, exist_ok=True)
+    tmp_path = f"{thumb_path}.{os.getpid()}.tmp"
+    try:
+        with Image.open(path) as img:
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail(SLIP_THUMBNAIL_SIZE)
+            img.convert('RGB').save(tmp_path, 'JPEG', quality=80, optimize=True)
+    except OSError:
+        app.logger.warning("Cannot create thumbnail for slip %s", filename)
+        return path
+    os.replace(tmp_path, thumb_path)
+    return thumb_path
+
+def send_slip(path):
+    """ส่งไฟล์พร้อม ETag/Range ผ่าน send_file หรือให้ nginx ส่งแทนด้วย X-Accel-Redirect"""
+    accel = app.config['SLIP_ACCEL_REDIRECT']
+    relative = os.path.relpath(path, UPLOAD_FOLDER1)
+    if accel and not relative.startswith('..'):
+        response = app.response_class(mimetype=mimetypes.guess_type(path)[0])
+        response.headers['X-Accel-Redirect'] = accel.rstrip('/') + '/' + relative.replace(os.sep, '/')
+    else:
+        # USE_X_SENDFILE=True ทำให้ send_file ตอบ X-Sendfile แทนการอ่านไฟล์เอง
+        response = send_file(os.path.abspath(path), conditional=True, etag=True, max_age=SLIP_MAX_AGE)
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.max_age = SLIP_MAX_AGE
+    return response
+
+@app.route('/slips/<filename>')
+@login_required
+def slip_file(filename):
+    if not can_view_slip(filename):
+        abort(404)
+    path = find_slip_path(filename)
+    if not path:
+        abort(404)
+    return send_slip(path)
+
+@app.route('/slips/<filename>/thumbnail')
+@login_required
+def slip_thumbnail(filename):
+    if not can_view_slip(filename):
+        abort(404)
+    path = find_slip_path(filename)
+    if not path:
+        abort(404)
+    return send_slip(make_slip_thumbnail(path, filename))
+
+# ========================
+# Duplicate Slip Detection (perceptual hash)
+# ========================
+
+# สลิปของธนาคารเดียวกันใช้ template เดียวกัน รูปย่อหยาบ ๆ (เช่น dHash 8x8) จึงเหมือนกันเกือบทุกบิตแม้ชื่อ/ยอด/เลขอ้างอิงต่างกัน
+# ตรวจสองชั้น:
+#   1. sha256 ของเนื้อไฟล์: อัปโหลดไฟล์เดิมซ้ำ (ตรงทุก byte) ค้นผ่าน index ตรง ๆ
+#   2. dHash 64x64 = 4096 บิต ที่ความละเอียดนี้ตัวอักษรของยอดเงิน/ชื่อ/เลขอ้างอิงยังเห็นเป็นเส้นขอบ
+#      บิตเป็น 1 เฉพาะเมื่อพิกเซลซ้ายสว่างกว่าขวาเกิน SLIP_HASH_MARGIN (พื้นเรียบเป็น 0 เสมอ noise ของ JPEG ไม่ทำให้บิตพลิก)
+#      สลิปต่างใบบน template เดียวกันต่าง ~100 บิตขึ้นไป ไฟล์เดิมที่ถูกบีบอัด/ย่อใหม่ต่าง < 20 บิต (วัดด้วย benchmarks/slip_hash.py)
+# index ของ dHash (multi-index hashing): บิตที่ k อยู่ band k % SLIP_HASH_BANDS (แต่ละ band กระจายทั้งรูป
+# ไม่ใช่แถบเดียวที่อาจเป็นแค่ส่วนหัวของ template) เก็บ hash 64 บิตของแต่ละ band ใน slip_hash_bands
+# จำนวน band = SLIP_HASH_MAX_DISTANCE + 1 ตาม pigeonhole: สองค่าที่ต่างกันไม่เกิน threshold บิต
+# ต้องมีอย่างน้อยหนึ่ง band ที่ตรงกันทั้ง band จึงเจอเป็น candidate เสมอ (recall 100% ถึง threshold)
+# threshold สูงขึ้น = band เล็กลง สลิปต่างใบบน template เดียวกันก็ตรงกันบาง band บ่อยขึ้น (candidate มากขึ้น)
+# เปลี่ยนค่านี้แล้วต้องรัน flask hash-slips --rebuild เพราะ key ของ band เปลี่ยนทั้งหมด
+SLIP_HASH_SIZE = 64
+SLIP_HASH_MARGIN = 16
+SLIP_HASH_MAX_DISTANCE = 24
+SLIP_HASH_BANDS = SLIP_HASH_MAX_DISTANCE + 1
+SLIP_FILENAME_RE = re.compile(r'^slip_(\d+)_')
+
+def slip_fingerprint(path):
+    """(sha256 ของไฟล์, dHash 4096 บิตเป็น bytes) ของสลิป ไฟล์ที่ไม่ใช่รูปคืน None"""
+    from PIL import Image, ImageChops, ImageOps
+    try:
+        with open(path, 'rb') as f:
+            content_hash = hashlib.sha256(f.read()).hexdigest()
+        with Image.open(path) as img:
+            img.draft('L', (SLIP_HASH_SIZE * 4, SLIP_HASH_SIZE * 4))  # JPEG: decode แบบย่อ เร็วกว่ามาก
+            img = ImageOps.exif_transpose(img).convert('L')
+            small = img.resize((SLIP_HASH_SIZE + 1, SLIP_HASH_SIZE), Image.LANCZOS)
+    except (OSError, Image.DecompressionBombError):
+        app.logger.warning("Cannot hash slip %s", path)
+        return None
+    left = small.crop((0, 0, SLIP_HASH_SIZE, SLIP_HASH_SIZE))
+    right = small.crop((1, 0, SLIP_HASH_SIZE + 1, SLIP_HASH_SIZE))
+    edges = ImageChops.subtract(left, right).point(lambda v: 255 if v > SLIP_HASH_MARGIN else 0, '1')
+    return content_hash, edges.tobytes()
+
+def slip_hash_distance(a, b):
+    return (int.from_bytes(a, 'big') ^ int.from_bytes(b, 'big')).bit_count()
+
+def slip_hash_bands(dhash):
+    """key 64 บิต (มีเครื่องหมายตาม INTEGER ของ SQLite) ของแต่ละ band รวมเลข band ไว้ใน key แล้ว"""
+    bits = format(int.from_bytes(dhash, 'big'), f'0{len(dhash) * 8}b')
+    return [int.from_bytes(hashlib.blake2b(f'{i}:{bits[i::SLIP_HASH_BANDS]}'.encode(), digest_size=8).digest(),
+                           'big', signed=True)
+            for i in range(SLIP_HASH_BANDS)]
+
+def find_similar_slip(conn, fingerprint, order_id):
+    """สลิปของคำสั่งซื้ออื่นที่เนื้อไฟล์ตรงกัน (distance 0) หรือ dHash ต่างกันไม่เกิน SLIP_HASH_MAX_DISTANCE บิต
+    คืน (order_id, distance) ของใบที่ใกล้สุด นับบิตทุก candidate ที่มี band ตรงอย่างน้อยหนึ่ง band"""
+    content_hash, dhash = fingerprint
+    row = conn.execute("""
+        SELECT order_id FROM slip_hashes WHERE content_hash = ? AND order_id IS NOT ? LIMIT 1
+    """, (content_hash, order_id)).fetchone()
+    if row:
+        return row[0], 0
+    keys = slip_hash_bands(dhash)
+    rows = conn.execute(f"""
+        SELECT h.order_id, h.dhash
+        FROM slip_hash_bands b
+        JOIN slip_hashes h ON h.id = b.slip_id
+        WHERE b.band_key IN ({','.join('?' * len(keys))}) AND h.order_id IS NOT ?
+        GROUP BY b.slip_id
+    """, (*keys, order_id)).fetchall()
+    best = None
+    for other_order_id, other in rows:
+        distance = slip_hash_distance(dhash, other)
+        if distance <= SLIP_HASH_MAX_DISTANCE and (best is None or distance < best[1]):
+            best = (other_order_id, distance)
+    return best
+
+def record_slip_hash(conn, order_id, filename, fingerprint):
+    """เก็บ fingerprint ของสลิป (slip_fingerprint) แล้วตั้ง/ล้าง flag สลิปซ้ำบน payment ที่ใช้ไฟล์นี้ คืนผลของ find_similar_slip"""
+    match = None
+    old = conn.execute("SELECT id FROM slip_hashes WHERE filename = ?", (filename,)).fetchone()
+    if old:
+        conn.execute("DELETE FROM slip_hash_bands WHERE slip_id = ?", (old[0],))
+        conn.execute("DELETE FROM slip_hashes WHERE id = ?", (old[0],))
+    if fingerprint is not None:
+        match = find_similar_slip(conn, fingerprint, order_id)
+        content_hash, dhash = fingerprint
+        slip_id = conn.execute("""
+            INSERT INTO slip_hashes (filename, order_id, content_hash, dhash) VALUES (?, ?, ?, ?)
+        """, (filename, order_id, content_hash, dhash)).lastrowid
+        conn.executemany("INSERT OR IGNORE INTO slip_hash_bands (band_key, slip_id) VALUES (?, ?)",
+                         [(key, slip_id) for key in slip_hash_bands(dhash)])
+    conn.execute("""
+        UPDATE payments SET slip_duplicate_order_id = ?, slip_duplicate_distance = ?
+        WHERE order_id = ? AND slip_image = ?
+    """, (*(match or (None, None)), order_id, filename))
+    return match
+
+def backfill_slip_hashes(conn):
+    """hash สลิปเดิมใน uploads/slips ที่ยังไม่อยู่ใน slip_hashes เรียงตามเวลาไฟล์
+    conn ต้อง attach archive แล้ว (ใช้ view all_payments หาเจ้าของสลิป) คืน (จำนวนที่ hash, จำนวนที่ซ้ำ, ไฟล์ที่อ่านไม่ได้)"""
+    known = {row[0] for row in conn.execute("SELECT filename FROM slip_hashes")}
+    owners = dict(conn.execute("SELECT slip_image, order_id FROM all_payments WHERE slip_image IS NOT NULL").fetchall())
+    files = {}
+    if os.path.isdir(UPLOAD_FOLDER1):
+        for name in os.listdir(UPLOAD_FOLDER1):
+            path = os.path.join(UPLOAD_FOLDER1, name)
+            if name not in known and allowed_file(name) and os.path.isfile(path):
+                files[name] = path
+    hashed, duplicates, unreadable = 0, 0, []
+    for name, path in sorted(files.items(), key=lambda item: os.path.getmtime(item[1])):
+        fingerprint = slip_fingerprint(path)
+        if fingerprint is None:
+            unreadable.append(name)
+            continue
+        order_id = owners.get(name)
+        if order_id is None:
+            match = SLIP_FILENAME_RE.match(name)
+            order_id = int(match.group(1)) if match else None
+        if record_slip_hash(conn, order_id, name, fingerprint):
+            duplicates += 1
+        hashed += 1
+        if hashed % 500 == 0:
+            conn.commit()
+    conn.commit()
+    return hashed, duplicates, unreadable
+
 # ========================
 # Helper Functions
 # ========================
 
-def get_db_connection():
-    conn = sqlite3.connect(DB_NAME)
+def get_db_connection(with_archive=False, parse_types=False):
+    """parse_types: แปลงคอลัมน์ TIMESTAMP/DATETIME เป็น datetime ตอน fetch (ใช้คู่กับโมเดลใน models.py)"""
+    detect_types = sqlite3.PARSE_DECLTYPES if parse_types else 0
+    if app.config['SQL_PROFILE']:
+        conn = sqlite3.connect(DB_NAME, factory=ProfiledConnection, detect_types=detect_types)
+    else:
+        conn = sqlite3.connect(DB_NAME, detect_types=detect_types)
     conn.row_factory = sqlite3.Row
+    if with_archive:
+        attach_archive(conn)
+    return conn
+
+# ========================
+# Write Coordinator
+# ========================
+
+class WriteCoordinator:
+    """writer thread เดียวต่อ process: ดึง write unit จาก queue แล้ว commit หลายรายการใน transaction เดียว
+
+    write unit คือฟังก์ชัน fn(conn, *args) ที่เขียนผ่าน conn โดยไม่ commit เอง และไม่อ่าน session/request
+    (รันบน thread อื่น) แต่ละ unit อยู่ใน SAVEPOINT ของตัวเอง unit ที่ raise จะถูก rollback เฉพาะส่วนของมัน
+    future ของทุก unit ใน batch ได้ผลหลัง COMMIT สำเร็จเท่านั้น
+    """
+
+    def __init__(self, db_path, max_batch=64, max_delay=0.002):
+        self.db_path = db_path
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.queue = queue.Queue()
+        self.batches = 0
+        self.units = 0
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        self._ensure_started()
+        self.queue.put((fn, args, kwargs, future))
+        return future
+
+    def _ensure_started(self):
+        with self._lock:
+            # หลัง fork (gunicorn --preload) thread ของ parent ไม่ตามมา ต้องเริ่มใหม่ใน worker
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self.queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='bakery-writer', daemon=True)
+            self._thread.start()
+
+    def shutdown(self, timeout=5):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self.queue.put(None)
+            self._thread.join(timeout)
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    return
+                batch = [item]
+                deadline = time.monotonic() + self.max_delay
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        self.queue.put(None)
+                        break
+                    batch.append(item)
+                self._commit_batch(conn, batch)
+        finally:
+            conn.close()
+
+    def _commit_batch(self, conn, batch):
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, args, kwargs, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    outcomes.append(None)
+                    continue
+                conn.execute("SAVEPOINT write_unit")
+                try:
+                    outcomes.append((True, fn(conn, *args, **kwargs)))
+                    conn.execute("RELEASE write_unit")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write_unit")
+                    conn.execute("RELEASE write_unit")
+                    outcomes.append((False, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for _, _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.units += len(batch)
+        for (_, _, _, future), outcome in zip(batch, outcomes):
+            if outcome is None:
+                continue
+            ok, value = outcome
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+
+_write_coordinator = None
+_write_coordinator_lock = threading.Lock()
+
+def get_write_coordinator():
+    global _write_coordinator
+    with _write_coordinator_lock:
+        if _write_coordinator is None or _write_coordinator.db_path != DB_NAME:
+            if _write_coordinator is not None:
+                _write_coordinator.shutdown()
+            _write_coordinator = WriteCoordinator(
+                DB_NAME,
+                max_batch=app.config['WRITE_QUEUE_MAX_BATCH'],
+                max_delay=app.config['WRITE_QUEUE_MAX_DELAY_MS'] / 1000)
+        return _write_coordinator
+
+@atexit.register
+def _shutdown_write_coordinator():
+    if _write_coordinator is not None:
+        _write_coordinator.shutdown()
+
+def submit_write(fn, *args, **kwargs):
+    """ส่ง write unit ไปรัน คืน Future
+
+    เปิด WRITE_QUEUE: เข้าคิวของ writer thread (group commit)
+    ปิด (ค่าเริ่มต้น): เปิด connection, รัน, commit ทันที แล้วคืน Future ที่เสร็จแล้ว
+    """
+    if app.config['WRITE_QUEUE']:
+        return get_write_coordinator().submit(fn, *args, **kwargs)
+
+    future = Future()
+    conn = get_db_connection()
+    try:
+        result = fn(conn, *args, **kwargs)
+        conn.commit()
+        future.set_result(result)
+    except Exception as e:
+        conn.rollback()
+        future.set_exception(e)
+    finally:
+        conn.close()
+    return future
+
+def run_write(fn, *args, **kwargs):
+    """submit_write แล้วรอผล (raise exception ของ write unit ต่อให้ผู้เรียก)"""
+    return submit_write(fn, *args, **kwargs).result(timeout=app.config['WRITE_QUEUE_TIMEOUT'])
+
+# ========================
+# Order Archive
+# ========================
+
+ARCHIVE_TABLES = ('orders', 'order_items', 'payments')
+ARCHIVE_STATUSES = ('completed', 'cancelled')
+ARCHIVE_BATCH_SIZE = 500
+# PRAGMA archive.user_version (migration ของฐานหลักไม่เห็นไฟล์ archive จึงอัปเกรดตอน attach)
+#   1 = คอลัมน์เงินเป็นสตางค์, 2 = เติม snapshot ที่อยู่ของคำสั่งซื้อ
+ARCHIVE_SCHEMA_VERSION = 2
+
+def table_columns(conn, schema, table):
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+def ensure_archive_schema(conn):
+    """สร้าง/ต่อคอลัมน์ตาราง archive ให้ตรงกับตารางหลัก (migration ที่เพิ่มคอลัมน์ไม่ต้องแก้ archive เอง)"""
+    for table in ARCHIVE_TABLES:
+        archived = table_columns(conn, 'archive', table)
+        if not archived:
+            sql = conn.execute("SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?",
+                               (table,)).fetchone()[0]
+            conn.execute(re.sub(r'^CREATE TABLE (IF NOT EXISTS )?"?\w+"?',
+                                f'CREATE TABLE IF NOT EXISTS archive.{table}', sql.strip(), count=1))
+            continue
+        types = {row[1]: row[2] for row in conn.execute(f"PRAGMA main.table_info({table})")}
+        for column in types:
+            if column not in archived:
+                conn.execute(f'ALTER TABLE archive.{table} ADD COLUMN {column} {types[column]}')
+    conn.executescript("""
+        CREATE INDEX IF NOT EXISTS archive.idx_orders_user_created ON orders(user_id, created_at);
+        CREATE INDEX IF NOT EXISTS archive.idx_orders_created_at ON orders(created_at);
+        CREATE INDEX IF NOT EXISTS archive.idx_order_items_order_id ON order_items(order_id);
+        CREATE INDEX IF NOT EXISTS archive.idx_payments_order_id ON payments(order_id);
+        CREATE INDEX IF NOT EXISTS archive.idx_payments_slip_image ON payments(slip_image);
+    """)
+    version = conn.execute("PRAGMA archive.user_version").fetchone()[0]
+    if version < ARCHIVE_SCHEMA_VERSION:
+        if version < 1:
+            convert_money_to_satang(conn, 'archive')
+        if version < 2:
+            backfill_order_addresses(conn, 'archive')
+        conn.execute(f"PRAGMA archive.user_version = {ARCHIVE_SCHEMA_VERSION}")
+        conn.commit()
+
+def setup_archive():
+    """สร้าง/อัปเกรด schema ของไฟล์ archive ทำตอน setup_database และ archive-orders เท่านั้น
+    (attach_archive ที่เรียกทุก request แค่ ATTACH และสร้าง TEMP VIEW ไม่รัน DDL บนไฟล์)"""
+    conn = sqlite3.connect(DB_NAME)
+    try:
+        conn.execute("ATTACH DATABASE ? AS archive", (app.config['ARCHIVE_DB'],))
+        conn.execute("PRAGMA archive.journal_mode=WAL")  # หน้าประวัติที่ stream อยู่ไม่บล็อก archive-orders
+        ensure_archive_schema(conn)
+        conn.commit()
+    finally:
+        conn.close()
+
+def attach_archive(conn):
+    """attach ไฟล์ archive แล้วสร้าง TEMP VIEW all_orders / all_order_items / all_payments
+
+    view รวมแถวจากฐานหลักและ archive (คอลัมน์ archived = 1 สำหรับแถวที่ย้ายแล้ว) แถวที่มีทั้งสองไฟล์
+    (archive_closed_orders คัดลอกแล้วแต่ยังไม่ได้ลบ) แสดงครั้งเดียวจากฐานหลัก
+    หน้าประวัติจึง query ที่เดียวโดยไม่ต้องรู้ว่าคำสั่งซื้ออยู่ไฟล์ไหน
+    """
+    conn.execute("ATTACH DATABASE ? AS archive", (app.config['ARCHIVE_DB'],))
+    for table in ARCHIVE_TABLES:
+        columns = ', '.join(table_columns(conn, 'main', table))
+        conn.execute(f"""
+            CREATE TEMP VIEW IF NOT EXISTS all_{table} AS
+            SELECT {columns}, 0 AS archived FROM main.{table}
+            UNION ALL
+            SELECT {columns}, 1 AS archived FROM archive.{table} a
+            WHERE NOT EXISTS (SELECT 1 FROM main.{table} m WHERE m.id = a.id)
+        """)
     return conn
 
+def archive_closed_orders(conn, older_than_days, batch_size=ARCHIVE_BATCH_SIZE):
+    """ย้ายคำสั่งซื้อ completed/cancelled ที่เก่ากว่า N วันไป archive ทีละ batch คืนจำนวนที่ย้าย
+
+    ฐานหลักเป็น WAL ซึ่ง commit ไม่ atomic ข้าม attached database แต่ละ batch จึงแยกเป็นสอง transaction
+    คัดลอกเข้า archive แล้ว commit ก่อน จากนั้นจึงลบจากฐานหลัก ถ้าหยุดระหว่างนั้นแถวจะอยู่ทั้งสองไฟล์
+    (view all_* แสดงครั้งเดียว) id เดิมถูกเก็บไว้และ INSERT OR REPLACE ทำให้รันซ้ำแล้วคัดลอกทับและลบต่อได้
+    """
+    columns = {table: ', '.join(table_columns(conn, 'main', table)) for table in ARCHIVE_TABLES}
+    statuses = ','.join('?' * len(ARCHIVE_STATUSES))
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS archive_batch (id INTEGER PRIMARY KEY)")
+    moved = 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM archive_batch")
+            conn.execute(f"""
+                INSERT INTO archive_batch (id)
+                SELECT id FROM main.orders
+                WHERE status IN ({statuses}) AND created_at < datetime('now', ?)
+                ORDER BY id
+                LIMIT ?
+            """, (*ARCHIVE_STATUSES, f'-{int(older_than_days)} days', batch_size))
+            count = conn.execute("SELECT COUNT(*) FROM archive_batch").fetchone()[0]
+            if count:
+                conn.execute(f"""
+                    INSERT OR REPLACE INTO archive.orders ({columns['orders']})
+                    SELECT {columns['orders']} FROM main.orders WHERE id IN (SELECT id FROM archive_batch)
+                """)
+                for table in ('order_items', 'payments'):
+                    conn.execute(f"""
+                        INSERT OR REPLACE INTO archive.{table} ({columns[table]})
+                        SELECT {columns[table]} FROM main.{table} WHERE order_id IN (SELECT id FROM archive_batch)
+                    """)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if count:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for table in ('order_items', 'payments'):
+                    conn.execute(f"DELETE FROM main.{table} WHERE order_id IN (SELECT id FROM archive_batch)")
+                conn.execute("DELETE FROM main.orders WHERE id IN (SELECT id FROM archive_batch)")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        moved += count
+        if count < batch_size:
+            return moved
+
+# ========================
+# SQL Profiler
+# ========================
+
+_sql_stats = {}
+_sql_stats_lock = threading.Lock()
+_SQL_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SQL_SPACE_RE = re.compile(r"\s+")
+SQL_TRACE_LIMIT = 200
+
+def normalize_sql(sql):
+    """ยุบช่องว่างและแทนค่าคงที่ด้วย ? เพื่อรวมสถิติของคำสั่งเดียวกัน"""
+    sql = _SQL_LITERAL_RE.sub('?', sql)
+    return _SQL_SPACE_RE.sub(' ', sql).strip()
+
+def record_sql_time(key, elapsed_ms, executed):
+    """สะสมเวลาของคำสั่ง SQL ทั้งแบบรวมทั้ง process และราย request"""
+    with _sql_stats_lock:
+        stat = _sql_stats.get(key)
+        if stat is None:
+            stat = _sql_stats[key] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+        if executed:
+            stat['count'] += 1
+        stat['total_ms'] += elapsed_ms
+        stat['max_ms'] = max(stat['max_ms'], elapsed_ms)
+    if has_request_context():
+        g.sql_time_ms = g.get('sql_time_ms', 0.0) + elapsed_ms
+
+def get_sql_stats(limit=None):
+    """สถิติคำสั่ง SQL เรียงตามเวลารวมมากไปน้อย"""
+    with _sql_stats_lock:
+        rows = [dict(sql=key, **stat) for key, stat in _sql_stats.items()]
+    rows.sort(key=lambda r: r['total_ms'], reverse=True)
+    for row in rows:
+        row['avg_ms'] = row['total_ms'] / row['count'] if row['count'] else 0.0
+    return rows[:limit] if limit else rows
+
+def reset_sql_stats():
+    with _sql_stats_lock:
+        _sql_stats.clear()
+
+def _trace_sql(statement):
+    """trace callback ของ sqlite3: นับทุกคำสั่งที่ SQLite รันจริง (รวม BEGIN/COMMIT และ trigger)"""
+    if has_request_context():
+        g.sql_query_count = g.get('sql_query_count', 0) + 1
+        trace = g.setdefault('sql_trace', [])
+        if len(trace) < SQL_TRACE_LIMIT:
+            trace.append(statement)
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Cursor ที่จับเวลา execute และ fetch แล้ว log คำสั่งที่ช้าพร้อม EXPLAIN QUERY PLAN"""
+
+    _stmt = None
+
+    def execute(self, sql, parameters=()):
+        self._begin(sql, parameters)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._account(start, executed=True)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._begin(sql, None)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._account(start, executed=True)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            self._account(start)
+
+    def fetchmany(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().fetchmany(*args, **kwargs)
+        finally:
+            self._account(start)
+
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            self._account(start)
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            return super().__next__()
+        finally:
+            self._account(start)
+
+    def _begin(self, sql, parameters):
+        self._stmt = {'key': normalize_sql(sql), 'sql': sql, 'params': parameters,
+                      'elapsed_ms': 0.0, 'logged': False}
+
+    def _account(self, start, executed=False):
+        stmt = self._stmt
+        if stmt is None:
+            return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        stmt['elapsed_ms'] += elapsed_ms
+        record_sql_time(stmt['key'], elapsed_ms, executed)
+        if not stmt['logged'] and stmt['elapsed_ms'] >= app.config['SLOW_QUERY_MS']:
+            stmt['logged'] = True
+            app.logger.warning("Slow query (%.1f ms): %s\n%s",
+                               stmt['elapsed_ms'], stmt['key'], self._explain(stmt))
+
+    def _explain(self, stmt):
+        if stmt['params'] is None:
+            return "  (no plan for executemany)"
+        try:
+            plan = sqlite3.Cursor(self.connection).execute(
+                "EXPLAIN QUERY PLAN " + stmt['sql'], stmt['params']).fetchall()
+        except sqlite3.Error as e:
+            return f"  (no plan: {e})"
+        return "\n".join(f"  {row[3]}" for row in plan)
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """Connection ที่ใช้ ProfiledCursor และส่งทุกคำสั่งเข้า trace callback"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_trace_callback(_trace_sql)
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+@app.after_request
+def add_sql_profile_headers(response):
+    """แนบจำนวน query และเวลา DB ของ request นี้ใน header (เฉพาะ debug mode)"""
+    if app.config['SQL_PROFILE'] and app.debug:
+        count = g.get('sql_query_count', 0)
+        total_ms = g.get('sql_time_ms', 0.0)
+        response.headers['X-DB-Query-Count'] = str(count)
+        response.headers['X-DB-Time-Ms'] = f"{total_ms:.2f}"
+        response.headers.add('Server-Timing', f'db;dur={total_ms:.2f};desc="{count} queries"')
+        for statement in g.get('sql_trace', []):
+            app.logger.debug("SQL %s: %s", request.path, statement)
+    return response
+
+# ========================
+# Read-only Connections
+# ========================
+
+class ReadOnlyConnection(sqlite3.Connection):
+    """connection แบบ mode=ro + query_only จาก ReadConnectionPool: close() คืนเข้า pool แทนการปิดจริง"""
+
+    pool = None
+    checked_out = False
+
+    def close(self):
+        if self.pool is None:
+            super().close()
+        elif self.checked_out:
+            self.pool.release(self)
+
+    def close_now(self):
+        super().close()
+
+
+class ProfiledReadOnlyConnection(ReadOnlyConnection, ProfiledConnection):
+    pass
+
+
+class ReadConnectionPool:
+    """pool ของ connection อ่านอย่างเดียวต่อ process แยกจากฝั่งเขียน (get_db_connection / run_write)
+
+    เปิดด้วย URI mode=ro และ PRAGMA query_only=ON การเขียนโดยไม่ตั้งใจจึง error แทนที่จะไปแย่ง write lock
+    คอลัมน์ TIMESTAMP/DATETIME ถูกแปลงเป็น datetime ตอน fetch (PARSE_DECLTYPES)
+    ตอนคืน connection จะ rollback transaction ที่ค้าง การยืมครั้งถัดไปจึงเห็นข้อมูลที่ commit ล่าสุดเสมอ
+    """
+
+    def __init__(self, db_path, size=8, profiled=False):
+        self.db_path = db_path
+        self.size = size
+        self.profiled = profiled
+        self.idle = queue.LifoQueue()
+        self.pid = os.getpid()
+
+    def acquire(self):
+        try:
+            conn = self.idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        conn.checked_out = True
+        return conn
+
+    def release(self, conn):
+        conn.checked_out = False
+        if conn.in_transaction:
+            conn.rollback()
+        if self.pid == os.getpid() and self.idle.qsize() < self.size:
+            self.idle.put(conn)
+        else:
+            conn.close_now()
+
+    def close_all(self):
+        while True:
+            try:
+                self.idle.get_nowait().close_now()
+            except queue.Empty:
+                return
+
+    def _connect(self):
+        factory = ProfiledReadOnlyConnection if self.profiled else ReadOnlyConnection
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, timeout=30,
+                               check_same_thread=False, factory=factory, detect_types=sqlite3.PARSE_DECLTYPES)
+        conn.pool = self
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+
+_read_pool = None
+_read_pool_lock = threading.Lock()
+
+def get_read_connection():
+    """connection สำหรับหน้าที่อ่านอย่างเดียว (หน้าร้าน, ตะกร้า, ติดตามคำสั่งซื้อ) ใช้แล้ว close() ตามปกติ
+
+    อ่านจาก BAKERY_READ_DB ถ้าตั้งไว้ (เช่นสำเนาที่ replicate มา) ไม่เช่นนั้นอ่านไฟล์เดียวกับฝั่งเขียน
+    """
+    global _read_pool
+    db_path = app.config['READ_DB'] or DB_NAME
+    with _read_pool_lock:
+        # หลัง fork (gunicorn --preload) ไม่ใช้ connection ที่สืบทอดมาจาก parent
+        if (_read_pool is None or _read_pool.db_path != db_path or _read_pool.pid != os.getpid()
+                or _read_pool.profiled != app.config['SQL_PROFILE']):
+            if _read_pool is not None and _read_pool.pid == os.getpid():
+                _read_pool.close_all()
+            _read_pool = ReadConnectionPool(db_path, size=app.config['READ_POOL_SIZE'],
+                                            profiled=app.config['SQL_PROFILE'])
+        pool = _read_pool
+    return pool.acquire()
+
 def get_user_by_username(username):
     conn = get_db_connection()
     user = conn.execute(
@@ -319,7 +1603,7 @@ def get_user_by_username(username):
     return user
 
 def get_categories():
-    conn = get_db_connection()
+    conn = get_read_connection()
     categories = conn.execute(
         "SELECT * FROM categories ORDER BY display_order"
     ).fetchall()
@@ -327,47 +1611,48 @@ def get_categories():
     return categories
 
 def get_products_by_category(category_id=None, featured_only=False):
-    conn = get_db_connection()
+    """สินค้าที่สั่งได้ (is_orderable: เปิดขายและยังมีสต็อก) เป็นรายการ Product"""
+    conn = get_read_connection()
     if category_id:
         if featured_only:
-            products = conn.execute("""
+            products = Product.query(conn, """
                 SELECT p.*, c.name as category_name 
                 FROM products p 
                 JOIN categories c ON p.category_id = c.id 
-                WHERE p.category_id = ? AND p.is_available = 1 AND p.is_featured = 1
+                WHERE p.category_id = ? AND p.is_orderable = 1 AND p.is_featured = 1
                 ORDER BY p.created_at DESC
             """, (category_id,)).fetchall()
         else:
-            products = conn.execute("""
+            products = Product.query(conn, """
                 SELECT p.*, c.name as category_name 
                 FROM products p 
                 JOIN categories c ON p.category_id = c.id 
-                WHERE p.category_id = ? AND p.is_available = 1
+                WHERE p.category_id = ? AND p.is_orderable = 1
                 ORDER BY p.created_at DESC
             """, (category_id,)).fetchall()
     else:
         if featured_only:
-            products = conn.execute("""
+            products = Product.query(conn, """
                 SELECT p.*, c.name as category_name 
                 FROM products p 
                 JOIN categories c ON p.category_id = c.id 
-                WHERE p.is_available = 1 AND p.is_featured = 1
+                WHERE p.is_orderable = 1 AND p.is_featured = 1
                 ORDER BY p.created_at DESC
             """).fetchall()
         else:
-            products = conn.execute("""
+            products = Product.query(conn, """
                 SELECT p.*, c.name as category_name 
                 FROM products p 
                 JOIN categories c ON p.category_id = c.id 
-                WHERE p.is_available = 1
+                WHERE p.is_orderable = 1
                 ORDER BY p.created_at DESC
             """).fetchall()
     conn.close()
     return products
 
 def get_product_by_id(product_id):
-    conn = get_db_connection()
-    product = conn.execute("""
+    conn = get_read_connection()
+    product = Product.query(conn, """
         SELECT p.*, c.name as category_name
         FROM products p
         JOIN categories c ON p.category_id = c.id
@@ -377,56 +1662,418 @@ def get_product_by_id(product_id):
     return product
 
 def get_cart_total():
+    """จำนวนชิ้นและยอดรวม (สตางค์) ของตะกร้าใน session"""
     cart = session.get('cart', {})
     total_items = sum(item['quantity'] for item in cart.values())
     total_price = sum(item['quantity'] * item['price'] for item in cart.values())
     return total_items, total_price
 
-def get_all_payments():
-    conn = sqlite3.connect("bakery.db")
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
+def to_satang(value):
+    """แปลงจำนวนเงินบาทจากฟอร์ม (เช่น '120', '1,250.50') เป็นสตางค์ คืน None ถ้าไม่ใช่จำนวนที่ไม่ติดลบ"""
+    try:
+        baht = Decimal(str(value).strip().replace(',', ''))
+    except InvalidOperation:
+        return None
+    if not baht.is_finite() or baht < 0:
+        return None
+    return int((baht * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+@app.before_request
+def upgrade_legacy_cart():
+    """ตะกร้าที่สร้างก่อน migration 9 เก็บราคาเป็น float บาท แปลงเป็นสตางค์ครั้งเดียวตอน request แรก"""
+    if request.endpoint == 'static':
+        return
+    cart = session.get('cart')
+    if cart and any(isinstance(item.get('price'), float) for item in cart.values()):
+        for item in cart.values():
+            if isinstance(item.get('price'), float):
+                item['price'] = to_satang(item['price'])
+        session.modified = True
 
-    cur.execute("""
-        SELECT 
-            p.id AS payment_id,
-            p.order_id,
-            p.payment_method,
-            p.amount,
-            p.status AS payment_status,
-            p.slip_image,
-            p.paid_at,
-            o.customer_name,
-            o.customer_phone,
-            o.customer_address,
-            o.delivery_method,
-            o.total_amount,
-            o.status AS order_status,
-            o.created_at AS order_created
-        FROM payments p
-        JOIN orders o ON p.order_id = o.id
-        ORDER BY p.paid_at DESC
+# ========================
+# Inventory Ledger
+# ========================
+
+def record_stock_movement(conn, product_id, delta, reason, order_id=None, user_id=None):
+    """เพิ่มแถวใน inventory_movements (trigger บวกเข้า products.stock_quantity ให้)
+    ผู้เรียกส่ง user_id มาเอง ไม่อ่าน session ในนี้ (ใช้ใน write unit ที่อาจรันนอก request ได้)"""
+    conn.execute("""
+        INSERT INTO inventory_movements (product_id, delta, reason, order_id, user_id)
+        VALUES (?, ?, ?, ?, ?)
+    """, (product_id, delta, reason, order_id, user_id))
+
+def take_inventory_snapshots(conn):
+    """เพิ่ม snapshot ให้สินค้าที่มี movement ใหม่ ทำให้การคำนวณสต็อกจาก ledger อ่านแค่ tail สั้น ๆ"""
+    cursor = conn.execute("""
+        INSERT INTO inventory_snapshots (product_id, last_movement_id, quantity)
+        SELECT l.product_id,
+               (SELECT MAX(id) FROM inventory_movements m WHERE m.product_id = l.product_id),
+               l.quantity
+        FROM inventory_levels l
+        WHERE l.tail_length > 0
     """)
-    
-    rows = cur.fetchall()
-    conn.close()
+    conn.commit()
+    return cursor.rowcount
 
-    payments = [dict(row) for row in rows]
+def find_stock_drift(conn):
+    """สินค้าที่ cache products.stock_quantity ไม่ตรงกับ ledger"""
+    return conn.execute("""
+        SELECT p.id, p.name, p.stock_quantity AS cached, l.quantity AS ledger
+        FROM products p
+        JOIN inventory_levels l ON l.product_id = p.id
+        WHERE p.stock_quantity IS NOT l.quantity
+    """).fetchall()
 
-    # กำหนดค่า default ป้องกัน key หาย
-    for p in payments:
-        p.setdefault('payment_status', 'pending')   # ← ใช้ payment_status แทน status
-        p.setdefault('slip_image', None)
-        p.setdefault('payment_method', 'cod')
-        p.setdefault('amount', 0)
-        p.setdefault('customer_name', 'ไม่ระบุ')
-        p.setdefault('customer_phone', '-')
-        p.setdefault('paid_at', None)
-        p.setdefault('order_status', 'pending')
-        p.setdefault('order_created', datetime.now())
+PAYMENTS_LIST_SQL = """
+    SELECT 
+        p.id AS payment_id,
+        p.order_id,
+        p.payment_method,
+        p.amount,
+        p.status AS payment_status,
+        p.slip_image,
+        p.paid_at,
+        p.slip_duplicate_order_id,
+        p.slip_duplicate_distance,
+        o.customer_name,
+        o.customer_phone,
+        o.customer_address,
+        o.delivery_method,
+        o.total_amount,
+        o.status AS order_status,
+        o.created_at AS order_created
+    FROM payments p
+    JOIN orders o ON p.order_id = o.id
+    ORDER BY p.paid_at DESC
+"""
 
+def get_all_payments():
+    """รายการ Payment ทั้งหมด (paid_at / order_created เป็น datetime แล้ว)"""
+    conn = get_db_connection(parse_types=True)
+    payments = Payment.query(conn, PAYMENTS_LIST_SQL).fetchall()
+    conn.close()
     return payments
 
+# ========================
+# Template Cache & Warmup
+# ========================
+
+_template_stats = {}
+_template_stats_lock = threading.Lock()
+
+def record_template_time(name, kind, elapsed_ms):
+    """เก็บเวลา compile/render ราย template"""
+    with _template_stats_lock:
+        stat = _template_stats.get(name)
+        if stat is None:
+            stat = _template_stats[name] = {'compiles': 0, 'compile_ms': 0.0,
+                                            'renders': 0, 'render_total_ms': 0.0, 'render_max_ms': 0.0}
+        if kind == 'compile':
+            stat['compiles'] += 1
+            stat['compile_ms'] = elapsed_ms
+        else:
+            stat['renders'] += 1
+            stat['render_total_ms'] += elapsed_ms
+            stat['render_max_ms'] = max(stat['render_max_ms'], elapsed_ms)
+
+def get_template_stats():
+    with _template_stats_lock:
+        rows = [dict(template=name, **stat) for name, stat in _template_stats.items()]
+    for row in rows:
+        row['render_avg_ms'] = row['render_total_ms'] / row['renders'] if row['renders'] else 0.0
+    rows.sort(key=lambda r: r['render_total_ms'], reverse=True)
+    return rows
+
+@before_render_template.connect_via(app)
+def _start_render_timer(sender, template, context, **extra):
+    g.setdefault('template_timers', []).append(time.perf_counter())
+
+@template_rendered.connect_via(app)
+def _stop_render_timer(sender, template, context, **extra):
+    timers = g.get('template_timers')
+    if timers:
+        record_template_time(template.name, 'render', (time.perf_counter() - timers.pop()) * 1000)
+
+def configure_template_cache():
+    """เปิด FileSystemBytecodeCache ให้ worker ใหม่โหลด template ที่ compile แล้วจากดิสก์"""
+    cache_dir = app.config.get('JINJA_CACHE_DIR')
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+    else:
+        app.jinja_env.bytecode_cache = None
+
+def warm_up():
+    """โหลด/compile ทุก template และเรียก query แคตตาล็อกล่วงหน้า ก่อนรับ request แรก"""
+    started = time.perf_counter()
+    names = [n for n in app.jinja_env.list_templates() if n.endswith('.html')]
+    for name in names:
+        app.jinja_env.get_template(name)
+    get_postal_index()
+    with app.app_context():
+        get_categories()
+        get_products_by_category()
+        get_products_by_category(featured_only=True)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    app.logger.info("Warmed up %d templates and catalog queries in %.1f ms", len(names), elapsed_ms)
+    return len(names), elapsed_ms
+
+# ========================
+# Streamed Rendering
+# ========================
+
+STREAM_CHUNK_SIZE = 8192
+
+def _coalesce_chunks(chunks, size=STREAM_CHUNK_SIZE):
+    """รวมชิ้นเล็ก ๆ จาก Template.generate ให้เป็นก้อนละ ~8KB ลดจำนวน write ไปที่ socket"""
+    buf, buffered = [], 0
+    for chunk in chunks:
+        buf.append(chunk)
+        buffered += len(chunk)
+        if buffered >= size:
+            yield ''.join(buf)
+            buf, buffered = [], 0
+    if buf:
+        yield ''.join(buf)
+
+def stream_page(conn, template_name, **context):
+    """render template แบบ stream (stream_with_context + Template.generate)
+
+    ส่วนหัวหน้าและแถวแรกถูกส่งทันที แถวถัดไปอ่านจาก cursor ทีละแถวขณะส่ง
+    จึงใช้หน่วยความจำคงที่ไม่ว่าจะมีกี่แถว connection ถูกปิดเมื่อส่ง response ครบ
+    """
+    response = app.response_class(_coalesce_chunks(stream_template(template_name, **context)),
+                                  mimetype='text/html')
+    response.call_on_close(conn.close)
+    return response
+
+# ========================
+# Static Assets (bundle + fingerprint)
+# ========================
+
+# manifest สร้างโดย `flask --app app build-assets` (ดู assets.py)
+ASSET_MANIFEST_PATH = os.path.join(app.static_folder, 'dist', 'manifest.json')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+_asset_manifest = {}
+
+def load_asset_manifest():
+    """โหลด manifest ของ bundle ถ้ายังไม่ได้ build จะเสิร์ฟไฟล์ต้นฉบับแทน"""
+    global _asset_manifest
+    try:
+        with open(ASSET_MANIFEST_PATH, encoding='utf-8') as f:
+            _asset_manifest = json.load(f)
+    except FileNotFoundError:
+        _asset_manifest = {}
+    return _asset_manifest
+
+@app.url_defaults
+def fingerprint_static_url(endpoint, values):
+    """url_for('static', filename='bundles/site.js') -> /static/dist/site.<hash>.js"""
+    if endpoint == 'static':
+        hashed = _asset_manifest.get(values.get('filename'))
+        if hashed:
+            values['filename'] = hashed
+
+def send_precompressed(filename):
+    """ส่งไฟล์ที่ชื่อมี hash แบบ immutable พร้อมเลือก .br/.gz ที่บีบไว้แล้วตาม Accept-Encoding"""
+    path = safe_join(app.static_folder, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding = None
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[candidate] and os.path.isfile(path + suffix):
+            path, encoding = path + suffix, candidate
+            break
+    response = send_file(path, mimetype=mimetype, conditional=True, max_age=IMMUTABLE_MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.immutable = True
+    return response
+
+def serve_static(filename):
+    # normpath ก่อนตรวจ prefix: images/../uploads/... หรือ ./uploads/... ต้องถูกปฏิเสธเหมือน uploads/...
+    filename = posixpath.normpath(filename)
+    if filename == 'uploads' or filename.startswith(('uploads/', '../', '/')):
+        # สลิปเก่าที่อาจยังค้างใน static/ ต้องดูผ่าน /slips/ ที่ตรวจสิทธิ์เท่านั้น
+        abort(404)
+    if filename.startswith('dist/'):
+        return send_precompressed(filename)
+    if filename.startswith('images/products/') and HASHED_IMAGE_RE.match(filename[len('images/products/'):]):
+        # รูปสินค้าตั้งชื่อตาม hash ของเนื้อไฟล์ cache ได้ถาวรเหมือน bundle
+        return send_precompressed(filename)
+    if filename.startswith('bundles/'):
+        # ยังไม่ได้ build: ต่อไฟล์ต้นฉบับสด ๆ (ไม่ย่อ) ใช้ตอนพัฒนา
+        import assets
+        name = filename[len('bundles/'):]
+        if name not in assets.ASSET_BUNDLES:
+            abort(404)
+        response = app.response_class(assets.concat_sources(app.static_folder, name),
+                                      mimetype=mimetypes.guess_type(name)[0])
+        response.cache_control.no_cache = True
+        return response
+    return app.send_static_file(filename)
+
+app.view_functions['static'] = serve_static
+
+# ========================
+# Response Compression
+# ========================
+
+COMPRESS_MIMETYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/javascript', 'application/javascript',
+    'application/json', 'image/svg+xml',
+}
+
+def choose_encoding(accept_encoding):
+    """เลือก br ถ้าติดตั้ง brotli และ client รับได้ ไม่งั้น gzip"""
+    accepted = {}
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip()] = q
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+class _StreamCompressor:
+    """บีบอัดทีละ chunk แล้ว flush ทันทีให้ client แตกได้โดยไม่ต้องรอจบ response"""
+
+    def __init__(self, encoding, level, quality):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._obj = brotli.Compressor(quality=quality)
+        else:
+            self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31 = gzip header
+
+    def compress(self, data):
+        if self.encoding == 'br':
+            return self._obj.process(data) + self._obj.flush()
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._obj.finish()
+        return self._obj.flush()
+
+class CompressionMiddleware:
+    """WSGI middleware บีบอัด HTML/JSON/CSS/JS แบบ streaming
+
+    - ข้าม response ที่เล็กกว่า min_size, ไม่อยู่ใน allow-list, มี Content-Encoding แล้ว (ไฟล์ .gz/.br
+      จาก static/dist), เป็น range (206) หรือ Cache-Control: no-transform
+    - ทุก chunk ถูก flush ทันที หน้าแบบ stream_page จึงยังส่งถึง browser ทีละส่วนเหมือนเดิม
+    - ETag ยังเป็น strong แต่ต่อท้ายด้วย encoding ("<etag>-gzip") เพราะเป็นคนละ byte กับตัวที่ไม่บีบอัด
+      If-None-Match ที่มี suffix นี้ถูกตัดออกก่อนถึง view และ 304 ที่ตอบกลับได้ ETag แบบมี suffix คืนไป
+    """
+
+    def __init__(self, wsgi_app, min_size=500, level=6, brotli_quality=4, mimetypes=COMPRESS_MIMETYPES):
+        self.wsgi_app = wsgi_app
+        self.min_size = min_size
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self.mimetypes = mimetypes
+
+    def _compressible(self, status, headers):
+        code = int(status.split(' ', 1)[0])
+        if code < 200 or code in (204, 206, 304):
+            return False
+        values = {k.lower(): v for k, v in headers}
+        if 'content-encoding' in values or 'content-range' in values:
+            return False
+        if 'no-transform' in values.get('cache-control', ''):
+            return False
+        mimetype = values.get('content-type', '').split(';', 1)[0].strip().lower()
+        if mimetype not in self.mimetypes:
+            return False
+        length = values.get('content-length')
+        return length is None or int(length) >= self.min_size
+
+    @staticmethod
+    def _tag_etag(headers, encoding):
+        return [(k, v[:-1] + f'-{encoding}"' if k.lower() == 'etag' and v.endswith('"') else v)
+                for k, v in headers]
+
+    def __call__(self, environ, start_response):
+        encoding = choose_encoding(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None or environ.get('REQUEST_METHOD') == 'HEAD':
+            return self.wsgi_app(environ, start_response)
+
+        suffix = f'-{encoding}"'
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH', '')
+        tagged = suffix in if_none_match
+        if tagged:
+            environ['HTTP_IF_NONE_MATCH'] = if_none_match.replace(suffix, '"')
+
+        pending = {}
+
+        def write(data):
+            raise RuntimeError('CompressionMiddleware does not support the WSGI write() callable')
+
+        def capture_start_response(status, headers, exc_info=None):
+            pending['status'], pending['headers'], pending['exc_info'] = status, headers, exc_info
+            return write
+
+        app_iter = self.wsgi_app(environ, capture_start_response)
+        return self._respond(app_iter, pending, encoding, tagged, start_response)
+
+    def _respond(self, app_iter, pending, encoding, tagged, start_response):
+        try:
+            chunks = iter(app_iter)
+            buffered, size = [], 0
+            # อ่านจนเกิน min_size ก่อนตัดสินใจ response ที่ไม่มี Content-Length (เช่น stream) ก็ใช้เกณฑ์เดียวกัน
+            for chunk in chunks:
+                if chunk:
+                    buffered.append(chunk)
+                    size += len(chunk)
+                if size >= self.min_size:
+                    break
+            status, headers = pending['status'], pending['headers']
+            if not self._compressible(status, headers) or size < self.min_size:
+                if tagged and status.startswith('304'):
+                    headers = self._tag_etag(headers, encoding)
+                start_response(status, headers, pending['exc_info'])
+                yield from buffered
+                yield from chunks
+                return
+
+            headers = [(k, v) for k, v in headers if k.lower() not in ('content-length', 'content-md5')]
+            vary = [v for k, v in headers if k.lower() == 'vary']
+            headers = [(k, v) for k, v in headers if k.lower() != 'vary']
+            headers.append(('Vary', ', '.join(vary + ['Accept-Encoding']) if vary else 'Accept-Encoding'))
+            headers.append(('Content-Encoding', encoding))
+            headers = self._tag_etag(headers, encoding)
+            start_response(status, headers, pending['exc_info'])
+
+            compressor = _StreamCompressor(encoding, self.level, self.brotli_quality)
+            data = compressor.compress(b''.join(buffered))
+            if data:
+                yield data
+            for chunk in chunks:
+                if chunk:
+                    data = compressor.compress(chunk)
+                    if data:
+                        yield data
+            yield compressor.finish()
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+if app.config['COMPRESS']:
+    app.wsgi_app = CompressionMiddleware(
+        app.wsgi_app,
+        min_size=app.config['COMPRESS_MIN_SIZE'],
+        level=app.config['COMPRESS_LEVEL'],
+        brotli_quality=app.config['COMPRESS_BROTLI_QUALITY'],
+    )
+
 # ========================
 # Context Processor
 # ========================
@@ -450,6 +2097,76 @@ def inject_global_data():
         verifying_count=verifying_count
     )
 
+# ========================
+# Conditional GET (ETag / Last-Modified)
+# ========================
+
+_release_id = None
+
+def release_id():
+    """fingerprint ของ template + asset manifest ชุดปัจจุบัน ให้ ETag เปลี่ยนเมื่อ deploy หน้าตาใหม่"""
+    global _release_id
+    if _release_id is None:
+        digest = hashlib.sha1(json.dumps(_asset_manifest, sort_keys=True).encode())
+        template_dir = os.path.join(app.root_path, app.template_folder)
+        for name in sorted(os.listdir(template_dir)):
+            stat = os.stat(os.path.join(template_dir, name))
+            digest.update(f"{name}:{stat.st_mtime_ns}:{stat.st_size}".encode())
+        _release_id = digest.hexdigest()[:12]
+    return _release_id
+
+def parse_db_timestamp(value):
+    """แปลงเวลา UTC จาก SQLite (ข้อความ หรือ datetime จาก converter) เป็น datetime ที่มี timezone สำหรับ header Last-Modified"""
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.replace(tzinfo=ZoneInfo("UTC"))
+
+def get_catalog_version():
+    conn = get_read_connection()
+    row = conn.execute("SELECT version, updated_at FROM catalog_meta WHERE id = 1").fetchone()
+    conn.close()
+    return row['version'], parse_db_timestamp(row['updated_at'])
+
+def make_etag(*parts):
+    return hashlib.sha1('|'.join(map(str, parts)).encode()).hexdigest()
+
+def is_not_modified(etag, last_modified):
+    """If-None-Match มาก่อน If-Modified-Since ตาม RFC 9110"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified and request.if_modified_since:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+def set_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
+
+def conditional_page(etag_parts, last_modified, render):
+    """ตอบ 304 โดยไม่ render template ถ้า browser มีหน้าเวอร์ชันเดียวกันอยู่แล้ว
+
+    หน้าร้านแสดงชื่อผู้ใช้และจำนวนในตะกร้าจาก session จึงรวมค่าพวกนี้ไว้ใน ETag และตั้ง private
+    ข้ามเมื่อมี flash message ค้างอยู่หรือเป็นแอดมิน (layout แสดงจำนวนสลิปรอตรวจ)
+    """
+    if session.get('role') == 'admin' or session.get('_flashes'):
+        return render()
+    cart_total_items, _ = get_cart_total()
+    etag = make_etag(release_id(), *etag_parts, session.get('user_id'), session.get('username'),
+                     session.get('full_name'), cart_total_items)
+    if is_not_modified(etag, last_modified):
+        response = app.response_class(status=304)
+    else:
+        response = make_response(render())
+        if response.status_code != 200:
+            return response
+    response.cache_control.private = True
+    return set_validators(response, etag, last_modified)
+
 # ========================
 # Routes - Main Pages
 # ========================
@@ -478,27 +2195,81 @@ def index():
 
 @app.route('/category/<int:category_id>')
 def category_by_id(category_id):
-    categories = get_categories()
-    products = get_products_by_category(category_id)
-    category_name = None
-    for cat in categories:
-        if cat['id'] == category_id:
-            category_name = cat['name']
-            break
-    if not category_name:
-        flash('ไม่พบหมวดหมู่ที่ต้องการ')
-        return redirect(url_for('index'))
-    return render_template('category.html',
-                         products=products,
-                         category_name=category_name)
+    version, last_modified = get_catalog_version()
+
+    def render():
+        categories = get_categories()
+        products = get_products_by_category(category_id)
+        category_name = None
+        for cat in categories:
+            if cat['id'] == category_id:
+                category_name = cat['name']
+                break
+        if not category_name:
+            flash('ไม่พบหมวดหมู่ที่ต้องการ')
+            return redirect(url_for('index'))
+        return render_template('category.html',
+                             products=products,
+                             category_name=category_name)
+
+    return conditional_page(('category', category_id, version), last_modified, render)
 
 @app.route('/product/<int:product_id>')
 def product_detail(product_id):
-    product = get_product_by_id(product_id)
-    if not product:
+    # อ่านแค่เวลาแก้ไขล่าสุดก่อน ถ้า browser มีเวอร์ชันนี้แล้วตอบ 304 ได้เลย
+    # layout แสดงเมนูหมวดหมู่ด้วย จึงรวม catalog_meta (เปลี่ยนทุกครั้งที่ products/categories เปลี่ยน) ไว้ใน validator
+    conn = get_read_connection()
+    row = conn.execute("""
+        SELECT COALESCE(p.updated_at, p.created_at) AS updated_at,
+               m.version AS catalog_version, m.updated_at AS catalog_updated_at
+        FROM products p
+        JOIN categories c ON p.category_id = c.id
+        JOIN catalog_meta m ON m.id = 1
+        WHERE p.id = ?
+    """, (product_id,)).fetchone()
+    conn.close()
+    if not row:
         flash('ไม่พบสินค้าที่ต้องการ')
         return redirect(url_for('index'))
-    return render_template('product_detail.html', product=product)
+
+    def render():
+        product = get_product_by_id(product_id)
+        return render_template('product_detail.html', product=product)
+
+    last_modified = max(filter(None, (parse_db_timestamp(row['updated_at']),
+                                      parse_db_timestamp(row['catalog_updated_at']))), default=None)
+    return conditional_page(('product', product_id, row['updated_at'], row['catalog_version']), last_modified, render)
+
+@app.route('/api/catalog')
+def api_catalog():
+    """แคตตาล็อกสินค้าที่เปิดขายแบบอ่านอย่างเดียว (public) สำหรับ main.js พร้อม ETag/Last-Modified"""
+    version, last_modified = get_catalog_version()
+    etag = make_etag('catalog', version)
+    if is_not_modified(etag, last_modified):
+        response = app.response_class(status=304)
+    else:
+        conn = get_read_connection()
+        categories = conn.execute("""
+            SELECT id, name, name_en, icon, display_order FROM categories ORDER BY display_order
+        """).fetchall()
+        products = conn.execute("""
+            SELECT id, name, name_en, description, price, image, category_id, is_featured, stock_quantity
+            FROM products
+            WHERE is_orderable = 1
+            ORDER BY category_id, created_at DESC
+        """).fetchall()
+        conn.close()
+        response = jsonify({
+            'success': True,
+            'version': version,
+            'categories': [dict(c) for c in categories],
+            'products': [
+                dict(p, image_url=url_for('static', filename='images/products/' + p['image']) if p['image'] else None)
+                for p in products
+            ],
+        })
+    response.cache_control.public = True
+    return set_validators(response, etag, last_modified)
 
 # ========================
 # Authentication Routes
@@ -522,6 +2293,7 @@ def login():
             resp = make_response(redirect(url_for('admin') if user['role'] == 'admin' else url_for('index')))
 
             if remember:
+                import base64
                 # เก็บ username + password ใน cookie
                 resp.set_cookie('remembered_username', username, max_age=30*24*60*60)
                 encoded_password = base64.b64encode(password.encode()).decode()
@@ -538,6 +2310,7 @@ def login():
     remembered_username = request.cookies.get('remembered_username', '')
     remembered_password = request.cookies.get('remembered_password', '')
     if remembered_password:
+        import base64
         remembered_password = base64.b64decode(remembered_password).decode()
     return render_template('login.html', remembered_username=remembered_username, remembered_password=remembered_password)
 
@@ -625,6 +2398,8 @@ def add_to_cart():
     product = get_product_by_id(int(product_id))
     if not product:
         return jsonify({'success': False, 'message': 'ไม่พบสินค้า'})
+    if not product['is_orderable']:
+        return jsonify({'success': False, 'message': 'สินค้าหมดหรือปิดการขายชั่วคราว'})
 
     cart = session.get('cart', {})
     cart_key = f"{product_id}_{options}" if options else product_id
@@ -635,7 +2410,7 @@ def add_to_cart():
         cart[cart_key] = {
             'id': product['id'],
             'name': product['name'],
-            'price': float(product['price']),
+            'price': product['price'],
             'image': product['image'],
             'quantity': quantity,
             'options': options
@@ -690,8 +2465,7 @@ def remove_from_cart():
         del cart[product_id]
         session['cart'] = cart
 
-        total_items = sum(item['quantity'] for item in cart.values())
-        total_price = sum(item['price'] * item['quantity'] for item in cart.values())
+        total_items, total_price = get_cart_total()
 
         return jsonify({
             'success': True,
@@ -716,6 +2490,48 @@ def clear_cart():
 # Checkout Routes
 # ========================
 
+def place_order(conn, user_id, items, total_price, customer_name, customer_phone, customer_address,
+                notes, delivery_method, payment_method, address=None):
+    """write unit: สร้าง order (พร้อม snapshot ของ address ที่เลือก), order_items, ตัดสต็อกผ่าน ledger และ payment คืน order_id"""
+    shipping = (address.id, address.recipient_name, address.phone, address.address, address.city,
+                address.province, address.postal_code) if address else (None,) * 7
+    cursor = conn.execute("""
+        INSERT INTO orders 
+        (user_id, total_amount, customer_name, customer_phone, customer_address, notes, status, delivery_method, payment_method,
+         address_id, ship_recipient_name, ship_phone, ship_address, ship_city, ship_province, ship_postal_code)
+        VALUES (?, ?, ?, ?, ?, ?, 'pending', ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (user_id, total_price, customer_name, customer_phone, customer_address, notes, delivery_method, payment_method,
+          *shipping))
+    order_id = cursor.lastrowid
+
+    # เพิ่ม order_items และลด stock
+    for item in items:
+        conn.execute("""
+            INSERT INTO order_items 
+            (order_id, product_id, quantity, unit_price, total_price, options)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (order_id, item['id'], item['quantity'], item['price'], item['price'] * item['quantity'], item.get('options', '')))
+
+        # ตัดสต็อกด้วยการเพิ่มแถว sale ใน ledger เฉพาะเมื่อสต็อกพอ
+        updated = conn.execute("""
+            INSERT INTO inventory_movements (product_id, delta, reason, order_id, user_id)
+            SELECT id, -?, 'sale', ?, ?
+            FROM products
+            WHERE id = ? AND stock_quantity >= ?
+        """, (item['quantity'], order_id, user_id, item['id'], item['quantity']))
+
+        # total_changes นับสะสมทั้ง connection (รวม INSERT ข้างบน) จึงไม่เคยเป็น 0
+        if updated.rowcount == 0:
+            raise Exception(f"สินค้ารหัส {item['id']} มีไม่เพียงพอ")
+
+    # สร้างข้อมูล payment
+    payment_status = 'paid' if payment_method == 'cod' else 'pending'
+    conn.execute("""
+        INSERT INTO payments (order_id, payment_method, amount, status)
+        VALUES (?, ?, ?, ?)
+    """, (order_id, payment_method, total_price, payment_status))
+    return order_id
+
 @app.route("/checkout", methods=["GET", "POST"])
 @login_required
 def checkout():
@@ -725,16 +2541,7 @@ def checkout():
         return redirect(url_for('index'))
 
     conn = get_db_connection()
-    addresses = conn.execute("""
-        SELECT id,
-               address || 
-               CASE WHEN city IS NOT NULL THEN ', ' || city ELSE '' END ||
-               CASE WHEN postal_code IS NOT NULL THEN ', ' || postal_code ELSE '' END ||
-               CASE WHEN province IS NOT NULL THEN ', ' || province ELSE '' END
-               AS full_address
-        FROM addresses
-        WHERE user_id = ?
-    """, (session['user_id'],)).fetchall()
+    addresses = Address.query(conn, "SELECT * FROM addresses WHERE user_id = ?", (session['user_id'],)).fetchall()
     conn.close()
 
     total_items, total_price = get_cart_total()
@@ -746,8 +2553,9 @@ def checkout():
         payment_method = request.form.get('payment_method', 'cod')
         notes = request.form.get('notes', '')
 
-        # จัดการที่อยู่
+        # จัดการที่อยู่ (ที่อยู่ที่เลือกถูกเก็บเป็น snapshot บน order)
         customer_address = ""
+        address = None
         if delivery_method == 'delivery':
             customer_address_id = request.form.get('customer_address')
             if not customer_address_id:
@@ -758,49 +2566,23 @@ def checkout():
                                      total_price=total_price,
                                      addresses=addresses)
             
-            conn = get_db_connection()
-            address_row = conn.execute("SELECT * FROM addresses WHERE id = ?", (customer_address_id,)).fetchone()
-            if address_row:
-                customer_address = f"{address_row['recipient_name']}, {address_row['address']}, {address_row['city'] or ''}, {address_row['postal_code'] or ''}, {address_row['province'] or ''}"
-            conn.close()
+            address = next((a for a in addresses if str(a.id) == customer_address_id), None)
+            if not address:
+                flash('ไม่พบที่อยู่จัดส่งที่เลือก')
+                return render_template('checkout.html',
+                                     cart_items=cart,
+                                     total_items=total_items,
+                                     total_price=total_price,
+                                     addresses=addresses)
+            customer_address = f"{address.recipient_name}, {address.full_address}"
         else:
-            customer_address = "รับที่ร้าน Sweet Dreams Bakery"
+            customer_address = PICKUP_ADDRESS
 
         # สร้าง order
-        conn = get_db_connection()
         try:
-            cursor = conn.execute("""
-                INSERT INTO orders 
-                (user_id, total_amount, customer_name, customer_phone, customer_address, notes, status, delivery_method, payment_method)
-                VALUES (?, ?, ?, ?, ?, ?, 'pending', ?, ?)
-            """, (session['user_id'], total_price, customer_name, customer_phone, customer_address, notes, delivery_method, payment_method))
-            order_id = cursor.lastrowid
-
-            # เพิ่ม order_items และลด stock
-            for item in cart.values():
-                conn.execute("""
-                    INSERT INTO order_items 
-                    (order_id, product_id, quantity, unit_price, total_price, options)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (order_id, item['id'], item['quantity'], item['price'], item['price'] * item['quantity'], item.get('options', '')))
-
-                conn.execute("""
-                    UPDATE products
-                    SET stock_quantity = stock_quantity - ?
-                    WHERE id = ? AND stock_quantity >= ?
-                """, (item['quantity'], item['id'], item['quantity']))
-
-                if conn.total_changes == 0:
-                    raise Exception(f"สินค้ารหัส {item['id']} มีไม่เพียงพอ")
-
-            # สร้างข้อมูล payment
-            payment_status = 'paid' if payment_method == 'cod' else 'pending'
-            conn.execute("""
-                INSERT INTO payments (order_id, payment_method, amount, status)
-                VALUES (?, ?, ?, ?)
-            """, (order_id, payment_method, total_price, payment_status))
-
-            conn.commit()
+            order_id = run_write(place_order, session['user_id'], list(cart.values()), total_price,
+                                 customer_name, customer_phone, customer_address, notes,
+                                 delivery_method, payment_method, address)
             session['cart'] = {}
 
             # ถ้าเลือก PromptPay ให้ไป payment page
@@ -811,10 +2593,7 @@ def checkout():
                 return redirect(url_for('order_detail', order_id=order_id))
 
         except Exception as e:
-            conn.rollback()
             flash(f'เกิดข้อผิดพลาด: {str(e)}')
-        finally:
-            conn.close()
 
     return render_template('checkout.html',
                            cart_items=cart,
@@ -853,9 +2632,7 @@ def payment_page(order_id):
     
     # สร้าง QR Code PromptPay
     promptpay_id = "0891234567"  # เปลี่ยนเป็นเบอร์ PromptPay จริงของร้าน
-    amount = float(order['total_amount'])
-    
-    qr_data = generate_promptpay_qr(promptpay_id, amount)
+    qr_data = generate_promptpay_qr(promptpay_id, order['total_amount'])
     
     return render_template('payment.html',
                          order=dict(order),
@@ -864,6 +2641,24 @@ def payment_page(order_id):
                          promptpay_id=promptpay_id)
 
 
+def confirm_payment_slip(conn, order_id, filename, fingerprint=None):
+    """write unit: บันทึกสลิปที่ลูกค้าส่ง และย้ายคำสั่งซื้อไป processing"""
+    conn.execute("""
+        UPDATE payments 
+        SET status = 'verifying', 
+            paid_at = CURRENT_TIMESTAMP,
+            slip_image = ?
+        WHERE order_id = ?
+    """, (filename, order_id))
+    
+    # อัพเดทสถานะคำสั่งซื้อ
+    conn.execute("""
+        UPDATE orders 
+        SET status = 'processing'
+        WHERE id = ?
+    """, (order_id,))
+    record_slip_hash(conn, order_id, filename, fingerprint)
+
 @app.route('/confirm_payment/<int:order_id>', methods=['POST'])
 @login_required
 def confirm_payment(order_id):
@@ -879,12 +2674,13 @@ def confirm_payment(order_id):
     order = conn.execute("""
         SELECT * FROM orders WHERE id = ? AND user_id = ?
     """, (order_id, session['user_id'])).fetchone()
+    conn.close()
     
     if not order:
-        conn.close()
         return jsonify({'success': False, 'message': 'ไม่พบคำสั่งซื้อ'})
 
     try:
+        import base64
         # แยก Base64 header
         if ',' in slip_base64:
             header, slip_base64 = slip_base64.split(',', 1)
@@ -899,35 +2695,17 @@ def confirm_payment(order_id):
         os.makedirs(UPLOAD_FOLDER1, exist_ok=True)
         filepath = os.path.join(UPLOAD_FOLDER1, secure_filename(filename))
         
-        with open(filepath, 'wb') as f:
-            f.write(file_data)
-        
-        # อัพเดท DB เก็บชื่อไฟล์
-        conn.execute("""
-            UPDATE payments 
-            SET status = 'verifying', 
-                paid_at = CURRENT_TIMESTAMP,
-                slip_image = ?
-            WHERE order_id = ?
-        """, (filename, order_id))
-        
-        # อัพเดทสถานะคำสั่งซื้อ
-        conn.execute("""
-            UPDATE orders 
-            SET status = 'processing'
-            WHERE id = ?
-        """, (order_id,))
-        
-        conn.commit()
-        conn.close()
+        with open(filepath, 'wb') as f:
+            f.write(file_data)
+        
+        # อัพเดท DB เก็บชื่อไฟล์และสถานะคำสั่งซื้อ
+        run_write(confirm_payment_slip, order_id, filename, slip_fingerprint(filepath))
         
         return jsonify({
             'success': True,
             'message': 'ยืนยันการชำระเงินเรียบร้อย รอแอดมินตรวจสอบ'
         })
     except Exception as e:
-        conn.rollback()
-        conn.close()
         return jsonify({'success': False, 'message': str(e)})
 
 @app.route('/check_payment_method/<int:order_id>')
@@ -955,6 +2733,33 @@ def get_payment_counts():
     conn.close()
     return counts['pending_count'], counts['verifying_count'], counts['paid_count']
 
+def verify_payment(conn, order_id, action):
+    """write unit: อนุมัติ (paid + processing) หรือปฏิเสธ (rejected + pending) การชำระเงิน"""
+    if action == 'approve':
+        conn.execute("""
+            UPDATE payments 
+            SET status = 'paid', paid_at = ?
+            WHERE order_id = ?
+        """, (datetime.now(), order_id))
+        
+        conn.execute("""
+            UPDATE orders 
+            SET status = 'processing'
+            WHERE id = ?
+        """, (order_id,))
+    else:
+        conn.execute("""
+            UPDATE payments 
+            SET status = 'rejected'
+            WHERE order_id = ?
+        """, (order_id,))
+        
+        conn.execute("""
+            UPDATE orders 
+            SET status = 'pending'
+            WHERE id = ?
+        """, (order_id,))
+
 @app.route('/admin/verify_payment/<int:order_id>', methods=['POST'])
 def admin_verify_payment(order_id):
     if session.get('role') != 'admin':
@@ -962,57 +2767,27 @@ def admin_verify_payment(order_id):
     
     data = request.get_json()
     action = data.get('action')  # 'approve' or 'reject'
-    
-    conn = get_db_connection()
-    
-    try:
-        message = None  # ป้องกัน error กรณี action ไม่ถูกต้อง
-
-        if action == 'approve':
-            conn.execute("""
-                UPDATE payments 
-                SET status = 'paid', paid_at = ?
-                WHERE order_id = ?
-            """, (datetime.now(), order_id))
-            
-            conn.execute("""
-                UPDATE orders 
-                SET status = 'processing'
-                WHERE id = ?
-            """, (order_id,))
-            
-            message = 'อนุมัติการชำระเงินเรียบร้อย'
 
-        elif action == 'reject':
-            conn.execute("""
-                UPDATE payments 
-                SET status = 'rejected'
-                WHERE order_id = ?
-            """, (order_id,))
-            
-            conn.execute("""
-                UPDATE orders 
-                SET status = 'pending'
-                WHERE id = ?
-            """, (order_id,))
-            
-            message = 'ปฏิเสธการชำระเงิน'
+    if action == 'approve':
+        message = 'อนุมัติการชำระเงินเรียบร้อย'
+    elif action == 'reject':
+        message = 'ปฏิเสธการชำระเงิน'
+    else:
+        return jsonify({'success': False, 'message': 'action ไม่ถูกต้อง'}), 400
 
-        else:
-            return jsonify({'success': False, 'message': 'action ไม่ถูกต้อง'}), 400
-        
-        conn.commit()
+    try:
+        run_write(verify_payment, order_id, action)
         return jsonify({'success': True, 'message': message})
-    
     except Exception as e:
-        conn.rollback()
         return jsonify({'success': False, 'message': str(e)})
-    
-    finally:
-        conn.close()
 
 def generate_promptpay_qr(promptpay_id, amount):
-    """สร้าง QR Code สำหรับ PromptPay"""
+    """สร้าง QR Code สำหรับ PromptPay (amount เป็นสตางค์)"""
+    # import เฉพาะตอนใช้ worker ที่ไม่เคยแสดง QR จะได้ไม่ต้องโหลด qrcode/PIL
+    import base64
+    from io import BytesIO
+    import qrcode
+
     # ลบขีดและช่องว่างออก
     promptpay_id = promptpay_id.replace('-', '').replace(' ', '')
     
@@ -1027,7 +2802,7 @@ def generate_promptpay_qr(promptpay_id, amount):
     
     # เพิ่มจำนวนเงิน
     if amount > 0:
-        amount_str = f"{amount:.2f}"
+        amount_str = f"{amount // 100}.{amount % 100:02d}"
         payload += f"5802TH5303764{len(amount_str):02d}{amount_str}"
     else:
         payload += "5802TH5303764"
@@ -1087,6 +2862,14 @@ def profile():
     conn.close()
     return render_template('profile.html', user=user, orders=orders)
 
+def update_user_profile(conn, user_id, full_name, phone, address, birthday):
+    """write unit: แก้ข้อมูลส่วนตัวของผู้ใช้"""
+    conn.execute("""
+        UPDATE users
+        SET full_name = ?, phone = ?, address = ?, birthday = ?
+        WHERE id = ?
+    """, (full_name, phone, address, birthday, user_id))
+
 @app.route("/update_profile", methods=["POST"])
 def update_profile():
     if "user_id" not in session:
@@ -1099,20 +2882,11 @@ def update_profile():
     address = request.form.get("address", "")
     birthday = request.form.get("birthday", "")
 
-    conn = get_db_connection()
     try:
-        conn.execute("""
-            UPDATE users
-            SET full_name = ?, phone = ?, address = ?, birthday = ?
-            WHERE id = ?
-        """, (full_name, phone, address, birthday, user_id))
-        conn.commit()
+        run_write(update_user_profile, user_id, full_name, phone, address, birthday)
         flash("อัปเดตข้อมูลส่วนตัวเรียบร้อยแล้ว")
     except Exception as e:
-        conn.rollback()
         flash(f"เกิดข้อผิดพลาด: {str(e)}")
-    finally:
-        conn.close()
 
     return redirect(url_for("profile"))
 
@@ -1169,64 +2943,33 @@ def change_password():
 
 @app.route('/order/<int:order_id>')
 def order_detail(order_id):
-    conn = get_db_connection()
-    order = conn.execute("SELECT * FROM orders WHERE id=?", (order_id,)).fetchone()
+    conn = get_db_connection(with_archive=True, parse_types=True)
+    order = Order.query(conn, "SELECT * FROM all_orders WHERE id=?", (order_id,)).fetchone()
     
     if not order:
         conn.close()
         return "ไม่พบคำสั่งซื้อ", 404
 
-    # แปลง Row เป็น dict
-    order = dict(order)
-
-    # แปลง created_at เป็น datetime
-    if order.get("created_at"):
-        try:
-            order["created_at"] = datetime.fromisoformat(order["created_at"])
-        except ValueError:
-            order["created_at"] = None
-
-    # ดึงที่อยู่ล่าสุดของผู้ใช้
-    addr = None
-    if order.get('user_id'):
-        addr_row = conn.execute("""
-            SELECT *,
-                   address || 
-                   CASE WHEN city IS NOT NULL THEN ', ' || city ELSE '' END ||
-                   CASE WHEN province IS NOT NULL THEN ', ' || province ELSE '' END   ||          
-                   CASE WHEN postal_code IS NOT NULL THEN ', ' || postal_code ELSE '' END 
-                   AS full_address
-            FROM addresses
-            WHERE user_id = ?
-            ORDER BY id DESC
-            LIMIT 1
-        """, (order['user_id'],)).fetchone()
-        if addr_row:
-            addr = dict(addr_row)
-
     # ตรวจสอบสิทธิ์: ผู้ใช้ปกติดูได้เฉพาะของตัวเอง
     if session.get("role") != "admin":
-        if session.get("user_id") != order.get("user_id"):
+        if session.get("user_id") != order.user_id:
             conn.close()
             flash("คุณไม่มีสิทธิ์เข้าดูคำสั่งซื้อนี้")
             return redirect(url_for("order_history"))
 
     # ดึงสินค้า
-    items = conn.execute("""
+    items = OrderItem.query(conn, """
         SELECT oi.*, p.name AS product_name, p.price AS product_price
-        FROM order_items oi
+        FROM all_order_items oi
         JOIN products p ON oi.product_id = p.id
         WHERE oi.order_id=?
     """, (order_id,)).fetchall()
-    items = [dict(i) for i in items]
 
     # ✅ ดึงข้อมูล payment
-    payment = conn.execute("SELECT * FROM payments WHERE order_id=?", (order_id,)).fetchone()
-    if payment:
-        payment = dict(payment)
+    payment = Payment.query(conn, "SELECT * FROM all_payments WHERE order_id=?", (order_id,)).fetchone()
 
     conn.close()
-    return render_template("order_detail.html", order=order, addr=addr, items=items, payment=payment)
+    return render_template("order_detail.html", order=order, items=items, payment=payment)
 
 
 
@@ -1252,16 +2995,13 @@ def cancel_order(order_id):
         return jsonify({'success': False, 'message': 'ไม่พบคำสั่งซื้อหรือไม่สามารถยกเลิกได้'})
 
     try:
-        items = conn.execute("""
-            SELECT product_id, quantity FROM order_items WHERE order_id = ?
-        """, (order_id,)).fetchall()
-
-        for item in items:
-            conn.execute("""
-                UPDATE products
-                SET stock_quantity = stock_quantity + ?
-                WHERE id = ?
-            """, (item['quantity'], item['product_id']))
+        # คืนสต็อกทุกรายการด้วย INSERT เดียวลง ledger
+        conn.execute("""
+            INSERT INTO inventory_movements (product_id, delta, reason, order_id, user_id)
+            SELECT product_id, quantity, 'cancel', order_id, ?
+            FROM order_items
+            WHERE order_id = ? AND product_id IS NOT NULL
+        """, (session.get('user_id'), order_id))
 
         # บันทึก status เป็น cancelled และเก็บเวลายกเลิก
         cancelled_time = datetime.now()
@@ -1324,7 +3064,7 @@ def reorder(order_id):
         cart[cart_key] = {
             'id': item['product_id'],
             'name': item['name'],
-            'price': float(item['price']),
+            'price': item['price'],
             'quantity': item['quantity'],
             'options': item['options'] or '',
             'image': item['image'] or ''  # เพิ่มตรงนี้เพื่อแสดงรูป
@@ -1375,77 +3115,69 @@ def admin():
                          new_users_today=new_users_today,
                          revenue_today=revenue_today)
 
-@app.route('/admin/orders')
-def admin_orders():
-    # ตรวจสอบสิทธิ์แอดมิน
+LOW_STOCK_THRESHOLD = 5
+
+@app.route('/admin/low_stock')
+def admin_low_stock():
     if session.get('role') != 'admin':
         flash('คุณไม่มีสิทธิ์เข้าถึงหน้านี้')
         return redirect(url_for('index'))
 
+    threshold = request.args.get('threshold', LOW_STOCK_THRESHOLD, type=int)
     conn = get_db_connection()
-    
-    # ดึงคำสั่งซื้อทั้งหมด
-    orders_raw = conn.execute("SELECT * FROM orders ORDER BY created_at DESC").fetchall()
-    orders = []
-
-    for order_row in orders_raw:
-        order = dict(order_row)  # แปลง Row เป็น dict
-
-        # แปลง created_at เป็น datetime
-        if order.get('created_at'):
-            try:
-                order['created_at'] = datetime.strptime(order['created_at'], "%Y-%m-%d %H:%M:%S")
-            except ValueError:
-                order['created_at'] = None
-
-        # ดึงที่อยู่ผู้รับ
-        if order.get('address_id'):
-            addr = conn.execute(
-                "SELECT * FROM addresses WHERE id=?",
-                (order['address_id'],)
-            ).fetchone()
-            if addr:
-                order['address'] = f"{addr['address']}, {addr.get('city','')}, {addr.get('province','')}, {addr.get('postal_code','')}"
-            else:
-                order['address'] = '-'
-        else:
-            order['address'] = '-'
-
-        # ดึงรายการสินค้า
-        items_raw = conn.execute(
-            """
-            SELECT oi.*, p.name AS product_name, p.price AS unit_price
-            FROM order_items oi
-            LEFT JOIN products p ON oi.product_id = p.id
-            WHERE oi.order_id=?
-            """,
-            (order['id'],)
-        ).fetchall()
-
-        items = []
-        for item in items_raw:
-            items.append({
-                'product_name': item['product_name'] or '-',
-                'quantity': item['quantity'],
-                'price': float(item['unit_price'] or 0),
-                'total': float(item['quantity'] * (item['unit_price'] or 0))
-            })
+    # ทั้งสอง query อ่านจาก partial index (idx_products_orderable_stock, idx_products_sold_out)
+    low_stock = conn.execute("""
+        SELECT id, name, stock_quantity, updated_at
+        FROM products
+        WHERE is_orderable = 1 AND stock_quantity <= ?
+        ORDER BY stock_quantity
+    """, (threshold,)).fetchall()
+    sold_out = conn.execute("""
+        SELECT id, name, stock_quantity, updated_at
+        FROM products
+        WHERE is_available = 1 AND is_orderable = 0
+        ORDER BY updated_at DESC
+    """).fetchall()
+    conn.close()
+    return render_template('admin_low_stock.html',
+                           low_stock=low_stock,
+                           sold_out=sold_out,
+                           threshold=threshold)
 
-        order['items'] = items
-        order['item_count'] = len(items)
-        # คำนวณยอดรวมทั้งหมด
-        order['total_amount'] = sum(i['total'] for i in items)
+@app.route('/admin/orders')
+def admin_orders():
+    # ตรวจสอบสิทธิ์แอดมิน
+    if session.get('role') != 'admin':
+        flash('คุณไม่มีสิทธิ์เข้าถึงหน้านี้')
+        return redirect(url_for('index'))
 
-        orders.append(order)
+    conn = get_db_connection(parse_types=True)
 
-        verifying_count = conn.execute("""
+    # สถิติตามสถานะคำนวณใน SQL จะได้ไม่ต้องโหลดทุก order มาไว้ในหน่วยความจำ
+    status_counts = {row['status']: row['count'] for row in conn.execute(
+        "SELECT status, COUNT(*) AS count FROM orders GROUP BY status"
+    )}
+    verifying_count = conn.execute("""
         SELECT COUNT(*) FROM payments WHERE status = 'verifying'
-        """).fetchone()[0]
-        
-    conn.close()
-    return render_template('admin_orders.html', 
-                           orders=orders,
-                           verifying_count=verifying_count)
+    """).fetchone()[0]
+
+    # ยอดรวมคิดจากรายการสินค้า x ราคาปัจจุบัน, อ่านทีละแถว (Order) จาก cursor ระหว่าง stream
+    orders = Order.query(conn, """
+        SELECT o.id, o.status, o.customer_name, o.customer_phone, o.created_at,
+               (SELECT COUNT(*) FROM order_items oi WHERE oi.order_id = o.id) AS item_count,
+               (SELECT COALESCE(SUM(oi.quantity * COALESCE(p.price, 0)), 0)
+                FROM order_items oi
+                LEFT JOIN products p ON oi.product_id = p.id
+                WHERE oi.order_id = o.id) AS total_amount
+        FROM orders o
+        ORDER BY o.created_at DESC
+    """)
+
+    return stream_page(conn, 'admin_orders.html',
+                       orders=orders,
+                       status_counts=status_counts,
+                       order_count=sum(status_counts.values()),
+                       verifying_count=verifying_count)
 
 
 @app.route("/admin/print_order/<int:order_id>")
@@ -1454,95 +3186,44 @@ def admin_print_order(order_id):
         flash('คุณไม่มีสิทธิ์เข้าถึงหน้านี้')
         return redirect(url_for('index'))
 
-    conn = get_db_connection()
+    conn = get_db_connection(parse_types=True)
     
     try:
-        # ดึงข้อมูลคำสั่งซื้อ พร้อมข้อมูลลูกค้า
-        order_row = conn.execute("""
+        # ดึงข้อมูลคำสั่งซื้อ พร้อมข้อมูลลูกค้า (created_at เป็น datetime จาก converter)
+        order = Order.query(conn, """
             SELECT o.*, u.email as customer_email, u.username
             FROM orders o
             LEFT JOIN users u ON o.user_id = u.id
             WHERE o.id = ?
         """, (order_id,)).fetchone()
         
-        if not order_row:
+        if not order:
             flash('ไม่พบคำสั่งซื้อ')
             return redirect(url_for('admin_orders'))
 
-        # แปลง Row เป็น dict
-        order = dict(order_row)
-
-        # แปลง created_at เป็น datetime object
-        if order.get("created_at"):
-            try:
-                if isinstance(order["created_at"], str):
-                    # ลองหลายรูปแบบ datetime
-                    formats = [
-                        "%Y-%m-%d %H:%M:%S",
-                        "%Y-%m-%d %H:%M:%S.%f",
-                        "%Y-%m-%dT%H:%M:%S",
-                        "%Y-%m-%dT%H:%M:%S.%f"
-                    ]
-                    
-                    parsed_date = None
-                    for fmt in formats:
-                        try:
-                            parsed_date = datetime.strptime(order["created_at"], fmt)
-                            break
-                        except ValueError:
-                            continue
-                    
-                    order["created_at"] = parsed_date or datetime.now()
-            except (ValueError, TypeError):
-                order["created_at"] = datetime.now()
-
         # ดึงรายการสินค้า พร้อมชื่อสินค้า
-        items_rows = conn.execute("""
+        items = OrderItem.query(conn, """
             SELECT oi.*, p.name as product_name, p.image as product_image
             FROM order_items oi
             LEFT JOIN products p ON oi.product_id = p.id
             WHERE oi.order_id = ?
             ORDER BY oi.id
         """, (order_id,)).fetchall()
-        
-        # แปลง items เป็น list of dict
-        items = [dict(item) for item in items_rows]
 
         # คำนวณข้อมูลเพิ่มเติม
-        order['item_count'] = len(items)
+        order.item_count = len(items)
         
         # คำนวณยอดรวมใหม่ถ้าไม่มี (เผื่อข้อมูลเสีย)
-        if not order.get('total_amount') or order['total_amount'] == 0:
-            order['total_amount'] = sum(
-                item.get('total_price', 0) or 
-                (item.get('quantity', 0) * item.get('unit_price', 0))
+        if not order.total_amount:
+            order.total_amount = sum(
+                item.total_price or (item.quantity or 0) * (item.unit_price or 0)
                 for item in items
             )
 
-        # ดึงที่อยู่ลูกค้า (แก้ไขให้ใช้ user_id จาก order แทน session)
-        addr = None
-        if order.get('user_id'):
-            addr_rows = conn.execute("""
-                SELECT *,
-                       address || 
-                       CASE WHEN city IS NOT NULL THEN ', ' || city ELSE '' END ||
-                       CASE WHEN postal_code IS NOT NULL THEN ', ' || postal_code ELSE '' END ||
-                       CASE WHEN province IS NOT NULL THEN ', ' || province ELSE '' END
-                       AS full_address
-                FROM addresses
-                WHERE user_id = ?
-                ORDER BY id DESC
-                LIMIT 1
-            """, (order['user_id'],)).fetchone()
-            
-            if addr_rows:
-                addr = dict(addr_rows)
-
         return render_template(
             "print_order.html",
             order=order,
             items=items,
-            addr=addr,
             now=datetime.now(),
             show_qr=True  # เปิดใช้ QR code
         )
@@ -1683,11 +3364,14 @@ def safe_datetime_filter(value, format='%d/%m/%Y %H:%M'):
 
 @app.template_filter('format_currency')
 def format_currency(value):
-    """Format ตัวเลขเป็นสกุลเงิน"""
+    """แสดงจำนวนเงินสตางค์เป็นบาท เช่น 12000 -> '120', 125050 -> '1,250.50'"""
     try:
-        return "{:,.0f}".format(float(value or 0))
+        satang = int(value or 0)
     except (ValueError, TypeError):
         return "0"
+    baht, rest = divmod(abs(satang), 100)
+    text = f"{'-' if satang < 0 else ''}{baht:,}"
+    return f"{text}.{rest:02d}" if rest else text
 
 
 # ปรับปรุงการจัดการ order status
@@ -1712,59 +3396,121 @@ def admin_order_history():
         flash("คุณไม่มีสิทธิ์เข้าถึงหน้านี้", "danger")
         return redirect(url_for("index"))
 
-    conn = get_db_connection()
+    conn = get_db_connection(with_archive=True)
+    order_count = conn.execute("""
+        SELECT COUNT(*) FROM all_orders o JOIN users u ON o.user_id = u.id
+    """).fetchone()[0]
     orders = conn.execute("""
         SELECT o.*, u.username, u.email
-        FROM orders o
+        FROM all_orders o
         JOIN users u ON o.user_id = u.id
         ORDER BY o.created_at DESC
-    """).fetchall()
-    conn.close()
+    """)
 
-    return render_template("admin_order_history.html", orders=orders)
+    return stream_page(conn, "admin_order_history.html", orders=orders, order_count=order_count)
 
 @app.route('/admin/payments')
 def admin_payments():
     if session.get('role') != 'admin':
         return "ไม่มีสิทธิ์เข้าถึง", 403
 
-    payments = get_all_payments()
-
-    # ค่า default กัน key หาย
-    for p in payments:
-        p.setdefault('status', 'pending')
-        p.setdefault('amount', 0)
-        p.setdefault('payment_method', 'cod')
-        p.setdefault('customer_name', 'ไม่ระบุ')
-        p.setdefault('customer_phone', '-')
-        p.setdefault('created_at', datetime.now())
-        p.setdefault('paid_at', None)
-        p.setdefault('slip_image', None)
+    conn = get_db_connection(parse_types=True)
 
     # ====== นับตามสถานะ ======
-    pending_count = sum(1 for p in payments if p.get('payment_status') == 'pending')
-    verifying_count = sum(1 for p in payments if p.get('payment_status') == 'verifying')
-    paid_count = sum(
-        1 for p in payments
-        if (p.get('payment_method') == 'promptpay' and p.get('payment_status') == 'paid')
-        or (p.get('payment_method') == 'cod' and p.get('order_status') == 'delivered')
-    )
+    # PromptPay นับเมื่อ paid, COD นับเมื่อ order ถูกส่งแล้ว
+    counts = conn.execute("""
+        SELECT
+            COUNT(*) AS payment_count,
+            COALESCE(SUM(p.status = 'pending'), 0) AS pending_count,
+            COALESCE(SUM(p.status = 'verifying'), 0) AS verifying_count,
+            COALESCE(SUM(
+                (p.payment_method = 'promptpay' AND p.status = 'paid')
+                OR (p.payment_method = 'cod' AND o.status = 'delivered')
+            ), 0) AS paid_count,
+            COALESCE(SUM(CASE
+                WHEN (p.payment_method = 'promptpay' AND p.status = 'paid')
+                  OR (p.payment_method = 'cod' AND o.status = 'delivered')
+                THEN p.amount ELSE 0 END), 0) AS total_amount
+        FROM payments p
+        JOIN orders o ON p.order_id = o.id
+    """).fetchone()
 
-    total_amount = sum(
-        p.get('amount', 0) for p in payments
-        if (p.get('payment_method') == 'promptpay' and p.get('payment_status') == 'paid')
-        or (p.get('payment_method') == 'cod' and p.get('order_status') == 'delivered')
-    )
+    payments = Payment.query(conn, PAYMENTS_LIST_SQL)
 
-    return render_template(
+    return stream_page(
+        conn,
         'admin_payments.html',
         payments=payments,
-        pending_count=pending_count,
-        verifying_count=verifying_count,
-        paid_count=paid_count,
-        total_amount=total_amount
+        payment_count=counts['payment_count'],
+        pending_count=counts['pending_count'],
+        verifying_count=counts['verifying_count'],
+        paid_count=counts['paid_count'],
+        total_amount=counts['total_amount']
     )
 
+THAI_WEEKDAYS = ('จ.', 'อ.', 'พ.', 'พฤ.', 'ศ.', 'ส.', 'อา.')
+
+@app.route('/admin/production_plan')
+def admin_production_plan():
+    """แผนการอบจากตาราง production_plan (คำนวณโดย flask plan-production) ตั้งแต่วันนี้ตามเวลากรุงเทพฯ"""
+    if session.get('role') != 'admin':
+        flash('คุณไม่มีสิทธิ์เข้าถึงหน้านี้')
+        return redirect(url_for('index'))
+
+    today = datetime.now(ZoneInfo("Asia/Bangkok")).date().isoformat()
+    conn = get_read_connection()
+    rows = conn.execute("""
+        SELECT pp.product_id, p.name, pp.plan_date, pp.quantity, pp.forecast, pp.moving_average
+        FROM production_plan pp
+        JOIN products p ON p.id = pp.product_id
+        WHERE pp.plan_date >= ?
+        ORDER BY p.name, pp.plan_date
+    """, (today,)).fetchall()
+    last_run = conn.execute("SELECT * FROM planning_runs ORDER BY id DESC LIMIT 1").fetchone()
+    conn.close()
+
+    dates = sorted({row['plan_date'] for row in rows})
+    products = {}
+    for row in rows:
+        product = products.setdefault(row['product_id'], {'name': row['name'], 'moving_average': row['moving_average'],
+                                                          'days': {}, 'total': 0})
+        product['days'][row['plan_date']] = row
+        product['total'] += row['quantity']
+    days = [(d, THAI_WEEKDAYS[datetime.strptime(d, '%Y-%m-%d').weekday()]) for d in dates]
+    totals = {d: sum(p['days'][d]['quantity'] for p in products.values() if d in p['days']) for d in dates}
+    return render_template('admin_production_plan.html',
+                           products=sorted(products.values(), key=lambda p: -p['total']),
+                           days=days,
+                           totals=totals,
+                           last_run=last_run)
+
+@app.route('/admin/template_stats')
+def admin_template_stats():
+    """เวลา compile/render ราย template ตั้งแต่ process เริ่ม"""
+    if session.get('role') != 'admin':
+        return jsonify({'success': False, 'message': 'ไม่มีสิทธิ์เข้าถึง'}), 403
+    return jsonify({
+        'success': True,
+        'bytecode_cache': app.config['JINJA_CACHE_DIR'] if app.jinja_env.bytecode_cache else None,
+        'templates': get_template_stats()
+    })
+
+@app.route('/admin/sql_stats', methods=['GET', 'DELETE'])
+def admin_sql_stats():
+    """สถิติ SQL รวมตามคำสั่งที่ normalize แล้ว (ต้องเปิด BAKERY_SQL_PROFILE=1)"""
+    if session.get('role') != 'admin':
+        return jsonify({'success': False, 'message': 'ไม่มีสิทธิ์เข้าถึง'}), 403
+    if request.method == 'DELETE':
+        reset_sql_stats()
+        return jsonify({'success': True})
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify({
+        'success': True,
+        'enabled': app.config['SQL_PROFILE'],
+        'slow_query_ms': app.config['SLOW_QUERY_MS'],
+        'queries': get_sql_stats(limit)
+    })
+
 # ========================
 # Admin API Routes
 # ========================
@@ -1783,6 +3529,28 @@ def get_product(product_id):
     return jsonify({'error': 'ไม่พบสินค้า'}), 404
 
 
+@app.route('/admin/product/<int:product_id>/inventory', methods=['GET'])
+def get_product_inventory(product_id):
+    """สต็อกจาก ledger (snapshot ล่าสุด + tail) และ movement ล่าสุดของสินค้า"""
+    if session.get('role') != 'admin':
+        return jsonify({'success': False, 'message': 'ไม่มีสิทธิ์เข้าถึง'}), 403
+
+    limit = request.args.get('limit', 50, type=int)
+    conn = get_db_connection()
+    level = conn.execute("SELECT * FROM inventory_levels WHERE product_id = ?", (product_id,)).fetchone()
+    movements = conn.execute("""
+        SELECT id, delta, reason, order_id, user_id, created_at
+        FROM inventory_movements
+        WHERE product_id = ?
+        ORDER BY id DESC
+        LIMIT ?
+    """, (product_id, limit)).fetchall()
+    conn.close()
+    if not level:
+        return jsonify({'success': False, 'message': 'ไม่พบสินค้า'}), 404
+    return jsonify({'success': True, **dict(level), 'movements': [dict(m) for m in movements]})
+
+
 @app.route('/admin/add_product', methods=['POST'])
 def add_product():
     if session.get('role') != 'admin':
@@ -1792,27 +3560,26 @@ def add_product():
     name = request.form.get('name')
     name_en = request.form.get('name_en')
     description = request.form.get('description')
-    price = request.form.get('price', type=float)
+    price = to_satang(request.form.get('price'))
     category_id = request.form.get('category_id', type=int)
     is_available = 1 if request.form.get('is_available') == '1' else 0
     is_featured = 1 if request.form.get('is_featured') == '1' else 0
     stock_quantity = request.form.get('stock_quantity', type=int, default=0)
-
-    # Handle image upload
-    image_file = request.files.get('image')
-    image_filename = None
-    if image_file and allowed_file(image_file.filename):
-        filename = secure_filename(image_file.filename)
-        filepath = os.path.join(UPLOAD_FOLDER2, filename)
-        image_file.save(filepath)
-        image_filename = filename
+    if price is None:
+        return jsonify({'success': False, 'message': 'ราคาไม่ถูกต้อง'}), 400
 
     conn = get_db_connection()
-    conn.execute('''
+
+    # Handle image upload (เก็บตาม hash ของเนื้อไฟล์)
+    image_filename = save_product_image(conn, request.files.get('image'))
+
+    cursor = conn.execute('''
         INSERT INTO products 
         (name, name_en, description, price, image, category_id, is_available, is_featured, stock_quantity)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (name, name_en, description, price, image_filename, category_id, is_available, is_featured, stock_quantity))
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)
+    ''', (name, name_en, description, price, image_filename, category_id, is_available, is_featured))
+    if stock_quantity:
+        record_stock_movement(conn, cursor.lastrowid, stock_quantity, 'restock', user_id=session.get('user_id'))
     conn.commit()
     conn.close()
     return jsonify({'success': True})
@@ -1827,34 +3594,44 @@ def update_product(product_id):
     name = request.form.get('name')
     name_en = request.form.get('name_en')
     description = request.form.get('description')
-    price = request.form.get('price', type=float)
+    price = to_satang(request.form.get('price'))
     category_id = request.form.get('category_id', type=int)
     is_available = 1 if request.form.get('is_available') == '1' else 0
     is_featured = 1 if request.form.get('is_featured') == '1' else 0
     stock_quantity = request.form.get('stock_quantity', type=int, default=0)
+    if price is None:
+        return jsonify({'success': False, 'message': 'ราคาไม่ถูกต้อง'}), 400
+    # สต็อกที่แสดงตอนเปิดฟอร์ม: บันทึกเฉพาะส่วนต่าง ยอดขายระหว่างแก้ไขจะไม่ถูกเขียนทับ
+    original_stock = request.form.get('original_stock_quantity', type=int)
 
     conn = get_db_connection()
-
-    # Handle image upload
-    image_file = request.files.get('image')
-    if image_file and allowed_file(image_file.filename):
-        filename = secure_filename(image_file.filename)
-        filepath = os.path.join(UPLOAD_FOLDER2, filename)
-        image_file.save(filepath)
+    if original_stock is None:
+        row = conn.execute('SELECT stock_quantity FROM products WHERE id=?', (product_id,)).fetchone()
+        original_stock = row['stock_quantity'] if row else stock_quantity
+    stock_delta = stock_quantity - original_stock
+    if stock_delta:
+        record_stock_movement(conn, product_id, stock_delta, 'restock' if stock_delta > 0 else 'adjustment',
+                              user_id=session.get('user_id'))
+
+    # Handle image upload (เก็บตาม hash ของเนื้อไฟล์)
+    filename = save_product_image(conn, request.files.get('image'))
+    if filename:
         conn.execute('''
             UPDATE products SET 
             name=?, name_en=?, description=?, price=?, image=?, 
-            category_id=?, is_available=?, is_featured=?, stock_quantity=?
+            category_id=?, is_available=?, is_featured=?,
+            updated_at=strftime('%Y-%m-%d %H:%M:%f', 'now')
             WHERE id=?
-        ''', (name, name_en, description, price, filename, category_id, is_available, is_featured, stock_quantity, product_id))
+        ''', (name, name_en, description, price, filename, category_id, is_available, is_featured, product_id))
     else:
         # ไม่เปลี่ยนรูป
         conn.execute('''
             UPDATE products SET 
             name=?, name_en=?, description=?, price=?, 
-            category_id=?, is_available=?, is_featured=?, stock_quantity=?
+            category_id=?, is_available=?, is_featured=?,
+            updated_at=strftime('%Y-%m-%d %H:%M:%f', 'now')
             WHERE id=?
-        ''', (name, name_en, description, price, category_id, is_available, is_featured, stock_quantity, product_id))
+        ''', (name, name_en, description, price, category_id, is_available, is_featured, product_id))
 
     conn.commit()
     conn.close()
@@ -1879,14 +3656,16 @@ def delete_order(order_id):
         flash("คุณไม่มีสิทธิ์เข้าถึงหน้านี้", "danger")
         return redirect(url_for("index"))
     
+    conn = get_db_connection()
     try:
-        conn = get_db_connection()
-        conn.execute("DELETE FROM orders WHERE id = ?", (order_id,))
+        delete_order_rows(conn, order_id)
         conn.commit()
-        conn.close()
         return jsonify({"success": True})
     except Exception as e:
+        conn.rollback()
         return jsonify({"success": False, "message": str(e)})
+    finally:
+        conn.close()
 
 @app.route('/admin/toggle_product_status/<int:product_id>', methods=['POST'])
 def toggle_product_status(product_id):
@@ -1898,7 +3677,8 @@ def toggle_product_status(product_id):
     product = conn.execute('SELECT is_available FROM products WHERE id=?', (product_id,)).fetchone()
     if product:
         new_status = 0 if product['is_available'] else 1
-        conn.execute('UPDATE products SET is_available=? WHERE id=?', (new_status, product_id))
+        conn.execute("UPDATE products SET is_available=?, updated_at=strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE id=?",
+                     (new_status, product_id))
         conn.commit()
         conn.close()
         return jsonify({'success': True, 'new_status': new_status})
@@ -1916,13 +3696,18 @@ def toggle_product_featured(product_id):
     product = conn.execute('SELECT is_featured FROM products WHERE id=?', (product_id,)).fetchone()
     if product:
         new_featured = 0 if product['is_featured'] else 1
-        conn.execute('UPDATE products SET is_featured=? WHERE id=?', (new_featured, product_id))
+        conn.execute("UPDATE products SET is_featured=?, updated_at=strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE id=?",
+                     (new_featured, product_id))
         conn.commit()
         conn.close()
         return jsonify({'success': True, 'new_featured': new_featured})
     conn.close()
     return jsonify({'success': False, 'message': 'ไม่พบสินค้า'}), 404
 
+def set_order_status(conn, order_id, status):
+    """write unit: เปลี่ยนสถานะคำสั่งซื้อ คืน False ถ้าไม่พบ"""
+    return conn.execute("UPDATE orders SET status = ? WHERE id = ?", (status, order_id)).rowcount > 0
+
 @app.route('/admin/update_order_status/<int:order_id>', methods=['POST'])
 def update_order_status(order_id):
     if session.get('role') != 'admin':
@@ -1935,21 +3720,171 @@ def update_order_status(order_id):
     if new_status not in valid_statuses:
         return jsonify({'success': False, 'message': 'สถานะไม่ถูกต้อง'})
 
-    conn = get_db_connection()
     try:
-        order = conn.execute("SELECT id FROM orders WHERE id = ?", (order_id,)).fetchone()
-        if not order:
-            conn.close()
+        if not run_write(set_order_status, order_id, new_status):
             return jsonify({'success': False, 'message': 'ไม่พบคำสั่งซื้อ'})
-
-        conn.execute("UPDATE orders SET status = ? WHERE id = ?", (new_status, order_id))
-        conn.commit()
         return jsonify({
             'success': True,
             'message': f'อัปเดตสถานะคำสั่งซื้อ #{order_id} เป็น {new_status} แล้ว'
         })
     except Exception as e:
         return jsonify({'success': False, 'message': f'เกิดข้อผิดพลาด: {str(e)}'})
+
+# ========================
+# Bulk Admin Actions
+# ========================
+
+BULK_MAX_IDS = 500
+ORDER_STATUSES = ('pending', 'processing', 'completed', 'cancelled')
+PRODUCT_FLAGS = ('is_available', 'is_featured')
+
+def parse_bulk_ids(values):
+    """แปลงรายการ id จาก JSON เป็น int ไม่ซ้ำ (คงลำดับเดิม) คืน None ถ้ารูปแบบไม่ถูกต้อง"""
+    if not isinstance(values, list) or not values or len(values) > BULK_MAX_IDS:
+        return None
+    try:
+        return list(dict.fromkeys(int(v) for v in values))
+    except (TypeError, ValueError):
+        return None
+
+def fetch_rows_by_id(conn, table, columns, ids):
+    """ดึงแถวของ id ทั้งหมดด้วย query เดียว คืน dict id -> row"""
+    placeholders = ','.join('?' * len(ids))
+    rows = conn.execute(f"SELECT id, {columns} FROM {table} WHERE id IN ({placeholders})", ids).fetchall()
+    return {row['id']: row for row in rows}
+
+def bulk_response(results):
+    """ผลรวมของ bulk action พร้อมผลราย id"""
+    updated = sum(1 for r in results if r['success'])
+    return jsonify({
+        'success': updated > 0,
+        'updated': updated,
+        'failed': len(results) - updated,
+        'results': results,
+        'message': f'อัปเดตแล้ว {updated} จาก {len(results)} รายการ'
+    })
+
+def bulk_set_order_status(conn, order_ids, status):
+    """write unit: เปลี่ยนสถานะหลายคำสั่งซื้อ คืนผลราย id"""
+    orders = fetch_rows_by_id(conn, 'orders', 'status', order_ids)
+    results, params = [], []
+    for order_id in order_ids:
+        if order_id not in orders:
+            results.append({'id': order_id, 'success': False, 'message': 'ไม่พบคำสั่งซื้อ'})
+            continue
+        params.append((status, order_id))
+        results.append({'id': order_id, 'success': True, 'previous_status': orders[order_id]['status']})
+
+    conn.executemany("UPDATE orders SET status = ? WHERE id = ?", params)
+    return results
+
+@app.route('/admin/bulk/order_status', methods=['POST'])
+def bulk_update_order_status():
+    """เปลี่ยนสถานะหลายคำสั่งซื้อใน transaction เดียว"""
+    if session.get('role') != 'admin':
+        return jsonify({'success': False, 'message': 'ไม่มีสิทธิ์เข้าถึง'}), 403
+
+    data = request.get_json(silent=True) or {}
+    order_ids = parse_bulk_ids(data.get('order_ids'))
+    new_status = data.get('status')
+    if order_ids is None:
+        return jsonify({'success': False, 'message': f'ต้องระบุ order_ids 1-{BULK_MAX_IDS} รายการ'}), 400
+    if new_status not in ORDER_STATUSES:
+        return jsonify({'success': False, 'message': 'สถานะไม่ถูกต้อง'}), 400
+
+    try:
+        return bulk_response(run_write(bulk_set_order_status, order_ids, new_status))
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'เกิดข้อผิดพลาด: {str(e)}'}), 500
+
+def bulk_verify_payments(conn, order_ids, action):
+    """write unit: อนุมัติ/ปฏิเสธการชำระเงินที่ยังรอตรวจของหลายคำสั่งซื้อ คืนผลราย id"""
+    placeholders = ','.join('?' * len(order_ids))
+    payments = {row['order_id']: row for row in conn.execute(f"""
+        SELECT order_id, status FROM payments WHERE order_id IN ({placeholders})
+    """, order_ids).fetchall()}
+
+    results, order_ids_to_update = [], []
+    for order_id in order_ids:
+        payment = payments.get(order_id)
+        if not payment:
+            results.append({'id': order_id, 'success': False, 'message': 'ไม่พบข้อมูลการชำระเงิน'})
+        elif payment['status'] not in ('pending', 'verifying'):
+            results.append({'id': order_id, 'success': False,
+                            'message': f"สถานะการชำระเงินเป็น {payment['status']} แล้ว"})
+        else:
+            order_ids_to_update.append(order_id)
+            results.append({'id': order_id, 'success': True})
+
+    if action == 'approve':
+        paid_at = datetime.now()
+        conn.executemany("UPDATE payments SET status = 'paid', paid_at = ? WHERE order_id = ?",
+                         [(paid_at, order_id) for order_id in order_ids_to_update])
+        conn.executemany("UPDATE orders SET status = 'processing' WHERE id = ?",
+                         [(order_id,) for order_id in order_ids_to_update])
+    else:
+        conn.executemany("UPDATE payments SET status = 'rejected' WHERE order_id = ?",
+                         [(order_id,) for order_id in order_ids_to_update])
+        conn.executemany("UPDATE orders SET status = 'pending' WHERE id = ?",
+                         [(order_id,) for order_id in order_ids_to_update])
+    return results
+
+@app.route('/admin/bulk/verify_payment', methods=['POST'])
+def admin_bulk_verify_payment():
+    """อนุมัติ/ปฏิเสธการชำระเงินหลายคำสั่งซื้อใน transaction เดียว"""
+    if session.get('role') != 'admin':
+        return jsonify({'success': False, 'message': 'ไม่มีสิทธิ์เข้าถึง'}), 403
+
+    data = request.get_json(silent=True) or {}
+    order_ids = parse_bulk_ids(data.get('order_ids'))
+    action = data.get('action')
+    if order_ids is None:
+        return jsonify({'success': False, 'message': f'ต้องระบุ order_ids 1-{BULK_MAX_IDS} รายการ'}), 400
+    if action not in ('approve', 'reject'):
+        return jsonify({'success': False, 'message': 'action ไม่ถูกต้อง'}), 400
+
+    try:
+        return bulk_response(run_write(bulk_verify_payments, order_ids, action))
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/admin/bulk/product_flags', methods=['POST'])
+def bulk_update_product_flags():
+    """ตั้งค่า is_available หรือ is_featured ให้หลายสินค้าใน transaction เดียว"""
+    if session.get('role') != 'admin':
+        return jsonify({'success': False, 'message': 'ไม่มีสิทธิ์เข้าถึง'}), 403
+
+    data = request.get_json(silent=True) or {}
+    product_ids = parse_bulk_ids(data.get('product_ids'))
+    field = data.get('field')
+    value = data.get('value')
+    if product_ids is None:
+        return jsonify({'success': False, 'message': f'ต้องระบุ product_ids 1-{BULK_MAX_IDS} รายการ'}), 400
+    # field มาจาก whitelist จึงใส่ใน SQL ได้
+    if field not in PRODUCT_FLAGS or value not in (0, 1, True, False):
+        return jsonify({'success': False, 'message': 'ข้อมูลไม่ถูกต้อง'}), 400
+    value = int(value)
+
+    conn = get_db_connection()
+    try:
+        products = fetch_rows_by_id(conn, 'products', field, product_ids)
+        results, params = [], []
+        for product_id in product_ids:
+            if product_id not in products:
+                results.append({'id': product_id, 'success': False, 'message': 'ไม่พบสินค้า'})
+                continue
+            # แถวที่ค่าเดิมอยู่แล้วไม่ต้องเขียน (ไม่เปลี่ยน updated_at และ catalog version)
+            if products[product_id][field] != value:
+                params.append((value, product_id))
+            results.append({'id': product_id, 'success': True, field: value})
+
+        conn.executemany(f"UPDATE products SET {field} = ?, updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE id = ?",
+                         params)
+        conn.commit()
+        return bulk_response(results)
+    except Exception as e:
+        conn.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 500
     finally:
         conn.close()
 
@@ -2016,12 +3951,12 @@ def print_order(order_id):
                 {''.join([f'''<tr>
                     <td>{item["product_name"]}{(" (" + item["options"] + ")") if item["options"] else ""}</td>
                     <td style="text-align: center;">{item["quantity"]}</td>
-                    <td style="text-align: right;">{item["unit_price"]:.0f} บาท</td>
-                    <td style="text-align: right;">{item["total_price"]:.0f} บาท</td>
+                    <td style="text-align: right;">{format_currency(item["unit_price"])} บาท</td>
+                    <td style="text-align: right;">{format_currency(item["total_price"])} บาท</td>
                 </tr>''' for item in order_items])}
                 <tr class="total">
                     <td colspan="3" style="text-align: right;"><strong>รวมทั้งสิ้น</strong></td>
-                    <td style="text-align: right;"><strong>{order['total_amount']:.0f} บาท</strong></td>
+                    <td style="text-align: right;"><strong>{format_currency(order['total_amount'])} บาท</strong></td>
                 </tr>
             </tbody>
         </table>
@@ -2054,20 +3989,21 @@ def order_history():
     if not user_id:
         return redirect(url_for("login"))
 
-    conn = get_db_connection()
+    # คำสั่งซื้อเก่าที่ถูกย้ายไป archive ยังแสดงตามปกติผ่าน all_orders
+    conn = get_db_connection(with_archive=True)
     
     if is_admin:
         # แอดมินเห็นคำสั่งซื้อทั้งหมด พร้อม username ของผู้สั่ง
         orders = conn.execute("""
             SELECT o.*, u.username
-            FROM orders o
+            FROM all_orders o
             JOIN users u ON o.user_id = u.id
             ORDER BY o.created_at DESC
         """).fetchall()
     else:
         # ผู้ใช้ทั่วไปเห็นแค่คำสั่งซื้อของตัวเอง
         orders = conn.execute("""
-            SELECT * FROM orders 
+            SELECT * FROM all_orders 
             WHERE user_id = ? 
             ORDER BY created_at DESC
         """, (user_id,)).fetchall()
@@ -2084,6 +4020,24 @@ def datetimeformat(value, format='%d/%m/%Y'):
     except:
         return value
 
+_postal_index = None
+
+def get_postal_index():
+    """ดัชนีรหัสไปรษณีย์ที่โหลดครั้งเดียวต่อ process (warm_up โหลดไว้ก่อน request แรก)"""
+    global _postal_index
+    if _postal_index is None:
+        _postal_index = postal.load_index(app.config['POSTAL_DATA'])
+    return _postal_index
+
+@app.route('/api/postal_codes')
+def api_postal_codes():
+    """typeahead ของฟอร์มที่อยู่: ?q= ตัวเลขขึ้นต้นของรหัสไปรษณีย์ หรือชื่ออำเภอ/เขต/จังหวัด"""
+    results = get_postal_index().search(request.args.get('q', ''))
+    response = jsonify({'success': True, 'results': results})
+    response.cache_control.public = True
+    response.cache_control.max_age = 24 * 60 * 60
+    return response
+
 @app.route("/address_book")
 def address_book():
     user_id = session.get("user_id")
@@ -2113,6 +4067,11 @@ def add_address():
         city = request.form.get("city", "")
         postal_code = request.form.get("postal_code", "")
         province = request.form.get("province", "")
+        try:
+            city, province, postal_code = get_postal_index().normalize(city, province, postal_code)
+        except postal.AddressError as e:
+            flash(str(e))
+            return render_template("address_form.html", action="เพิ่มที่อยู่ใหม่", address=request.form)
 
         conn = get_db_connection()
         conn.execute("""
@@ -2147,7 +4106,14 @@ def edit_address(address_id):
         city = request.form.get("city", "")
         postal_code = request.form.get("postal_code", "")
         province = request.form.get("province", "")
+        try:
+            city, province, postal_code = get_postal_index().normalize(city, province, postal_code)
+        except postal.AddressError as e:
+            conn.close()
+            flash(str(e))
+            return render_template("address_form.html", action="บันทึก", address=request.form)
 
+        conn.close()
         conn = get_db_connection()
         conn.execute("""
             UPDATE addresses
@@ -2189,7 +4155,7 @@ def track_order():
         flash("กรุณาเข้าสู่ระบบก่อน")
         return redirect(url_for("login"))
 
-    conn = get_db_connection()
+    conn = get_read_connection()
 
     if request.method == "POST":
         order_id = request.form.get("order_id")
@@ -2251,6 +4217,12 @@ def datetimeformat(value, format='%d/%m/%Y'):
 # Admin Delete Order API
 # ========================
 
+def delete_order_rows(conn, order_id):
+    """ลบคำสั่งซื้อพร้อม order_items และ payments (ไม่ทิ้งแถวกำพร้า) ผู้เรียก commit เอง"""
+    conn.execute('DELETE FROM payments WHERE order_id = ?', (order_id,))
+    conn.execute('DELETE FROM order_items WHERE order_id = ?', (order_id,))
+    conn.execute('DELETE FROM orders WHERE id = ?', (order_id,))
+
 @app.route('/admin/delete_order/<int:order_id>', methods=['DELETE'])
 def admin_delete_order(order_id):
     if session.get('role') != 'admin':
@@ -2262,10 +4234,7 @@ def admin_delete_order(order_id):
         if not order:
             conn.close()
             return jsonify({'success': False, 'message': 'ไม่พบคำสั่งซื้อ'}), 404
-        # ลบ order_items ก่อน
-        conn.execute('DELETE FROM order_items WHERE order_id = ?', (order_id,))
-        # ลบ order หลัก
-        conn.execute('DELETE FROM orders WHERE id = ?', (order_id,))
+        delete_order_rows(conn, order_id)
         conn.commit()
         conn.close()
         return jsonify({'success': True})
@@ -2277,49 +4246,211 @@ def admin_delete_order(order_id):
 # Initialize Application
 # ========================
 
-if __name__ == "__main__":
-    import time
-    from colorama import Fore, Style, init
-    
-    init(autoreset=True)
+@app.cli.command('init-db')
+@click.option('--force', is_flag=True, help='รัน init/seed ซ้ำแม้ schema เป็นเวอร์ชันล่าสุดแล้ว')
+def init_db_command(force):
+    """สร้าง/อัปเกรดฐานข้อมูลและข้อมูลเริ่มต้น (idempotent)"""
+    if setup_database(force=force):
+        click.echo(f"✅ Database ready (schema version {latest_schema_version()})")
+    else:
+        click.echo(f"Schema version {get_schema_version()} เป็นปัจจุบันแล้ว ไม่ต้องทำอะไร")
+
+
+@app.cli.command('warmup')
+def warmup_command():
+    """compile ทุก template ลง bytecode cache (รันตอน deploy ก่อนเริ่ม worker)"""
+    configure_template_cache()
+    count, elapsed_ms = warm_up()
+    for row in sorted(get_template_stats(), key=lambda r: r['compile_ms'], reverse=True):
+        if row['compiles']:
+            click.echo(f"  {row['template']:32} compile {row['compile_ms']:7.1f} ms")
+    click.echo(f"✅ Warmed up {count} templates in {elapsed_ms:.1f} ms (cache: {app.config['JINJA_CACHE_DIR'] or 'disabled'})")
+
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """สร้าง bundle CSS/JS แบบย่อ + fingerprint + .gz/.br ลง static/dist"""
+    import assets
+    manifest = assets.build_assets(app.static_folder)
+    for name, hashed in sorted(manifest.items()):
+        path = os.path.join(app.static_folder, hashed)
+        sizes = [f"{os.path.getsize(path):,} B"]
+        for suffix in ('gz', 'br'):
+            if os.path.exists(f"{path}.{suffix}"):
+                sizes.append(f"{suffix} {os.path.getsize(f'{path}.{suffix}'):,} B")
+        click.echo(f"  {name:36} -> {hashed}  ({', '.join(sizes)})")
+    if assets.brotli is None:
+        click.echo("  (ไม่ได้ติดตั้ง brotli: สร้างเฉพาะ .gz)")
+    load_asset_manifest()
+    click.echo(f"✅ Built {len(manifest)} bundles")
+
+
+@app.cli.command('rehash-images')
+@click.option('--prune', is_flag=True, help='ลบรูปที่ไม่มีสินค้าอ้างถึงออกจาก static/images/products')
+def rehash_images_command(prune):
+    """ย้ายรูปสินค้าชื่อเดิมเข้า store ตาม hash (ทำซ้ำได้) และลบไฟล์ที่ไม่ใช้แล้วถ้าระบุ --prune"""
+    conn = get_db_connection()
+    try:
+        renamed = rehash_product_images(conn)
+        conn.commit()
+        click.echo(f"✅ Rehashed {renamed} product images")
+        if prune:
+            removed = prune_product_images(conn)
+            for name in removed:
+                click.echo(f"  removed {name}")
+            click.echo(f"✅ Pruned {len(removed)} unused files")
+    finally:
+        conn.close()
 
-    print(Fore.CYAN + Style.BRIGHT + "\nInitializing Sweet Dreams Bakery...\n")
-    time.sleep(0.5)
 
-    init_db()
-    print(Fore.GREEN + "   ✅ Database initialized")
+@app.cli.command('backup-db')
+@click.option('--dir', 'backup_dir', default=None, help='โฟลเดอร์ปลายทาง ค่าเริ่มต้นจาก BAKERY_BACKUP_DIR')
+@click.option('--keep', type=int, default=7, show_default=True, help='จำนวน snapshot ล่าสุดที่เก็บไว้ต่อฐานข้อมูล')
+@click.option('--pages', type=int, default=256, show_default=True, help='จำนวนหน้าที่คัดลอกต่อ step')
+@click.option('--sleep', type=float, default=0.05, show_default=True, help='วินาทีที่พักระหว่าง step ให้ผู้เขียนได้ทำงาน')
+def backup_db_command(backup_dir, keep, pages, sleep):
+    """สำรอง bakery.db (และ archive ถ้ามี) แบบ online เป็น .db.gz พร้อมตรวจ integrity"""
+    import backup
 
-    seed_categories()
-    print(Fore.GREEN + "   ✅ Categories seeded")
+    backup_dir = backup_dir or app.config['BACKUP_DIR']
+    for db_path in (DB_NAME, app.config['ARCHIVE_DB']):
+        if not os.path.exists(db_path):
+            continue
+        try:
+            result = backup.backup_database(db_path, backup_dir, pages=pages, sleep=sleep, keep=keep)
+        except backup.BackupError as e:
+            click.echo(f"❌ {db_path}: {e}", err=True)
+            raise SystemExit(1)
+        click.echo(f"✅ {result['path']} ({result['size'] / 1024:,.0f} KB -> {result['compressed_size'] / 1024:,.0f} KB, "
+                   f"{result['steps']} steps, {result['restarts']} restarts, {result['seconds']:.1f}s)")
+        for path in result['removed']:
+            click.echo(f"  rotated out {path}")
+
+
+@app.cli.command('restore-db')
+@click.argument('snapshot', type=click.Path(exists=True, dir_okay=False))
+@click.option('--target', default=None, help='ฐานข้อมูลปลายทาง ค่าเริ่มต้นคือ BAKERY_DB')
+@click.option('--yes', is_flag=True, help='ไม่ต้องถามยืนยัน')
+@click.option('--force', is_flag=True, help='ยอมให้ชื่อ snapshot ไม่ตรงกับฐานข้อมูลปลายทาง')
+def restore_db_command(snapshot, target, yes, force):
+    """กู้ฐานข้อมูลจาก snapshot .db.gz ที่สร้างด้วย backup-db (เขียนทับข้อมูลปัจจุบันทั้งหมด)"""
+    import backup
+
+    target = target or DB_NAME
+    stem = os.path.splitext(os.path.basename(target))[0]
+    if not os.path.basename(snapshot).startswith(stem + '-') and not force:
+        click.echo(f"❌ {snapshot} ไม่ใช่ snapshot ของ {target} (ใช้ --force ถ้าตั้งใจ)", err=True)
+        raise SystemExit(1)
+    if not yes:
+        click.confirm(f"เขียนทับ {target} ด้วย {snapshot}?", abort=True)
+    try:
+        backup.restore_database(snapshot, target)
+    except backup.BackupError as e:
+        click.echo(f"❌ {e}", err=True)
+        raise SystemExit(1)
+    click.echo(f"✅ Restored {target} from {snapshot}")
+
+
+@app.cli.command('archive-orders')
+@click.option('--days', type=int, default=None, help='อายุขั้นต่ำ (วัน) ของคำสั่งซื้อที่ปิดแล้ว ค่าเริ่มต้นจาก BAKERY_ARCHIVE_AFTER_DAYS')
+@click.option('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE, show_default=True)
+def archive_orders_command(days, batch_size):
+    """ย้ายคำสั่งซื้อ completed/cancelled ที่เก่าแล้วไปฐานข้อมูล archive"""
+    days = app.config['ARCHIVE_AFTER_DAYS'] if days is None else days
+    setup_archive()
+    conn = get_db_connection(with_archive=True)
+    try:
+        moved = archive_closed_orders(conn, days, batch_size)
+    finally:
+        conn.close()
+    click.echo(f"✅ Archived {moved} orders older than {days} days -> {app.config['ARCHIVE_DB']}")
 
-    seed_products()
-    print(Fore.GREEN + "   ✅ Products seeded")
 
-    create_admin_user()
-    print(Fore.GREEN + "   ✅ Admin user created")
+@app.cli.command('hash-slips')
+@click.option('--rebuild', is_flag=True, help='ล้าง hash และ flag เดิมทั้งหมดแล้ว hash ใหม่ (หลังเปลี่ยน SLIP_HASH_MAX_DISTANCE)')
+def hash_slips_command(rebuild):
+    """hash สลิปที่อัปโหลดไว้ก่อนมีการตรวจสลิปซ้ำ และ flag payment ที่ใช้สลิปคล้ายกัน"""
+    conn = get_db_connection(with_archive=True)
+    try:
+        if rebuild:
+            conn.executescript("""
+                DELETE FROM slip_hash_bands;
+                DELETE FROM slip_hashes;
+                UPDATE payments SET slip_duplicate_order_id = NULL, slip_duplicate_distance = NULL
+                WHERE slip_duplicate_order_id IS NOT NULL;
+            """)
+        hashed, duplicates, unreadable = backfill_slip_hashes(conn)
+    finally:
+        conn.close()
+    for name in unreadable:
+        click.echo(f"  ⚠️  {name}: ไม่ใช่ไฟล์รูปที่อ่านได้")
+    click.echo(f"✅ Hashed {hashed} slips, {duplicates} flagged as near-duplicates")
+
+
+@app.cli.command('plan-production')
+@click.option('--horizon', type=int, default=7, show_default=True, help='จำนวนวันที่วางแผน นับจากวันนี้')
+@click.option('--window', type=int, default=28, show_default=True, help='จำนวนวันย้อนหลังของค่าเฉลี่ยเคลื่อนที่')
+@click.option('--rebuild', is_flag=True, help='รวมยอดขายรายวันใหม่ทั้งหมดแทนการรวมเฉพาะวันใหม่')
+def plan_production_command(horizon, window, rebuild):
+    """คำนวณแผนการอบรายสินค้า (ตั้ง cron ให้รันหลังเที่ยงคืนทุกวัน)"""
+    import planning
+    conn = get_db_connection(with_archive=True)
+    try:
+        result = planning.run_planning(conn, horizon=horizon, window=window, rebuild=rebuild,
+                                       schemas=('main', 'archive'))
+    finally:
+        conn.close()
+    if result['aggregated']:
+        start, end = result['aggregated']
+        click.echo(f"  aggregated {start} .. {end}")
+    click.echo(f"✅ Planned {result['products']} products x {horizon} days "
+               f"(sales through {result['through'] or '-'}) in {result['elapsed_ms']:.0f} ms")
 
-    create_default_images_folder()
-    print(Fore.GREEN + "   ✅ Images folder created")
-
-    print("\n" + Fore.MAGENTA + "=" * 60)
-    print(Fore.YELLOW + Style.BRIGHT + "🍰 Sweet Dreams Bakery Server Starting... 🚀")
-    print(Fore.MAGENTA + "=" * 60)
-
-    print(Fore.CYAN + "🌐 Main Website: " + Fore.WHITE + "http://localhost:5000")
-    print(Fore.CYAN + "🛠  Admin Panel: " + Fore.WHITE + "http://localhost:5000/admin")
-    print(Fore.CYAN + "📦 Manage Orders: " + Fore.WHITE + "http://localhost:5000/admin/orders")
-    print(Fore.CYAN + "🔑 Admin Login: " + Fore.WHITE + "username=" + Fore.YELLOW + "admin" +
-          Fore.WHITE + ", password=" + Fore.YELLOW + "admin123")
-
-    print(Fore.MAGENTA + "=" * 60)
-    print(Fore.YELLOW + "✨ Features Available ✨")
-    print(Fore.GREEN + "   ✔ Product Management (Add/Edit/Delete)")
-    print(Fore.GREEN + "   ✔ Order Management")
-    print(Fore.GREEN + "   ✔ User Authentication")
-    print(Fore.GREEN + "   ✔ Shopping Cart")
-    print(Fore.GREEN + "   ✔ User Profiles")
-    print(Fore.GREEN + "   ✔ Order History")
-    print(Fore.GREEN + "   ✔ Responsive Design")
-    print(Fore.MAGENTA + "=" * 60 + "\n")
-
-    app.run(debug=True, host="0.0.0.0", port=5000)
+
+@app.cli.command('inventory-snapshot')
+@click.option('--check', is_flag=True, help='ตรวจว่า products.stock_quantity ตรงกับ ledger หรือไม่')
+def inventory_snapshot_command(check):
+    """บันทึก snapshot สต็อกของสินค้าที่มี movement ใหม่ (ตั้ง cron ให้รันเป็นระยะ)"""
+    conn = get_db_connection()
+    try:
+        count = take_inventory_snapshots(conn)
+        click.echo(f"✅ Snapshot {count} products")
+        if check:
+            drift = find_stock_drift(conn)
+            for row in drift:
+                click.echo(f"  #{row['id']} {row['name']}: cache {row['cached']} != ledger {row['ledger']}")
+            if drift:
+                raise SystemExit(1)
+            click.echo("✅ Stock cache matches the ledger")
+    finally:
+        conn.close()
+
+
+def create_app(config=None):
+    """Application factory สำหรับ gunicorn เช่น gunicorn --preload "app:create_app()"
+
+    ไม่สร้าง schema/seed ข้อมูลเอง ให้รัน `flask --app app init-db` ก่อน deploy
+    """
+    if config:
+        app.config.update(config)
+    configure_template_cache()
+    load_asset_manifest()
+    if get_schema_version() < latest_schema_version():
+        app.logger.warning("Database schema is out of date: run `flask --app app init-db`")
+    elif app.config['WARMUP_ON_START']:
+        warm_up()
+    return app
+
+
+if __name__ == "__main__":
+    setup_database()
+    print("\n" + "=" * 60)
+    print("🍰 Sweet Dreams Bakery Server Starting... 🚀")
+    print("=" * 60)
+    print("🌐 Main Website: http://localhost:5000")
+    print("🛠  Admin Panel: http://localhost:5000/admin")
+    print("📦 Manage Orders: http://localhost:5000/admin/orders")
+    print("🔑 Admin Login: username=admin, password=admin123")
+    print("=" * 60 + "\n")
+
+    create_app().run(debug=True, host="0.0.0.0", port=5000)
@@ -0,0 +1,196 @@
+"""Build step ของไฟล์ static: รวมไฟล์เป็น bundle, ย่อขนาด, ตั้งชื่อตาม hash และบีบอัดล่วงหน้า
+
+ใช้งาน:
+    flask --app app build-assets
+
+ผลลัพธ์อยู่ใน static/dist/ พร้อม manifest.json ที่แมปชื่อ bundle -> ไฟล์จริง เช่น
+    "bundles/site.js" -> "dist/site.3f2a9c1d7b.js"
+ทุกไฟล์มี .gz (และ .br ถ้าติดตั้ง brotli) อยู่ข้างกันให้ static view เลือกส่งตาม Accept-Encoding
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+
+try:
+    import brotli
+except ImportError:  # brotli เป็น optional dependency
+    brotli = None
+
+BUNDLE_PREFIX = 'bundles/'
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+HASH_LENGTH = 10
+
+# bundle ต่อหน้า: ชื่อ bundle -> ไฟล์ต้นฉบับใน static/ ตามลำดับที่ต่อกัน
+ASSET_BUNDLES = {
+    'site.css': ['css/main.css'],
+    'site.js': ['js/main.js', 'js/cart.js'],
+    'admin.css': ['css/admin.css'],
+    'admin.js': ['js/admin.js'],
+    'address_book.css': ['css/add.css'],
+    'address_form.css': ['css/adde.css'],
+    'admin_order_history.css': ['css/admin_orders_his.css'],
+    'change_password.css': ['css/change_password.css'],
+    'order_history.css': ['css/orders_history.css'],
+    'profile.css': ['css/profile.css'],
+    'track_order.css': ['css/track.css'],
+}
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json')
+
+
+def minify_css(source):
+    """ลบ comment และช่องว่างที่ไม่มีผลกับ CSS (คงช่องว่างหน้า ':' ไว้เพราะเป็น descendant selector)"""
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    source = re.sub(r'\s+', ' ', source)
+    source = re.sub(r'\s*([{};,>])\s*', r'\1', source)
+    source = re.sub(r':\s+', ':', source)
+    return source.replace(';}', '}').strip()
+
+
+_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_KEYWORDS = ('return', 'typeof', 'case', 'delete', 'void', 'in', 'of', 'new', 'throw')
+
+
+def minify_js(source):
+    """ย่อ JavaScript แบบปลอดภัย: ลบ comment และยุบช่องว่าง โดยไม่แตะ string, template และ regex
+
+    ขึ้นบรรทัดใหม่ยังคงไว้ (ยุบเหลือบรรทัดเดียว) เพื่อไม่ให้ automatic semicolon insertion เปลี่ยนความหมาย
+    """
+    out = []
+    i, n = 0, len(source)
+    pending_space = pending_newline = False
+
+    def last_significant():
+        for chunk in reversed(out):
+            stripped = chunk.rstrip()
+            if stripped:
+                return stripped
+        return ''
+
+    while i < n:
+        ch = source[i]
+        if ch in ' \t\r\n':
+            if ch == '\n':
+                pending_newline = True
+            else:
+                pending_space = True
+            i += 1
+            continue
+        if source.startswith('//', i):
+            end = source.find('\n', i)
+            i = n if end == -1 else end
+            continue
+        if source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = n if end == -1 else end + 2
+            pending_space = True
+            continue
+
+        if out:
+            if pending_newline:
+                out.append('\n')
+            elif pending_space:
+                out.append(' ')
+        pending_space = pending_newline = False
+
+        if ch in '\'"`':
+            j = i + 1
+            while j < n and source[j] != ch:
+                j += 2 if source[j] == '\\' else 1
+            out.append(source[i:j + 1])
+            i = j + 1
+            continue
+        if ch == '/':
+            prev = last_significant()
+            word = re.search(r'[A-Za-z_$]+$', prev)
+            if not prev or prev[-1] in _REGEX_PRECEDERS or (word and word.group() in _REGEX_KEYWORDS):
+                j = i + 1
+                in_class = False
+                while j < n and source[j] != '\n':
+                    c = source[j]
+                    if c == '\\':
+                        j += 2
+                        continue
+                    if c == '[':
+                        in_class = True
+                    elif c == ']':
+                        in_class = False
+                    elif c == '/' and not in_class:
+                        break
+                    j += 1
+                j += 1
+                while j < n and source[j].isalpha():
+                    j += 1
+                out.append(source[i:j])
+                i = j
+                continue
+        out.append(ch)
+        i += 1
+
+    return ''.join(out).strip() + '\n'
+
+
+def _minify(name, source):
+    if name.endswith('.css'):
+        return minify_css(source)
+    if name.endswith('.js'):
+        return minify_js(source)
+    return source
+
+
+def concat_sources(static_folder, name):
+    """ต่อไฟล์ต้นฉบับของ bundle (ใช้ทั้งตอน build และตอน dev ที่ยังไม่มี manifest)"""
+    parts = []
+    for source in ASSET_BUNDLES[name]:
+        with open(os.path.join(static_folder, source), encoding='utf-8') as f:
+            parts.append(f.read())
+    separator = ';\n' if name.endswith('.js') else '\n'
+    return separator.join(parts)
+
+
+def _write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def precompress(path, data):
+    """เขียน .gz (และ .br) ไว้ข้างไฟล์เดิม ข้ามถ้าบีบแล้วไม่เล็กลง"""
+    written = []
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(gz) < len(data):
+        _write(path + '.gz', gz)
+        written.append('gzip')
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        if len(br) < len(data):
+            _write(path + '.br', br)
+            written.append('br')
+    return written
+
+
+def build_assets(static_folder):
+    """สร้าง bundle ทั้งหมดใน static/dist และคืน manifest
+
+    ไฟล์เวอร์ชันเก่าไม่ถูกลบ หน้า HTML ที่ cache ไว้ระหว่าง deploy ยังโหลด bundle เดิมได้
+    """
+    dist = os.path.join(static_folder, DIST_DIR)
+    os.makedirs(dist, exist_ok=True)
+    manifest = {}
+    for name in ASSET_BUNDLES:
+        data = _minify(name, concat_sources(static_folder, name)).encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+        stem, ext = os.path.splitext(name)
+        filename = f'{stem}.{digest}{ext}'
+        path = os.path.join(dist, filename)
+        if not os.path.exists(path):
+            _write(path, data)
+        if ext in COMPRESSIBLE_EXTENSIONS:
+            precompress(path, data)
+        manifest[BUNDLE_PREFIX + name] = f'{DIST_DIR}/{filename}'
+
+    with open(os.path.join(dist, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
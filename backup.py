@@ -0,0 +1,145 @@
+"""สำรองฐานข้อมูลแบบ online ด้วย sqlite3 backup API แล้วเก็บเป็นไฟล์ .gz แบบหมุนเวียน
+
+ใช้งาน:
+    flask --app app backup-db                      # สำรอง bakery.db (และ archive ถ้ามี) ไปที่ backups/
+    flask --app app backup-db --keep 14 --pages 512 --sleep 0.02
+    flask --app app restore-db backups/bakery-20250101-030000.db.gz
+
+Connection.backup คัดลอกทีละ `pages` หน้าและพัก `sleep` วินาทีระหว่างรอบ
+
+- journal_mode=WAL (setup_database เปิดให้ฐานข้อมูลของแอป): เปิด read transaction ค้างไว้บน connection
+  ต้นทาง backup จึงอ่าน snapshot เดียวตลอดทาง ไม่ต้องเริ่มใหม่ และผู้เขียนไม่ถูกบล็อกเลย
+- rollback journal (ไฟล์ที่ยังไม่ได้รัน init-db): ทุก commit จากผู้เขียนรายอื่นทำให้ SQLite เริ่ม copy ใหม่
+  ถ้าเริ่มใหม่เกิน `max_restarts` ครั้งจะยกเลิกด้วย BackupError ให้รอบถัดไปลองใหม่ ไม่คัดลอกใน step เดียว
+  เพราะจะถือ read lock ตลอดทั้งไฟล์และ checkout รอจนหมดเวลา ("database is locked")
+"""
+import glob
+import gzip
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+
+DEFAULT_PAGES = 256
+DEFAULT_SLEEP = 0.05
+DEFAULT_KEEP = 7
+DEFAULT_MAX_RESTARTS = 5
+SNAPSHOT_SUFFIX = '.db.gz'
+
+
+class BackupError(Exception):
+    pass
+
+
+def snapshot_name(db_path, now=None):
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    return f"{stem}-{(now or datetime.now()).strftime('%Y%m%d-%H%M%S')}{SNAPSHOT_SUFFIX}"
+
+
+def integrity_check(db_path):
+    """คืน [] ถ้าไฟล์ผ่าน PRAGMA integrity_check ไม่เช่นนั้นคืนรายการปัญหา"""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        rows = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+    finally:
+        conn.close()
+    return [] if rows == ['ok'] else rows
+
+
+def copy_online(db_path, dest_path, pages=DEFAULT_PAGES, sleep=DEFAULT_SLEEP, max_restarts=DEFAULT_MAX_RESTARTS):
+    """คัดลอกฐานข้อมูลที่กำลังใช้งานด้วย backup API คืนสถิติ (จำนวน step และจำนวนครั้งที่เริ่มใหม่)
+
+    เริ่มใหม่เกิน `max_restarts` ครั้ง (เฉพาะ rollback journal) โยน BackupError โดยไม่เหลือไฟล์ปลายทางครึ่ง ๆ
+    """
+    stats = {'steps': 0, 'restarts': 0, 'pages': 0}
+    last_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal last_remaining
+        stats['steps'] += 1
+        stats['pages'] = total
+        if last_remaining is not None and remaining > last_remaining:
+            stats['restarts'] += 1
+            if stats['restarts'] > max_restarts:
+                raise BackupError(f"ฐานข้อมูลถูกเขียนระหว่าง backup จนต้องเริ่มใหม่เกิน {max_restarts} ครั้ง "
+                                  f"(journal_mode ไม่ใช่ WAL) ลองใหม่ภายหลัง")
+        last_remaining = remaining
+        # sleep ของ Connection.backup ใช้เฉพาะตอน BUSY/LOCKED จึงพักเองหลังทุก step
+        if remaining and sleep:
+            time.sleep(sleep)
+
+    src = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    dst = sqlite3.connect(dest_path)
+    try:
+        stats['wal'] = src.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        if stats['wal']:
+            # ตรึง snapshot ไว้ตลอดการคัดลอก (ใน WAL ผู้เขียนยัง commit ต่อได้)
+            src.execute("BEGIN")
+            src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        src.backup(dst, pages=pages, progress=progress)
+        # ปลายทางได้ header แบบ WAL ตามต้นทาง กลับเป็น rollback journal ให้ข้อมูลอยู่ในไฟล์เดียวก่อนบีบอัด
+        dst.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        dst.close()
+        src.close()
+    return stats
+
+
+def rotate_snapshots(backup_dir, db_path, keep):
+    """ลบ snapshot เก่าของฐานข้อมูลนี้ให้เหลือ `keep` ไฟล์ล่าสุด คืนรายการที่ลบ"""
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    snapshots = sorted(glob.glob(os.path.join(backup_dir, f"{stem}-*{SNAPSHOT_SUFFIX}")))
+    removed = snapshots[:-keep] if keep > 0 else []
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+def backup_database(db_path, backup_dir, pages=DEFAULT_PAGES, sleep=DEFAULT_SLEEP, keep=DEFAULT_KEEP,
+                    max_restarts=DEFAULT_MAX_RESTARTS):
+    """สำรอง db_path เป็น backup_dir/<ชื่อ>-<เวลา>.db.gz ตรวจ integrity ก่อนบีบอัด แล้วหมุนไฟล์เก่า"""
+    os.makedirs(backup_dir, exist_ok=True)
+    target = os.path.join(backup_dir, snapshot_name(db_path))
+    partial = target[:-len('.gz')] + '.partial'
+    started = time.perf_counter()
+    try:
+        stats = copy_online(db_path, partial, pages=pages, sleep=sleep, max_restarts=max_restarts)
+        problems = integrity_check(partial)
+        if problems:
+            raise BackupError(f"integrity_check ไม่ผ่าน: {problems[:5]}")
+        with open(partial, 'rb') as src, gzip.open(target + '.tmp', 'wb', compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.replace(target + '.tmp', target)
+        size = os.path.getsize(partial)
+    finally:
+        for leftover in (partial, target + '.tmp'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+    return dict(stats, path=target, size=size, compressed_size=os.path.getsize(target),
+                seconds=time.perf_counter() - started, removed=rotate_snapshots(backup_dir, db_path, keep))
+
+
+def restore_database(snapshot_path, db_path):
+    """กู้ snapshot .db.gz กลับเข้า db_path ด้วย backup API (connection อื่นเห็นข้อมูลใหม่ทันที ไม่ต้องแทนไฟล์)
+
+    คัดลอกทั้งไฟล์ใน step เดียว ปลายทางถูก lock ตลอดการกู้ ผู้เขียนรายอื่นจึงไม่แทรกกลางทาง
+    """
+    extracted = db_path + '.restore'
+    try:
+        with gzip.open(snapshot_path, 'rb') as src, open(extracted, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        problems = integrity_check(extracted)
+        if problems:
+            raise BackupError(f"snapshot เสีย: {problems[:5]}")
+        src = sqlite3.connect(extracted)
+        dst = sqlite3.connect(db_path, timeout=30)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
+    finally:
+        if os.path.exists(extracted):
+            os.remove(extracted)
@@ -0,0 +1,172 @@
+"""แสดงว่าการเขียน (checkout จำลอง) ยังเดินต่อระหว่าง backup แบบทีละ step
+
+สร้างฐานข้อมูลสังเคราะห์ แล้วให้ thread ผู้เขียน INSERT order + movement และ commit ทีละรายการตลอดเวลา
+ระหว่างนั้นรัน backup สองแบบเทียบกัน:
+  - stepped:  backup.copy_online (ทีละ --pages หน้า พัก --sleep วินาที) แบบที่ flask backup-db ใช้
+  - one-shot: Connection.backup ใน step เดียว (ถือ read lock ตลอดการคัดลอก)
+รายงานจำนวน commit ที่สำเร็จระหว่าง backup, latency ของ commit และผล integrity_check ของ snapshot
+ฐานข้อมูลของแอปเป็น journal_mode=WAL (setup_database) ใช้ --rollback-journal เพื่อดูพฤติกรรมของไฟล์เก่า
+ซึ่ง stepped backup จะเริ่มใหม่ทุกครั้งที่มี commit และยกเลิก (aborted) เมื่อเริ่มใหม่เกินกำหนด
+จบด้วย exit code 1 ถ้าระหว่าง stepped backup ผู้เขียนได้ commit น้อยกว่า --min-write-ratio ของที่ควรได้
+(วินาที / --write-interval) มี commit ที่ล้มเหลว หรือ snapshot ไม่ผ่าน integrity_check
+
+ใช้งาน:
+    python benchmarks/backup_concurrency.py
+    python benchmarks/backup_concurrency.py --orders 200000 --pages 128 --sleep 0.02 --write-interval 0.05
+    python benchmarks/backup_concurrency.py --rollback-journal   # เปรียบเทียบกับ journal_mode=DELETE
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import generate_data
+from common import REPO_ROOT, percentile, remove_tree
+
+sys.path.insert(0, str(REPO_ROOT))
+import backup  # noqa: E402
+
+
+class Writer(threading.Thread):
+    """commit ทีละ order เหมือน checkout แล้วเก็บเวลาที่แต่ละ commit ใช้"""
+
+    def __init__(self, db_path, interval):
+        super().__init__(daemon=True)
+        self.db_path = db_path
+        self.interval = interval
+        self.stop = threading.Event()
+        self.samples = []
+        self.errors = 0
+
+    def run(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        product_id = conn.execute("SELECT id FROM products LIMIT 1").fetchone()[0]
+        while not self.stop.is_set():
+            start = time.perf_counter()
+            try:
+                cursor = conn.execute("""
+                    INSERT INTO orders (user_id, total_amount, customer_name, customer_phone, status)
+                    VALUES (1, 10000, 'backup-test', '0800000000', 'pending')
+                """)
+                conn.execute("""
+                    INSERT INTO inventory_movements (product_id, delta, reason, order_id)
+                    VALUES (?, -1, 'sale', ?)
+                """, (product_id, cursor.lastrowid))
+                conn.commit()
+                self.samples.append((start, (time.perf_counter() - start) * 1000))
+            except sqlite3.OperationalError:
+                conn.rollback()
+                self.errors += 1
+            time.sleep(self.interval)
+        conn.close()
+
+
+def run_scenario(db_path, work_dir, name, copy, write_interval):
+    writer = Writer(db_path, write_interval)
+    writer.start()
+    time.sleep(0.5)  # ให้ผู้เขียนเข้าจังหวะก่อน
+    dest = os.path.join(work_dir, f"{name}.db")
+    started = time.perf_counter()
+    try:
+        stats = copy(dest)
+    except backup.BackupError:
+        stats = {"aborted": True}
+    finished = time.perf_counter()
+    time.sleep(0.2)
+    writer.stop.set()
+    writer.join()
+
+    during = sorted(ms for at, ms in writer.samples if started <= at <= finished)
+    aborted = stats.get("aborted", False)
+    problems = [] if aborted else backup.integrity_check(dest)
+    if os.path.exists(dest):
+        os.remove(dest)
+    return {
+        "name": name,
+        "seconds": finished - started,
+        "writes": len(during),
+        "p50": percentile(during, 50),
+        "p95": percentile(during, 95),
+        "max": during[-1] if during else 0.0,
+        "errors": writer.errors,
+        "restarts": stats.get("restarts", 0),
+        "aborted": aborted,
+        "integrity": "aborted" if aborted else "ok" if not problems else problems[0],
+    }
+
+
+def one_shot_copy(db_path, dest):
+    src = sqlite3.connect(db_path, timeout=30)
+    dst = sqlite3.connect(dest)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+    return {}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=100000, help="จำนวน order ในฐานข้อมูลสังเคราะห์")
+    parser.add_argument("--pages", type=int, default=backup.DEFAULT_PAGES)
+    parser.add_argument("--sleep", type=float, default=backup.DEFAULT_SLEEP)
+    parser.add_argument("--write-interval", type=float, default=0.1, help="วินาทีระหว่าง commit ของผู้เขียน")
+    parser.add_argument("--min-write-ratio", type=float, default=0.5,
+                        help="สัดส่วนขั้นต่ำของ commit ระหว่าง stepped backup เทียบกับที่ควรได้ถ้าไม่มี backup")
+    parser.add_argument("--rollback-journal", action="store_true",
+                        help="เปลี่ยนฐานข้อมูลทดสอบเป็น journal_mode=DELETE (ไฟล์ที่ยังไม่ได้ migrate) ก่อนวัด")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="bakery-backup-")
+    try:
+        db_path = os.path.join(work_dir, "bakery.db")
+        print(f"สร้างฐานข้อมูล {args.orders:,} orders ...", flush=True)
+        generate_data.main([db_path, "--orders", str(args.orders), "--users", "2000", "--products", "100"])
+        conn = sqlite3.connect(db_path)
+        mode = conn.execute(f"PRAGMA journal_mode={'DELETE' if args.rollback_journal else 'WAL'}").fetchone()[0]
+        conn.close()
+        print(f"ขนาดไฟล์ {os.path.getsize(db_path) / 1024 / 1024:.1f} MB "
+              f"(journal_mode={mode})\n", flush=True)
+
+        results = [
+            run_scenario(db_path, work_dir, "stepped",
+                         lambda dest: backup.copy_online(db_path, dest, pages=args.pages, sleep=args.sleep),
+                         args.write_interval),
+            run_scenario(db_path, work_dir, "one-shot", lambda dest: one_shot_copy(db_path, dest),
+                         args.write_interval),
+        ]
+    finally:
+        remove_tree(work_dir)
+
+    print(f"{'backup':10} {'seconds':>8} {'commits':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} "
+          f"{'errors':>7} {'restarts':>9} {'integrity':>10}")
+    for r in results:
+        restarts = str(r['restarts'])
+        print(f"{r['name']:10} {r['seconds']:>8.2f} {r['writes']:>8} {r['p50']:>8.1f} {r['p95']:>8.1f} "
+              f"{r['max']:>8.1f} {r['errors']:>7} {restarts:>9} {r['integrity']:>10}")
+    print("\n(commits = จำนวน commit ที่สำเร็จระหว่าง backup; aborted = เริ่มใหม่เกินกำหนดจึงยกเลิกให้ลองใหม่ภายหลัง)")
+
+    stepped = results[0]
+    expected = stepped["seconds"] / (args.write_interval + stepped["p50"] / 1000)
+    failures = []
+    if stepped["writes"] < max(1, args.min_write_ratio * expected):
+        failures.append(f"ผู้เขียน commit ได้ {stepped['writes']} ครั้งระหว่าง stepped backup "
+                        f"(ควรได้ราว {expected:.0f}) การเขียนถูกบล็อก")
+    if stepped["aborted"] and not args.rollback_journal:
+        failures.append("stepped backup ถูกยกเลิกทั้งที่เป็น WAL")
+    for r in results:
+        if r["errors"]:
+            failures.append(f"{r['name']}: commit ล้มเหลว {r['errors']} ครั้ง")
+        if r["integrity"] not in ("ok", "aborted"):
+            failures.append(f"{r['name']}: integrity_check {r['integrity']}")
+    for failure in failures:
+        print(f"❌ {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""วัดเวลา cold start: ตั้งแต่เริ่ม process จนได้ response แรกของหน้า /
+
+ใช้งาน:
+    python benchmarks/coldstart.py                   # python process ใหม่ + Flask test client
+    python benchmarks/coldstart.py --mode gunicorn   # gunicorn worker ใหม่จนตอบ HTTP 200 ครั้งแรก
+    python benchmarks/coldstart.py --save-baseline
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from common import REPO_ROOT, compare_metric, copy_database, load_baseline, remove_tree, save_baseline
+
+CHILD_CODE = """
+import app as app_module
+flask_app = app_module.create_app() if hasattr(app_module, 'create_app') else app_module.app
+resp = flask_app.test_client().get('/')
+assert resp.status_code == 200, resp.status_code
+"""
+
+
+def run_inprocess(db_path, work_dir):
+    env = dict(os.environ, BAKERY_DB=str(db_path), PYTHONPATH=str(REPO_ROOT), PYTHONDONTWRITEBYTECODE="")
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", CHILD_CODE], env=env, cwd=work_dir, check=True)
+    return time.perf_counter() - start
+
+
+def run_gunicorn(db_path, work_dir, target):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    env = dict(os.environ, BAKERY_DB=str(db_path))
+    cmd = [sys.executable, "-m", "gunicorn", "--workers", "1", "--bind", f"127.0.0.1:{port}",
+           "--pythonpath", str(REPO_ROOT), "--chdir", str(work_dir), "--log-level", "warning", target]
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, env=env)
+    try:
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=5) as resp:
+                    if resp.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                if proc.poll() is not None:
+                    raise RuntimeError("gunicorn หยุดทำงานก่อนตอบ request แรก")
+                time.sleep(0.01)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=15)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["inprocess", "gunicorn"], default="inprocess")
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--target", default="app:create_app()", help="WSGI target สำหรับ gunicorn")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="bakery-coldstart-")
+    try:
+        db_path = copy_database(work_dir)
+        samples = []
+        for _ in range(args.runs):
+            if args.mode == "inprocess":
+                samples.append(run_inprocess(db_path, work_dir))
+            else:
+                samples.append(run_gunicorn(db_path, work_dir, args.target))
+    finally:
+        remove_tree(work_dir)
+
+    result = {"median_ms": statistics.median(samples) * 1000, "min_ms": min(samples) * 1000,
+              "runs": args.runs}
+    name = f"coldstart-{args.mode}"
+    baseline = load_baseline(name)
+    line = f"cold start ({args.mode}): median {result['median_ms']:.0f} ms, min {result['min_ms']:.0f} ms"
+    regressed = False
+    if baseline:
+        change, regressed = compare_metric(result["median_ms"], baseline["median_ms"], args.threshold)
+        line += f"  (baseline {baseline['median_ms']:.0f} ms, {change:+.0%})"
+        if regressed:
+            line += "  REGRESSION"
+    print(line)
+    if args.save_baseline:
+        print(f"บันทึก baseline: {save_baseline(name, result)}")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
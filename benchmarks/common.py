@@ -0,0 +1,85 @@
+"""ฟังก์ชันกลางของชุด benchmark: ฐานข้อมูลชั่วคราว, percentile และ baseline"""
+import importlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+SOURCE_DB = REPO_ROOT / "bakery.db"
+
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def copy_database(dest_dir, source=SOURCE_DB):
+    """คัดลอก bakery.db ไปไว้ในโฟลเดอร์ชั่วคราว (ใช้ backup API กันไฟล์ขาดกลางทาง) แล้วอัปเกรด schema"""
+    dest = Path(dest_dir) / "bakery.db"
+    src = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+    dst = sqlite3.connect(dest)
+    with dst:
+        src.backup(dst)
+    src.close()
+    dst.close()
+    load_app(dest, dest_dir).setup_database()
+    return dest
+
+
+def load_app(db_path, work_dir):
+    """import app.py โดยชี้ฐานข้อมูลและโฟลเดอร์อัปโหลด (สลิป, รูปสินค้า) ไปที่ไฟล์ชั่วคราว"""
+    os.environ["BAKERY_DB"] = str(db_path)
+    app_module = importlib.import_module("app")
+    app_module.DB_NAME = str(db_path)
+    app_module.UPLOAD_FOLDER1 = str(Path(work_dir) / "slips")
+    # migration ของ image store เขียนไฟล์ใหม่ลงโฟลเดอร์รูป จึงใช้สำเนาแทนโฟลเดอร์จริงของ repo
+    products_dir = Path(work_dir) / "products"
+    if not products_dir.exists():
+        shutil.copytree(REPO_ROOT / "static" / "images" / "products", products_dir)
+    app_module.UPLOAD_FOLDER2 = str(products_dir)
+    app_module.app.config["TESTING"] = True
+    return app_module
+
+
+def percentile(sorted_values, pct):
+    """percentile แบบ nearest-rank จาก list ที่เรียงแล้ว"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def baseline_path(name):
+    return BASELINE_DIR / f"{name}.json"
+
+
+def load_baseline(name):
+    path = baseline_path(name)
+    if not path.exists():
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(name, data):
+    BASELINE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(baseline_path(name), "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False, sort_keys=True)
+        f.write("\n")
+    return baseline_path(name)
+
+
+def compare_metric(current, baseline, threshold, higher_is_better=False):
+    """คืนค่าอัตราการเปลี่ยนแปลง (+ คือแย่ลง) และ flag ว่าเกิน threshold หรือไม่"""
+    if not baseline:
+        return 0.0, False
+    change = (current - baseline) / baseline
+    if higher_is_better:
+        change = -change
+    return change, change > threshold
+
+
+def remove_tree(path):
+    shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,127 @@
+"""รายงานต้นทุน CPU เทียบกับจำนวน byte ที่ประหยัดได้จาก CompressionMiddleware
+
+ยิงแต่ละหน้าผ่าน Flask test client แบบไม่บีบ (identity), gzip และ br (ถ้าติดตั้ง brotli)
+แล้วเทียบเวลา response, ขนาดที่ส่งจริง และเวลาส่งที่ประหยัดได้บนเน็ตมือถือ
+ส่วนท้ายวัดเฉพาะตัวบีบอัดกับ body เดียวกันที่ระดับต่าง ๆ เพื่อใช้เลือก COMPRESS_LEVEL
+
+ใช้งาน:
+    python benchmarks/compression.py
+    python benchmarks/compression.py --orders 5000 --bandwidth-kbps 1500 --runs 30
+"""
+import argparse
+import gzip
+import statistics
+import sys
+import tempfile
+import time
+
+import generate_data
+from common import load_app, remove_tree
+
+PAGES = [
+    ("GET", "/", None, False),
+    ("GET", "/cart", None, False),
+    ("POST", "/add_to_cart", {"product_id": 1, "quantity": 1}, False),
+    ("GET", "/get_cart_summary", None, False),
+    ("GET", "/admin/orders", None, True),
+    ("GET", "/admin/payments", None, True),
+    ("GET", "/admin/order_history", None, True),
+]
+
+
+def timed_request(client, method, path, payload, encoding):
+    headers = {"Accept-Encoding": encoding} if encoding else {}
+    start = time.perf_counter()
+    resp = client.open(path, method=method, json=payload, headers=headers)
+    body = resp.get_data()
+    elapsed = time.perf_counter() - start
+    return elapsed * 1000, len(body), resp.headers.get("Content-Encoding")
+
+
+def measure_page(client, method, path, payload, encodings, runs):
+    results = {}
+    for encoding in encodings:
+        timed_request(client, method, path, payload, encoding)  # warm up
+        samples, size, applied = [], 0, None
+        for _ in range(runs):
+            ms, size, applied = timed_request(client, method, path, payload, encoding)
+            samples.append(ms)
+        results[encoding or "identity"] = {"ms": statistics.median(samples), "bytes": size,
+                                           "applied": applied}
+    return results
+
+
+def compressor_levels(body, runs):
+    rows = []
+    candidates = [("gzip", level, lambda b, lv=level: gzip.compress(b, compresslevel=lv)) for level in (1, 6, 9)]
+    try:
+        import brotli
+        candidates += [("br", q, lambda b, q=q: brotli.compress(b, quality=q)) for q in (1, 4, 11)]
+    except ImportError:
+        pass
+    for name, level, func in candidates:
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            out = func(body)
+            samples.append((time.perf_counter() - start) * 1000)
+        rows.append((name, level, len(out), statistics.median(samples)))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=2000, help="จำนวน order ในฐานข้อมูลสังเคราะห์")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--bandwidth-kbps", type=float, default=1500, help="ความเร็วดาวน์โหลดสมมติ (เน็ตมือถือ)")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="bakery-compress-")
+    try:
+        db_path = f"{work_dir}/bakery.db"
+        generate_data.main([db_path, "--orders", str(args.orders), "--users", "500", "--products", "60"])
+        app_module = load_app(db_path, work_dir)
+        if not isinstance(app_module.app.wsgi_app, app_module.CompressionMiddleware):
+            print("CompressionMiddleware ไม่ได้เปิดอยู่ (BAKERY_COMPRESS=0?)")
+            return 1
+        encodings = ["", "gzip"] + (["br"] if app_module.brotli is not None else [])
+        client = app_module.app.test_client()
+        admin = app_module.app.test_client()
+        with admin.session_transaction() as sess:
+            sess["user_id"] = 1
+            sess["role"] = "admin"
+
+        results = {}
+        bodies = {}
+        for method, path, payload, needs_admin in PAGES:
+            c = admin if needs_admin else client
+            results[path] = measure_page(c, method, path, payload, encodings, args.runs)
+            bodies[path] = c.open(path, method=method, json=payload).get_data()
+    finally:
+        remove_tree(work_dir)
+
+    bytes_per_ms = args.bandwidth_kbps * 1000 / 8 / 1000
+    print(f"\n{'endpoint':22} {'enc':>8} {'bytes':>10} {'ratio':>6} {'server ms':>10} {'+cpu ms':>8} "
+          f"{'transfer ms':>12} {'net saved ms':>13}")
+    for path, by_encoding in results.items():
+        identity = by_encoding["identity"]
+        for encoding, r in by_encoding.items():
+            label = encoding if encoding == "identity" or r["applied"] else f"{encoding}(skip)"
+            transfer = r["bytes"] / bytes_per_ms
+            saved = identity["bytes"] / bytes_per_ms - transfer - (r["ms"] - identity["ms"])
+            print(f"{path:22} {label:>8} {r['bytes']:>10,} {r['bytes'] / identity['bytes']:>6.0%} "
+                  f"{r['ms']:>10.2f} {r['ms'] - identity['ms']:>+8.2f} {transfer:>12.1f} {saved:>+13.1f}")
+
+    largest = max(bodies, key=lambda p: len(bodies[p]))
+    body = bodies[largest]
+    print(f"\nตัวบีบอัดล้วน ๆ กับ body ของ {largest} ({len(body):,} bytes)")
+    print(f"{'codec':>6} {'level':>6} {'bytes':>10} {'ratio':>6} {'ms':>8} {'ms per 100KB saved':>20}")
+    for name, level, size, ms in compressor_levels(body, args.runs):
+        saved_kb = (len(body) - size) / 100_000
+        print(f"{name:>6} {level:>6} {size:>10,} {size / len(body):>6.0%} {ms:>8.2f} {ms / saved_kb:>20.2f}")
+    print(f"\n(transfer คิดที่ {args.bandwidth_kbps:.0f} kbps; net saved = เวลาส่งที่ลดลง - CPU ที่เพิ่มขึ้น)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
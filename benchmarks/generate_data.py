@@ -0,0 +1,249 @@
+"""สร้างฐานข้อมูลสังเคราะห์ขนาดใหญ่สำหรับทดสอบ scale (schema เดียวกับ setup_database())
+
+ใช้งาน:
+    python benchmarks/generate_data.py /tmp/bakery-1m.db --orders 1000000
+    BAKERY_DB=/tmp/bakery-1m.db python app.py
+
+ทุกตารางเขียนด้วย executemany ทีละ batch ใหญ่ในหนึ่ง transaction
+เวลาทั้งหมดเก็บเป็น UTC แบบเดียวกับ CURRENT_TIMESTAMP แต่กระจายตามเวลาเปิดร้านของกรุงเทพฯ
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+from pathlib import Path
+
+from common import REPO_ROOT, load_app
+
+BANGKOK_OFFSET = 7 * 3600
+# ชั่วโมงเปิดร้าน 07:00-20:00 น้ำหนักตามช่วงเช้า/บ่าย
+OPEN_HOURS = list(range(7, 20))
+HOUR_WEIGHTS = [4, 8, 9, 7, 8, 9, 6, 5, 6, 7, 6, 4, 2]
+ORDER_STATUSES = ["completed", "processing", "pending", "cancelled"]
+ORDER_STATUS_WEIGHTS = [72, 8, 8, 12]
+PAYMENT_METHODS = ["promptpay", "cod"]
+PAYMENT_METHOD_WEIGHTS = [60, 40]
+DELIVERY_METHODS = ["delivery", "pickup"]
+DELIVERY_METHOD_WEIGHTS = [70, 30]
+ITEMS_PER_ORDER = [1, 1, 1, 2, 2, 3, 4]
+PICKUP_ADDRESS = "รับที่ร้าน Sweet Dreams Bakery"
+PROVINCES = [
+    ("เชียงราย", "เมืองเชียงราย", "57000"),
+    ("เชียงราย", "แม่สาย", "57130"),
+    ("เชียงใหม่", "เมืองเชียงใหม่", "50000"),
+    ("กรุงเทพมหานคร", "บางรัก", "10500"),
+    ("ลำปาง", "เมืองลำปาง", "52000"),
+    ("พะเยา", "เมืองพะเยา", "56000"),
+]
+PRODUCT_NAMES = {
+    "เค้ก": ["เค้กช็อกโกแลต", "เค้กส้ม", "เค้กเรดเวลเวท", "เค้กสตรอว์เบอร์รี", "ชีสเค้ก"],
+    "ขนมปัง": ["ครัวซองต์", "ขนมปังฝรั่งเศส", "ขนมปังโฮลวีต", "ดานิช"],
+    "เครื่องดื่ม": ["ลาเต้เย็น", "ชาเขียวเย็น", "อเมริกาโน่", "โกโก้เย็น"],
+    "ขนมหวาน": ["บราวนี่", "มาการอง", "ทีรามิสุ", "โมจิ"],
+    "เมนูพิเศษ": ["เค้กวันเกิด", "กล่องของขวัญ", "ชุดเบรกประชุม"],
+}
+IMAGES = ["chocolate_cake.jpg", "orange_cake.jpg", "red_velvet.jpg", "croissant.jpg", "baguette.jpg",
+          "iced_latte.jpg", "iced_greentea.jpg", "brownie.jpg", "macaron.jpg", "tiramisu.jpg", "mochi.jpg"]
+
+
+def create_schema(db_path):
+    """ใช้ setup_database() ของแอป (init_db + migrations + seed) สร้าง schema ให้ตรงกันเสมอ"""
+    app_module = load_app(db_path, os.path.dirname(db_path))
+    app_module.setup_database()
+    return app_module
+
+
+def generate_users(conn, rng, count, password_hash, start_epoch):
+    users, addresses, user_addresses = [], [], []
+    address_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM addresses").fetchone()[0]
+    for i in range(1, count + 1):
+        username = f"user{i:07d}"
+        full_name = f"ลูกค้า {i}"
+        phone = f"08{rng.randrange(10**8):08d}"
+        created = start_epoch + rng.randrange(86400 * 30)
+        users.append((username, f"{username}@example.com", password_hash, full_name, phone, created))
+        user_address = []
+        for _ in range(rng.choice((1, 1, 1, 2))):
+            province, city, postal = rng.choice(PROVINCES)
+            line = f"{rng.randrange(1, 999)}/{rng.randrange(1, 99)} หมู่ {rng.randrange(1, 20)}"
+            addresses.append((i, full_name, phone, line, city, province, postal, created))
+            address_id += 1
+            # (customer_address, address_id + snapshot ship_*) แบบเดียวกับ place_order
+            user_address.append((f"{full_name}, {line}, {city}, {province}, {postal}",
+                                 (address_id, full_name, phone, line, city, province, postal)))
+        user_addresses.append((full_name, phone, user_address))
+    first_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM users").fetchone()[0]
+    conn.executemany("""
+        INSERT INTO users (id, username, email, password, full_name, phone, role, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, 'customer', datetime(?, 'unixepoch'))
+    """, ((first_id + n, *u) for n, u in enumerate(users)))
+    conn.executemany("""
+        INSERT INTO addresses (user_id, recipient_name, phone, address, city, province, postal_code, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, datetime(?, 'unixepoch'))
+    """, ((first_id + a[0] - 1, *a[1:]) for a in addresses))
+    return list(range(first_id, first_id + count)), user_addresses
+
+
+def generate_products(conn, rng, count, start_epoch):
+    categories = conn.execute("SELECT id, name FROM categories").fetchall()
+    rows, prices = [], []
+    for i in range(count):
+        category_id, category_name = categories[i % len(categories)]
+        base = rng.choice(PRODUCT_NAMES.get(category_name, ["สินค้า"]))
+        price = rng.randrange(25, 250, 5) * 100  # สตางค์
+        prices.append(price)
+        rows.append((f"{base} #{i + 1}", None, f"{base} สูตรพิเศษ", price, rng.choice(IMAGES),
+                     category_id, 1 if rng.random() < 0.92 else 0, 1 if rng.random() < 0.1 else 0,
+                     rng.randrange(0, 200), start_epoch))
+    first_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM products").fetchone()[0]
+    conn.executemany("""
+        INSERT INTO products (id, name, name_en, description, price, image, category_id,
+                              is_available, is_featured, stock_quantity, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime(?, 'unixepoch'))
+    """, ((first_id + n, *r) for n, r in enumerate(rows)))
+    return list(range(first_id, first_id + count)), prices
+
+
+def generate_orders(conn, rng, args, user_ids, user_addresses, product_ids, prices, start_day_utc):
+    """สร้าง orders/order_items/payments ทีละ batch เรียง id ตามเวลา"""
+    status_cum = list(accumulate(ORDER_STATUS_WEIGHTS))
+    method_cum = list(accumulate(PAYMENT_METHOD_WEIGHTS))
+    delivery_cum = list(accumulate(DELIVERY_METHOD_WEIGHTS))
+    hour_cum = list(accumulate(HOUR_WEIGHTS))
+    n_products = len(product_ids)
+    n_users = len(user_ids)
+    seconds_per_order = args.days * 86400 / args.orders
+    order_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM orders").fetchone()[0]
+    totals = {"orders": 0, "order_items": 0, "payments": 0}
+
+    for batch_start in range(0, args.orders, args.batch_size):
+        size = min(args.batch_size, args.orders - batch_start)
+        statuses = rng.choices(ORDER_STATUSES, cum_weights=status_cum, k=size)
+        methods = rng.choices(PAYMENT_METHODS, cum_weights=method_cum, k=size)
+        deliveries = rng.choices(DELIVERY_METHODS, cum_weights=delivery_cum, k=size)
+        hours = rng.choices(OPEN_HOURS, cum_weights=hour_cum, k=size)
+        orders, items, payments = [], [], []
+        for n in range(size):
+            order_id += 1
+            idx = batch_start + n
+            day = int(idx * seconds_per_order) // 86400
+            created = start_day_utc + day * 86400 + hours[n] * 3600 + rng.randrange(3600) - BANGKOK_OFFSET
+            user_index = rng.randrange(n_users)
+            name, phone, addrs = user_addresses[user_index]
+            status, method, delivery = statuses[n], methods[n], deliveries[n]
+
+            total = 0
+            for _ in range(rng.choice(ITEMS_PER_ORDER)):
+                p = rng.randrange(n_products)
+                qty = rng.randrange(1, 4)
+                line_total = prices[p] * qty
+                total += line_total
+                items.append((order_id, product_ids[p], qty, prices[p], line_total, ""))
+
+            address, shipping = rng.choice(addrs) if delivery == "delivery" else (PICKUP_ADDRESS, (None,) * 7)
+            cancelled_at = created + rng.randrange(300, 7200) if status == "cancelled" else None
+            orders.append((order_id, user_ids[user_index], total, status, name, phone, address,
+                           cancelled_at, method, "", delivery, created, *shipping))
+
+            if method == "cod":
+                payments.append((order_id, method, total, "paid", None, None))
+            else:
+                slip = f"slip_{order_id}_{datetime.fromtimestamp(created + 600, timezone.utc):%Y%m%d%H%M%S}.png"
+                if status in ("completed", "processing"):
+                    payments.append((order_id, method, total, "paid", slip, created + rng.randrange(120, 3600)))
+                elif status == "pending":
+                    r = rng.random()
+                    if r < 0.5:
+                        payments.append((order_id, method, total, "pending", None, None))
+                    elif r < 0.85:
+                        payments.append((order_id, method, total, "verifying", slip, created + 600))
+                    else:
+                        payments.append((order_id, method, total, "rejected", slip, created + 600))
+                else:
+                    payments.append((order_id, method, total, "pending", None, None))
+
+        conn.execute("BEGIN")
+        conn.executemany("""
+            INSERT INTO orders (id, user_id, total_amount, status, customer_name, customer_phone,
+                                customer_address, cancelled_at, payment_method, notes, delivery_method, created_at,
+                                address_id, ship_recipient_name, ship_phone, ship_address, ship_city,
+                                ship_province, ship_postal_code)
+            VALUES (?, ?, ?, ?, ?, ?, ?, datetime(?, 'unixepoch'), ?, ?, ?, datetime(?, 'unixepoch'),
+                    ?, ?, ?, ?, ?, ?, ?)
+        """, orders)
+        conn.executemany("""
+            INSERT INTO order_items (order_id, product_id, quantity, unit_price, total_price, options)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, items)
+        conn.executemany("""
+            INSERT INTO payments (order_id, payment_method, amount, status, slip_image, paid_at)
+            VALUES (?, ?, ?, ?, ?, datetime(?, 'unixepoch'))
+        """, payments)
+        conn.execute("COMMIT")
+        totals["orders"] += len(orders)
+        totals["order_items"] += len(items)
+        totals["payments"] += len(payments)
+        print(f"  orders {totals['orders']:,}/{args.orders:,}", end="\r", flush=True)
+    print()
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output", help="ไฟล์ฐานข้อมูลปลายทาง (ต้องยังไม่มีอยู่ หรือใช้ --force)")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=730, help="ช่วงประวัติการสั่งซื้อย้อนหลัง (วัน)")
+    parser.add_argument("--batch-size", type=int, default=100000, help="จำนวน order ต่อ transaction")
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--force", action="store_true", help="เขียนทับไฟล์ปลายทาง")
+    args = parser.parse_args(argv)
+
+    output = Path(args.output).resolve()
+    if output == (REPO_ROOT / "bakery.db").resolve():
+        parser.error("ห้ามเขียนทับ bakery.db ของโปรเจ็กต์")
+    if output.exists():
+        if not args.force:
+            parser.error(f"{output} มีอยู่แล้ว (ใช้ --force เพื่อเขียนทับ)")
+        output.unlink()
+
+    started = time.perf_counter()
+    app_module = create_schema(str(output))
+    rng = random.Random(args.seed)
+
+    conn = sqlite3.connect(output, isolation_level=None)
+    # ไฟล์ใหม่ทั้งไฟล์: ถ้าล้มกลางทางก็แค่สร้างใหม่ จึงปิด journal/fsync ได้
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -200000")
+
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    # epoch ของวันแรกในช่วงประวัติ ใช้เป็นฐานของเวลาท้องถิ่นกรุงเทพฯ (หัก BANGKOK_OFFSET ตอนสร้าง order)
+    start_day_utc = int((today - timedelta(days=args.days)).timestamp())
+    password_hash = app_module.generate_password_hash("password123")
+
+    conn.execute("BEGIN")
+    user_ids, user_addresses = generate_users(conn, rng, args.users, password_hash, start_day_utc - BANGKOK_OFFSET)
+    product_ids, prices = generate_products(conn, rng, args.products, start_day_utc - BANGKOK_OFFSET)
+    conn.execute("COMMIT")
+    print(f"users {len(user_ids):,}, products {len(product_ids):,} ({time.perf_counter() - started:.1f}s)")
+
+    totals = generate_orders(conn, rng, args, user_ids, user_addresses, product_ids, prices, start_day_utc)
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA journal_mode = WAL")  # กลับเป็นโหมดเดียวกับ migration ของแอป
+    conn.close()
+
+    elapsed = time.perf_counter() - started
+    size_mb = output.stat().st_size / 1024 / 1024
+    print(f"orders {totals['orders']:,}, order_items {totals['order_items']:,}, payments {totals['payments']:,}")
+    print(f"เสร็จใน {elapsed:.1f}s -> {output} ({size_mb:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,394 @@
+"""Load test จำลองทราฟฟิกหน้าร้าน, checkout และแอดมินบนสำเนาชั่วคราวของ bakery.db
+
+ใช้งาน:
+    python benchmarks/loadtest.py                      # in-process ผ่าน Flask test client
+    python benchmarks/loadtest.py --mode http          # ยิง HTTP ไปที่ gunicorn บนเครื่อง
+    python benchmarks/loadtest.py --save-baseline      # บันทึกผลเป็น baseline ใหม่
+    python benchmarks/loadtest.py --fail-on-regression # exit 1 ถ้าช้ากว่า baseline เกิน threshold
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from contextlib import contextmanager
+
+from common import (REPO_ROOT, compare_metric, copy_database, load_app, load_baseline,
+                    percentile, remove_tree, save_baseline)
+
+LOADTEST_PASSWORD = "loadtest123"
+CUSTOMER_USERNAME = "loadtest_customer"
+ADMIN_USERNAME = "loadtest_admin"
+DEFAULT_WEIGHTS = {"browse": 50, "cart": 25, "checkout": 10, "admin": 15}
+# PNG ขนาด 1x1 ใช้เป็นสลิปจำลอง
+SLIP_DATA_URL = ("data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk"
+                 "+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==")
+PAYMENT_RE = re.compile(r"/payment/(\d+)")
+# endpoint ที่มีจำนวน request น้อยกว่านี้ p95 แกว่งเกินกว่าจะใช้ตัดสินว่าช้าลง
+MIN_SAMPLES = 20
+
+
+# ========================
+# เตรียมฐานข้อมูลชั่วคราว
+# ========================
+
+def prepare_database(db_path):
+    """สร้างผู้ใช้สำหรับทดสอบ เติม stock และคืนรายการหมวดหมู่/สินค้าที่ใช้สุ่ม"""
+    from werkzeug.security import generate_password_hash
+
+    conn = sqlite3.connect(db_path)
+    password = generate_password_hash(LOADTEST_PASSWORD)
+    for username, role in ((CUSTOMER_USERNAME, "customer"), (ADMIN_USERNAME, "admin")):
+        conn.execute("""
+            INSERT OR IGNORE INTO users (username, email, password, full_name, phone, role)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (username, f"{username}@example.com", password, username, "0800000000", role))
+    # ให้ checkout ไม่ล้มเพราะของหมดระหว่างทดสอบ
+    conn.execute("UPDATE products SET stock_quantity = 1000000")
+    conn.commit()
+    category_ids = [r[0] for r in conn.execute("SELECT id FROM categories")]
+    product_ids = [r[0] for r in conn.execute("SELECT id FROM products WHERE is_available = 1")]
+    conn.close()
+    return category_ids, product_ids
+
+
+# ========================
+# Clients
+# ========================
+
+class InProcessClient:
+    """เรียกแอปผ่าน Flask test client (ไม่มี network)"""
+
+    def __init__(self, flask_app):
+        self.client = flask_app.test_client()
+
+    def request(self, method, path, form=None, json_body=None):
+        resp = self.client.open(path, method=method, data=form, json=json_body)
+        body = resp.get_data()
+        resp.close()
+        return resp.status_code, resp.headers.get("Location", ""), body
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpClient:
+    """เรียกแอปผ่าน HTTP จริง เก็บ cookie แยกต่อผู้ใช้จำลอง"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def request(self, method, path, form=None, json_body=None):
+        data, headers = None, {}
+        if json_body is not None:
+            data = json.dumps(json_body).encode()
+            headers["Content-Type"] = "application/json"
+        elif form is not None:
+            data = urllib.parse.urlencode(form).encode()
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with self.opener.open(req, timeout=30) as resp:
+                return resp.status, resp.headers.get("Location", ""), resp.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers.get("Location", ""), e.read()
+
+
+# ========================
+# สถิติ
+# ========================
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, label, elapsed_ms, error):
+        with self.lock:
+            self.latencies[label].append(elapsed_ms)
+            if error:
+                self.errors[label] += 1
+
+    def summary(self, wall_seconds):
+        endpoints = {}
+        all_latencies = []
+        total_errors = 0
+        for label, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            all_latencies.extend(values)
+            total_errors += self.errors[label]
+            endpoints[label] = {
+                "requests": len(values),
+                "error_rate": self.errors[label] / len(values),
+                "throughput_rps": len(values) / wall_seconds,
+                "p50_ms": percentile(values, 50),
+                "p95_ms": percentile(values, 95),
+                "p99_ms": percentile(values, 99),
+            }
+        all_latencies.sort()
+        total = len(all_latencies)
+        return {
+            "wall_seconds": wall_seconds,
+            "total": {
+                "requests": total,
+                "error_rate": total_errors / total if total else 0.0,
+                "throughput_rps": total / wall_seconds if wall_seconds else 0.0,
+                "p50_ms": percentile(all_latencies, 50),
+                "p95_ms": percentile(all_latencies, 95),
+                "p99_ms": percentile(all_latencies, 99),
+            },
+            "endpoints": endpoints,
+        }
+
+
+# ========================
+# User journeys
+# ========================
+
+class VirtualUser:
+    """ผู้ใช้จำลองหนึ่งคน มี session ลูกค้าและแอดมินแยกกัน"""
+
+    def __init__(self, make_client, stats, rng, category_ids, product_ids):
+        self.customer = make_client()
+        self.admin = make_client()
+        self.stats = stats
+        self.rng = rng
+        self.category_ids = category_ids
+        self.product_ids = product_ids
+        self.customer_logged_in = False
+        self.admin_logged_in = False
+
+    def call(self, client, label, method, path, ok_statuses=None, **kwargs):
+        start = time.perf_counter()
+        try:
+            status, location, body = client.request(method, path, **kwargs)
+        except Exception:
+            self.stats.record(label, (time.perf_counter() - start) * 1000, error=True)
+            return None
+        error = status >= 400 if ok_statuses is None else status not in ok_statuses
+        self.stats.record(label, (time.perf_counter() - start) * 1000, error=error)
+        return None if error else (status, location, body)
+
+    def login(self, client, username):
+        return self.call(client, "POST /login", "POST", "/login", ok_statuses={302},
+                         form={"username": username, "password": LOADTEST_PASSWORD}) is not None
+
+    def add_to_cart(self):
+        product_id = self.rng.choice(self.product_ids)
+        self.call(self.customer, "POST /add_to_cart", "POST", "/add_to_cart",
+                  json_body={"product_id": product_id, "quantity": self.rng.randint(1, 3)})
+
+    def browse(self):
+        self.call(self.customer, "GET /", "GET", "/")
+        self.call(self.customer, "GET /category/<id>", "GET", f"/category/{self.rng.choice(self.category_ids)}")
+        self.call(self.customer, "GET /product/<id>", "GET", f"/product/{self.rng.choice(self.product_ids)}")
+
+    def cart(self):
+        self.add_to_cart()
+        self.call(self.customer, "GET /cart", "GET", "/cart")
+        self.call(self.customer, "GET /get_cart_summary", "GET", "/get_cart_summary")
+
+    def checkout(self):
+        if not self.customer_logged_in:
+            self.customer_logged_in = self.login(self.customer, CUSTOMER_USERNAME)
+            if not self.customer_logged_in:
+                return
+        self.add_to_cart()
+        result = self.call(self.customer, "POST /checkout", "POST", "/checkout", ok_statuses={302}, form={
+            "customer_name": "Load Test",
+            "customer_phone": "0800000000",
+            "delivery_method": "pickup",
+            "payment_method": "promptpay",
+            "notes": "",
+        })
+        match = PAYMENT_RE.search(result[1]) if result else None
+        if not match:
+            return
+        order_id = match.group(1)
+        self.call(self.customer, "GET /payment/<id>", "GET", f"/payment/{order_id}")
+        self.call(self.customer, "POST /confirm_payment/<id>", "POST", f"/confirm_payment/{order_id}",
+                  json_body={"slip_image": SLIP_DATA_URL})
+
+    def admin_poll(self):
+        if not self.admin_logged_in:
+            self.admin_logged_in = self.login(self.admin, ADMIN_USERNAME)
+            if not self.admin_logged_in:
+                return
+        self.call(self.admin, "GET /admin/orders", "GET", "/admin/orders")
+        self.call(self.admin, "GET /admin/payments", "GET", "/admin/payments")
+
+
+def run_users(make_client, stats, args, category_ids, product_ids):
+    journeys = list(args.weights)
+    weights = [args.weights[j] for j in journeys]
+    deadline = time.perf_counter() + args.duration if args.duration else None
+
+    def worker(index):
+        rng = random.Random(args.seed + index)
+        user = VirtualUser(make_client, stats, rng, category_ids, product_ids)
+        actions = {"browse": user.browse, "cart": user.cart,
+                   "checkout": user.checkout, "admin": user.admin_poll}
+        done = 0
+        while True:
+            if deadline is not None:
+                if time.perf_counter() >= deadline:
+                    break
+            elif done >= args.iterations:
+                break
+            actions[rng.choices(journeys, weights)[0]]()
+            done += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.users)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start
+
+
+# ========================
+# gunicorn
+# ========================
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def gunicorn_server(db_path, work_dir, workers):
+    port = _free_port()
+    env = dict(os.environ, BAKERY_DB=str(db_path))
+    cmd = [sys.executable, "-m", "gunicorn", "--workers", str(workers),
+           "--bind", f"127.0.0.1:{port}", "--pythonpath", str(REPO_ROOT),
+           "--chdir", str(work_dir), "--log-level", "warning", "app:create_app()"]
+    proc = subprocess.Popen(cmd, env=env)
+    try:
+        deadline = time.time() + 30
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+                break
+            except OSError:
+                if proc.poll() is not None or time.time() > deadline:
+                    raise RuntimeError("gunicorn ไม่สามารถเริ่มทำงานได้")
+                time.sleep(0.1)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        proc.terminate()
+        proc.wait(timeout=15)
+
+
+# ========================
+# รายงานผล
+# ========================
+
+def print_report(result, baseline, threshold):
+    base_endpoints = (baseline or {}).get("endpoints", {})
+    print(f"\n{'endpoint':34} {'reqs':>6} {'err%':>6} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}  vs baseline p95")
+    regressions = []
+    rows = list(result["endpoints"].items()) + [("TOTAL", result["total"])]
+    for label, m in rows:
+        base = base_endpoints.get(label) if label != "TOTAL" else (baseline or {}).get("total")
+        note = ""
+        if base and m["requests"] >= MIN_SAMPLES:
+            change, regressed = compare_metric(m["p95_ms"], base["p95_ms"], threshold)
+            err_regressed = m["error_rate"] > base["error_rate"] + 0.01
+            note = f"{change:+.0%}"
+            if regressed or err_regressed:
+                note += "  REGRESSION"
+                regressions.append(label)
+        print(f"{label:34} {m['requests']:>6} {m['error_rate'] * 100:>5.1f}% {m['throughput_rps']:>8.1f} "
+              f"{m['p50_ms']:>8.1f} {m['p95_ms']:>8.1f} {m['p99_ms']:>8.1f}  {note}")
+    if baseline:
+        change, regressed = compare_metric(result["total"]["throughput_rps"],
+                                           baseline["total"]["throughput_rps"], threshold,
+                                           higher_is_better=True)
+        print(f"\nthroughput vs baseline: {-change:+.0%}" + ("  REGRESSION" if regressed else ""))
+        if regressed:
+            regressions.append("throughput")
+    return regressions
+
+
+def parse_weights(text):
+    weights = dict(DEFAULT_WEIGHTS)
+    if text:
+        for part in text.split(","):
+            name, _, value = part.partition("=")
+            if name not in DEFAULT_WEIGHTS:
+                raise argparse.ArgumentTypeError(f"ไม่รู้จัก journey: {name}")
+            weights[name] = int(value)
+    return {k: v for k, v in weights.items() if v > 0}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["inprocess", "http"], default="inprocess")
+    parser.add_argument("--users", type=int, default=8, help="จำนวนผู้ใช้จำลองพร้อมกัน (threads)")
+    parser.add_argument("--iterations", type=int, default=50, help="จำนวน journey ต่อผู้ใช้")
+    parser.add_argument("--duration", type=float, default=0, help="รันตามเวลา (วินาที) แทน --iterations")
+    parser.add_argument("--gunicorn-workers", type=int, default=2)
+    parser.add_argument("--weights", type=parse_weights, default=dict(DEFAULT_WEIGHTS),
+                        help="เช่น browse=50,cart=25,checkout=10,admin=15")
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--baseline", default=None, help="ชื่อ baseline (ค่าเริ่มต้น loadtest-<mode>)")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.25, help="ยอมให้ช้าลงได้กี่เท่า (0.25 = 25%%)")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--json", help="เขียนผลลัพธ์เป็นไฟล์ JSON")
+    args = parser.parse_args(argv)
+
+    baseline_name = args.baseline or f"loadtest-{args.mode}"
+    work_dir = tempfile.mkdtemp(prefix="bakery-loadtest-")
+    try:
+        db_path = copy_database(work_dir)
+        category_ids, product_ids = prepare_database(db_path)
+        stats = Stats()
+        if args.mode == "inprocess":
+            app_module = load_app(db_path, work_dir)
+            wall = run_users(lambda: InProcessClient(app_module.app), stats, args, category_ids, product_ids)
+        else:
+            with gunicorn_server(db_path, work_dir, args.gunicorn_workers) as base_url:
+                wall = run_users(lambda: HttpClient(base_url), stats, args, category_ids, product_ids)
+    finally:
+        remove_tree(work_dir)
+
+    result = stats.summary(wall)
+    result["config"] = {"mode": args.mode, "users": args.users, "iterations": args.iterations,
+                        "duration": args.duration, "weights": args.weights, "seed": args.seed}
+    baseline = load_baseline(baseline_name)
+    regressions = print_report(result, baseline, args.threshold)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    if args.save_baseline:
+        print(f"\nบันทึก baseline: {save_baseline(baseline_name, result)}")
+    if regressions:
+        print(f"\nพบการช้าลงเกิน {args.threshold:.0%}: {', '.join(regressions)}")
+        if args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""Microbenchmark ของฟังก์ชันที่ถูกเรียกบ่อยใน app.py พร้อมเทียบกับ baseline
+
+ใช้งาน:
+    python benchmarks/microbench.py                       # รันทั้งหมดและเทียบกับ baseline
+    python benchmarks/microbench.py --filter payments     # เฉพาะชื่อที่มีคำว่า payments
+    python benchmarks/microbench.py --save-baseline       # เขียน benchmarks/baselines/microbench.json
+    python benchmarks/microbench.py --threshold 0.1 --fail-on-regression
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import generate_data
+from common import (compare_metric, copy_database, load_app, load_baseline, remove_tree,
+                    save_baseline)
+
+BASELINE_NAME = "microbench"
+PAYMENT_SIZES = (1000, 10000, 100000)
+LARGE_CART_SIZE = 1000
+
+
+def measure(func, min_time=0.2, repeat=5):
+    """จับเวลาแบบ timeit: ปรับจำนวนรอบให้แต่ละชุดนานอย่างน้อย min_time แล้วคืนเวลาต่อครั้ง (µs)"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    return {
+        "per_call_us": statistics.median(samples) * 1e6,
+        "min_us": min(samples) * 1e6,
+        "loops": number,
+    }
+
+
+def build_benchmarks(app_module, sample_db, payment_dbs):
+    """คืน list ของ (ชื่อ, setup, ฟังก์ชัน) โดย setup ใช้สลับฐานข้อมูลก่อนวัดผล"""
+    flask_app = app_module.app
+
+    def use_db(path):
+        return lambda: setattr(app_module, "DB_NAME", str(path))
+
+    payload = b"00020101021129370016A000000677010111011300668912345675802TH53037645406120.006304"
+    cart = {str(i): {"id": i, "name": f"item {i}", "price": 3500 + i % 50 * 100, "image": "", "quantity": 1 + i % 3,
+                     "options": ""} for i in range(LARGE_CART_SIZE)}
+
+    def push_cart():
+        # เปิด request context ค้างไว้ให้ session ใช้ได้ จะได้วัดเฉพาะ get_cart_total
+        flask_app.test_request_context().push()
+        app_module.session["cart"] = cart
+
+    dt = datetime(2025, 10, 1, 13, 12, 53)
+    benches = [
+        ("calculate_crc16", None, lambda: app_module.calculate_crc16(payload)),
+        ("generate_promptpay_qr", None, lambda: app_module.generate_promptpay_qr("0891234567", 123450)),
+        (f"get_cart_total[{LARGE_CART_SIZE} items]", push_cart, app_module.get_cart_total),
+        ("filter.to_bangkok[str]", None, lambda: app_module.to_bangkok_filter("2025-10-01 13:12:53")),
+        ("filter.to_bangkok[datetime]", None, lambda: app_module.to_bangkok_filter(dt)),
+        ("filter.safe_datetime[str]", None, lambda: app_module.safe_datetime_filter("2025-10-01 20:16:20.334285")),
+        ("filter.safe_datetime[datetime]", None, lambda: app_module.safe_datetime_filter(dt)),
+        ("filter.format_currency", None, lambda: app_module.format_currency(123456789)),
+        ("filter.status_text", None, lambda: app_module.status_text_filter("processing")),
+    ]
+    for category_id in (None, 1):
+        for featured_only in (False, True):
+            name = f"get_products_by_category[category={category_id},featured={featured_only}]"
+            benches.append((name, use_db(sample_db),
+                            lambda c=category_id, f=featured_only: app_module.get_products_by_category(c, f)))
+    for size, path in payment_dbs.items():
+        benches.append((f"get_all_payments[{size}]", use_db(path), app_module.get_all_payments))
+    return benches
+
+
+def build_payment_dbs(work_dir, sizes):
+    dbs = {}
+    for size in sizes:
+        path = f"{work_dir}/payments-{size}.db"
+        print(f"สร้างฐานข้อมูล {size:,} payments ...", flush=True)
+        generate_data.main([path, "--orders", str(size), "--users", str(max(100, size // 20)),
+                            "--products", "100"])
+        dbs[size] = path
+    return dbs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", default="", help="รันเฉพาะ benchmark ที่ชื่อมีข้อความนี้")
+    parser.add_argument("--payment-sizes", default=",".join(map(str, PAYMENT_SIZES)))
+    parser.add_argument("--min-time", type=float, default=0.2, help="เวลาขั้นต่ำต่อชุดการวัด (วินาที)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.2, help="ยอมให้ช้าลงได้กี่เท่า (0.2 = 20%%)")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.payment_sizes.split(",") if s]
+    if args.filter:
+        sizes = [s for s in sizes if args.filter in f"get_all_payments[{s}]"]
+    work_dir = tempfile.mkdtemp(prefix="bakery-microbench-")
+    try:
+        sample_db = copy_database(work_dir)
+        app_module = load_app(sample_db, work_dir)
+        payment_dbs = build_payment_dbs(work_dir, sizes)
+        benches = [b for b in build_benchmarks(app_module, sample_db, payment_dbs) if args.filter in b[0]]
+
+        results = {}
+        for name, setup, func in benches:
+            if setup:
+                setup()
+            func()  # warm up (page cache, template/regex cache)
+            results[name] = measure(func, args.min_time, args.repeat)
+    finally:
+        remove_tree(work_dir)
+
+    baseline = (load_baseline(BASELINE_NAME) or {}).get("benchmarks", {})
+    regressions = []
+    print(f"\n{'benchmark':58} {'per call':>12} {'baseline':>12} {'change':>8}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        line = f"{name:58} {format_us(result['per_call_us']):>12}"
+        if base:
+            change, regressed = compare_metric(result["per_call_us"], base["per_call_us"], args.threshold)
+            line += f" {format_us(base['per_call_us']):>12} {change:>+8.0%}"
+            if regressed:
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(line)
+
+    if args.save_baseline:
+        merged = dict(baseline)
+        merged.update(results)
+        path = save_baseline(BASELINE_NAME, {"python": sys.version.split()[0], "benchmarks": merged})
+        print(f"\nบันทึก baseline: {path}")
+    if regressions:
+        print(f"\nช้าลงเกิน {args.threshold:.0%}: {', '.join(regressions)}")
+        if args.fail_on_regression:
+            return 1
+    return 0
+
+
+def format_us(value):
+    if value >= 1000:
+        return f"{value / 1000:.2f} ms"
+    return f"{value:.2f} µs"
+
+
+if __name__ == "__main__":
+    sys.exit(main())
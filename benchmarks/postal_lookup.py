@@ -0,0 +1,54 @@
+"""วัดเวลาค้นและหน่วยความจำของดัชนีรหัสไปรษณีย์ (postal.PostalIndex)
+
+โหลด data/thai_postal_codes.csv (หรือไฟล์ที่ระบุ) แล้วรายงาน
+  - เวลาโหลดและหน่วยความจำของดัชนี (tracemalloc)
+  - เวลาเฉลี่ยต่อครั้งของ search() ด้วยรหัส/ชื่อขึ้นต้นแบบต่าง ๆ และ normalize()
+
+ใช้งาน:
+    python benchmarks/postal_lookup.py
+    python benchmarks/postal_lookup.py --data /path/to/full_postal_codes.csv --repeat 20000
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+
+from common import REPO_ROOT
+
+import postal  # noqa: E402
+
+QUERIES = ["5", "57", "571", "57000", "10", "เชียง", "แม่", "เมือง", "กรุงเทพ", "ไม่มีชื่อนี้"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=str(REPO_ROOT / "data" / "thai_postal_codes.csv"))
+    parser.add_argument("--repeat", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    index = postal.load_index(args.data)
+    load_ms = (time.perf_counter() - started) * 1000
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{len(index):,} แถว โหลด {load_ms:.1f} ms หน่วยความจำ {size / 1024:.1f} KB\n")
+
+    print(f"{'query':14} {'results':>8} {'µs / search':>12}")
+    for query in QUERIES:
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            results = index.search(query)
+        elapsed = (time.perf_counter() - started) / args.repeat * 1e6
+        print(f"{query:14} {len(results):>8} {elapsed:>12.2f}")
+
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        index.normalize("อ.เมือง", "จ.เชียงราย", "57000")
+    elapsed = (time.perf_counter() - started) / args.repeat * 1e6
+    print(f"\nnormalize(): {elapsed:.2f} µs / ครั้ง")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
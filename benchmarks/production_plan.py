@@ -0,0 +1,91 @@
+"""เวลาของ planning.run_planning บนประวัติหลายปี: รวมใหม่ทั้งหมด เทียบกับรอบรายคืนที่รวมเฉพาะวันใหม่
+
+สร้างฐานข้อมูลสังเคราะห์ด้วย generate_data แล้วรัน
+  - rebuild:     รวม daily_product_sales ใหม่ทั้งหมด + คำนวณแผน
+  - incremental: เลื่อน "วันนี้" ไปทีละวัน --nights ครั้ง (รวมวันเดียว + คำนวณแผนจากทั้งประวัติ)
+และตรวจว่ายอดรวมของ daily_product_sales แบบ incremental ตรงกับแบบ rebuild
+ก่อนวัดเวลาตรวจกรณีร้านปิดหนึ่งวันต่อสัปดาห์: ขายวันละ 10 ชิ้น จันทร์-เสาร์ ปิดวันอาทิตย์ ต้องได้แผน 10 / 0
+
+ใช้งาน:
+    python benchmarks/production_plan.py
+    python benchmarks/production_plan.py --orders 1000000 --days 1095 --nights 7
+"""
+import argparse
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import generate_data
+from common import REPO_ROOT, remove_tree
+
+sys.path.insert(0, str(REPO_ROOT))
+import planning  # noqa: E402
+
+TOTALS_SQL = "SELECT COUNT(*), SUM(quantity), SUM(product_id * julianday(sales_date) * quantity) FROM daily_product_sales"
+
+
+def check_closed_weekday(weeks=8):
+    """ยอดคงที่ 10 ชิ้นทุกวันยกเว้นวันอาทิตย์: วันปิดต้องไม่ถูกนับเป็นยอด 0 ใน moving average"""
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE daily_product_sales (product_id INTEGER, sales_date TEXT, quantity INTEGER)")
+    today = date(2025, 6, 2)  # วันจันทร์
+    days = [today - timedelta(days=n) for n in range(1, weeks * 7 + 1)]
+    conn.executemany("INSERT INTO daily_product_sales VALUES (1, ?, 10)",
+                     [(day.isoformat(),) for day in days if day.weekday() != 6])
+    plan = planning.compute_plan(conn, today)
+    conn.close()
+    expected = [0 if (today + timedelta(days=n)).weekday() == 6 else 10 for n in range(planning.DEFAULT_HORIZON)]
+    quantities = [row[3] for row in plan]
+    print(f"ร้านปิดวันอาทิตย์: moving average {plan[0][4]}, แผน {quantities} "
+          f"({'ถูกต้อง' if quantities == expected else f'ควรเป็น {expected}'})")
+    return quantities == expected
+
+
+def timed_run(conn, today, rebuild=False):
+    started = time.perf_counter()
+    result = planning.run_planning(conn, today=today, rebuild=rebuild)
+    return (time.perf_counter() - started) * 1000, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=300000)
+    parser.add_argument("--days", type=int, default=1095, help="ช่วงประวัติการสั่งซื้อ (วัน)")
+    parser.add_argument("--nights", type=int, default=5, help="จำนวนรอบรายคืนที่วัด")
+    args = parser.parse_args(argv)
+
+    closed_ok = check_closed_weekday()
+    work_dir = tempfile.mkdtemp(prefix="bakery-planning-")
+    try:
+        db_path = f"{work_dir}/bakery.db"
+        print(f"สร้างฐานข้อมูล {args.orders:,} orders / {args.days} วัน ...", flush=True)
+        generate_data.main([db_path, "--orders", str(args.orders), "--days", str(args.days),
+                            "--users", "2000", "--products", "150"])
+        conn = sqlite3.connect(db_path)
+        last = conn.execute("SELECT date(MAX(created_at), '+7 hours') FROM orders").fetchone()[0]
+        final_day = date.fromisoformat(last) + timedelta(days=1)
+        start_day = final_day - timedelta(days=args.nights)
+
+        rebuild_ms, result = timed_run(conn, final_day, rebuild=True)
+        expected = conn.execute(TOTALS_SQL).fetchone()
+        print(f"\nrebuild: {result['products']} สินค้า, ยอดขายถึง {result['through']} ใน {rebuild_ms:.0f} ms")
+
+        timed_run(conn, start_day, rebuild=True)
+        nightly = []
+        for n in range(1, args.nights + 1):
+            elapsed, _ = timed_run(conn, start_day + timedelta(days=n))
+            nightly.append(elapsed)
+        actual = conn.execute(TOTALS_SQL).fetchone()
+        conn.close()
+    finally:
+        remove_tree(work_dir)
+
+    print(f"incremental: {args.nights} คืน เฉลี่ย {sum(nightly) / len(nightly):.0f} ms / คืน (สูงสุด {max(nightly):.0f} ms)")
+    print(f"daily_product_sales ตรงกับ rebuild: {'ใช่' if actual == expected else 'ไม่'}")
+    return 0 if actual == expected and closed_ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""เทียบหน่วยความจำและเวลาของแถว PAYMENTS_LIST_SQL แบบ dict(row) + parse เวลาเอง กับโมเดล __slots__
+
+สร้างฐานข้อมูลสังเคราะห์ด้วย generate_data แล้วโหลดทุกแถวเป็น list สามแบบ
+  - row:   sqlite3.Row (เวลายังเป็นข้อความ)
+  - dict:  dict(row) แล้ว datetime.fromisoformat ทุกคอลัมน์เวลา (แบบที่ handler เคยทำ)
+  - model: Payment.query บน connection PARSE_DECLTYPES (converter แปลงเวลาให้ตอน fetch)
+รายงานหน่วยความจำต่อ 10k แถว (tracemalloc) และเวลาโหลด
+
+ใช้งาน:
+    python benchmarks/row_models.py
+    python benchmarks/row_models.py --orders 50000
+"""
+import argparse
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import generate_data
+from common import REPO_ROOT, remove_tree
+
+sys.path.insert(0, str(REPO_ROOT))
+import models  # noqa: E402
+from app import PAYMENTS_LIST_SQL  # noqa: E402
+
+TIMESTAMP_COLUMNS = ("paid_at", "order_created")
+
+
+def load_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute(PAYMENTS_LIST_SQL).fetchall()
+    conn.close()
+    return rows
+
+
+def load_dicts(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    rows = [dict(row) for row in conn.execute(PAYMENTS_LIST_SQL)]
+    conn.close()
+    for row in rows:
+        for column in TIMESTAMP_COLUMNS:
+            if row[column]:
+                row[column] = datetime.fromisoformat(row[column])
+    return rows
+
+
+def load_models(db_path):
+    conn = sqlite3.connect(db_path, detect_types=sqlite3.PARSE_DECLTYPES)
+    rows = models.Payment.query(conn, PAYMENTS_LIST_SQL).fetchall()
+    conn.close()
+    return rows
+
+
+def measure(loader, db_path):
+    loader(db_path)  # warm up (page cache)
+    tracemalloc.start()
+    started = time.perf_counter()
+    rows = loader(db_path)
+    elapsed = time.perf_counter() - started
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"rows": len(rows), "bytes": size, "seconds": elapsed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="bakery-models-")
+    try:
+        db_path = f"{work_dir}/bakery.db"
+        print(f"สร้างฐานข้อมูล {args.orders:,} orders ...", flush=True)
+        generate_data.main([db_path, "--orders", str(args.orders), "--users", "1000", "--products", "100"])
+        results = {name: measure(loader, db_path)
+                   for name, loader in (("row", load_rows), ("dict", load_dicts), ("model", load_models))}
+    finally:
+        remove_tree(work_dir)
+
+    print(f"\n{'kind':6} {'rows':>8} {'MB / 10k rows':>14} {'ms / 10k rows':>14}")
+    for name, r in results.items():
+        per = 10000 / r["rows"]
+        print(f"{name:6} {r['rows']:>8} {r['bytes'] * per / 1024 / 1024:>14.2f} {r['seconds'] * per * 1000:>14.1f}")
+    ratio = results["dict"]["bytes"] / results["model"]["bytes"]
+    print(f"\nmodel ใช้หน่วยความจำน้อยกว่า dict {ratio:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""ความแม่นของการตรวจสลิปซ้ำบนสลิปที่ใช้ template เดียวกัน และเวลาค้นผ่าน index ราย band เมื่อจำนวนสลิปโตขึ้น
+
+1. precision/recall: วาดสลิปสังเคราะห์ --templates แบบ x --per-template ใบ (หัวสีเดียวกัน ต่างกันที่วันเวลา ชื่อ
+   เลขบัญชี ยอดเงิน เลขอ้างอิง และ QR) บันทึกทีละใบผ่าน app.record_slip_hash ในสำเนาชั่วคราวของ bakery.db
+   - false flag: สลิปต่างใบที่ถูก flag ว่าซ้ำ (ต้องเป็น 0)
+   - recall: ไฟล์เดิมที่ถูกบีบอัด JPEG / ย่อ / ปรับความสว่าง / มีแถบสถานะทับ ต้องเจอสลิปต้นฉบับ
+   - ระยะ dHash ต่ำสุดระหว่างสลิปต่างใบ เทียบกับระยะสูงสุดของไฟล์ที่ถูกแปลง (ใช้ตั้ง SLIP_HASH_MAX_DISTANCE)
+   - สัดส่วนคู่สลิปต่างใบบน template เดียวกันที่มี band ตรงกัน (ต้องนับบิตทุกคู่แบบนี้ตอนค้น)
+2. lookup: เติม slip_hashes ด้วย dHash สุ่มทีละขั้น (--sizes) แล้ววัด
+   - band: app.find_similar_slip (sha256 + band_key IN (...) แล้วนับบิตเฉพาะ candidate)
+   - scan: SELECT dhash ทุกแถวแล้วนับบิตใน Python (แบบไม่มี index)
+   ค้นทั้ง hash สุ่ม (ไม่เจอ) และ hash ที่ต่างจากแถวที่มีอยู่ 1 ถึง SLIP_HASH_MAX_DISTANCE บิต โดยกระจายบิตที่พลิก
+   ไปคนละ band (กรณีแย่สุดของ index ราย band) ทุกตัวต้องเจอ ถ้า band หาเจอน้อยกว่า scan ถือว่าไม่ผ่าน
+
+ใช้งาน:
+    python benchmarks/slip_hash.py
+    python benchmarks/slip_hash.py --templates 5 --per-template 60 --sizes 1000 10000 100000 --queries 500
+"""
+import argparse
+import io
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+from PIL import Image, ImageDraw, ImageEnhance, ImageFont
+
+from common import copy_database, load_app, remove_tree
+
+NAMES = ["Somchai Jaidee", "Napat Srisuk", "Kanya Boonmee", "Prasit Wong", "Malee Thongdee", "Anan Chai",
+         "Wipa Kaewdee", "Chaiya Rattana", "Sudarat Meesuk", "Thanawat P."]
+TEMPLATE_COLORS = [(20, 120, 60), (90, 40, 140), (0, 80, 160), (200, 60, 20), (0, 150, 200)]
+WIDTH, HEIGHT = 720, 1280
+
+
+def font(size):
+    return ImageFont.load_default(size=size)
+
+
+def render_slip(rng, template):
+    """สลิปโอนเงินสังเคราะห์: ส่วนหัว/ป้ายชื่อ/ตำแหน่งเหมือนกันทุกใบของ template ต่างกันแค่ข้อความและ QR"""
+    color = TEMPLATE_COLORS[template % len(TEMPLATE_COLORS)]
+    img = Image.new("RGB", (WIDTH, HEIGHT), (255, 255, 255))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([0, 0, WIDTH, 200], fill=color)
+    draw.ellipse([40, 50, 140, 150], fill=(255, 255, 255))
+    draw.text((170, 80), f"BANK APP {template}", font=font(48), fill=(255, 255, 255))
+    draw.text((60, 240), "Transfer successful", font=font(40), fill=(30, 30, 30))
+    draw.text((60, 300), f"{rng.randint(1, 28):02d} Oct 2025  {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}",
+              font=font(30), fill=(110, 110, 110))
+    y = 380
+    for label in ("From", "To"):
+        draw.text((60, y), label, font=font(28), fill=(120, 120, 120))
+        draw.ellipse([60, y + 40, 140, y + 120], fill=color)
+        draw.text((170, y + 45), rng.choice(NAMES), font=font(34), fill=(20, 20, 20))
+        draw.text((170, y + 90), f"xxx-x-x{rng.randint(1000, 9999)}-x", font=font(28), fill=(100, 100, 100))
+        y += 200
+    draw.line([60, y, WIDTH - 60, y], fill=(220, 220, 220), width=2)
+    rows = [("Amount", f"{rng.randint(35, 2500):,}.{rng.choice([0, 0, 25, 50]):02d} THB", 44),
+            ("Fee", "0.00 THB", 30),
+            ("Ref", "".join(rng.choice("ABCDEF0123456789") for _ in range(18)), 28)]
+    for n, (label, value, size) in enumerate(rows):
+        draw.text((60, y + 30 + n * 80), label, font=font(30), fill=(120, 120, 120))
+        draw.text((WIDTH - 60, y + 30 + n * 80), value, font=font(size), fill=(20, 20, 20), anchor="ra")
+    top = y + 270
+    for i in range(20):
+        for j in range(20):
+            if rng.random() < 0.5:
+                draw.rectangle([WIDTH - 260 + i * 10, top + j * 10, WIDTH - 251 + i * 10, top + j * 10 + 9], fill=(0, 0, 0))
+    return img
+
+
+def jpeg(img, quality):
+    buffer = io.BytesIO()
+    img.convert("RGB").save(buffer, "JPEG", quality=quality)
+    buffer.seek(0)
+    return Image.open(buffer)
+
+
+def status_bar(img, rng):
+    img = img.copy()
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([0, 0, WIDTH, 40], fill=(0, 0, 0))
+    draw.text((20, 5), f"10:{rng.randint(10, 59)}", font=font(26), fill=(255, 255, 255))
+    return jpeg(img, 85)
+
+
+# การแปลงที่ไฟล์เดิมมักเจอเมื่อถูกส่งต่อทางแชต (ไม่รวมการครอปหรือแคปหน้าจอซ้อน ซึ่ง dHash ไม่ทนต่อการเลื่อนตำแหน่ง)
+VARIANTS = {
+    "jpeg q60": lambda img, rng: jpeg(img, 60),
+    "resize 50%": lambda img, rng: jpeg(img.resize((WIDTH // 2, HEIGHT // 2), Image.LANCZOS), 80),
+    "brightness +10%": lambda img, rng: jpeg(ImageEnhance.Brightness(img).enhance(1.1), 85),
+    "status bar": status_bar,
+}
+
+
+def measure_quality(app_module, conn, work_dir, rng, templates, per_template):
+    folder = os.path.join(work_dir, "synthetic")
+    os.makedirs(folder)
+    slips, false_flags, hash_ms = [], 0, []
+    for template in range(templates):
+        for n in range(per_template):
+            path = os.path.join(folder, f"slip_t{template}_{n}.png")
+            render_slip(rng, template).save(path)
+            started = time.perf_counter()
+            fingerprint = app_module.slip_fingerprint(path)
+            hash_ms.append((time.perf_counter() - started) * 1000)
+            order_id = -(len(slips) + 1)
+            if app_module.record_slip_hash(conn, order_id, os.path.basename(path), fingerprint):
+                false_flags += 1
+            slips.append((path, order_id, template, fingerprint))
+    conn.commit()
+
+    pairs = [(a, b) for i, a in enumerate(slips) for b in slips[i + 1:] if a[2] == b[2]]
+    distinct = min(app_module.slip_hash_distance(a[3][1], b[3][1]) for a, b in pairs)
+    bands = {s[0]: set(app_module.slip_hash_bands(s[3][1])) for s in slips}
+    candidates = sum(1 for a, b in pairs if bands[a[0]] & bands[b[0]]) / len(pairs)
+    recall = {}
+    for name, transform in VARIANTS.items():
+        found, worst = 0, 0
+        for path, order_id, _, fingerprint in slips[::3]:
+            copy_path = os.path.join(folder, "variant.jpg")
+            with Image.open(path) as img:
+                transform(img, rng).save(copy_path)
+            copied = app_module.slip_fingerprint(copy_path)
+            worst = max(worst, app_module.slip_hash_distance(fingerprint[1], copied[1]))
+            if (app_module.find_similar_slip(conn, copied, 0) or (None,))[0] == order_id:
+                found += 1
+        recall[name] = (found, len(slips[::3]), worst)
+    exact = sum(app_module.find_similar_slip(conn, s[3], 0) == (s[1], 0) for s in slips)
+    return {"slips": len(slips), "false_flags": false_flags, "distinct_min": distinct, "recall": recall,
+            "exact": exact, "hash_ms": sum(hash_ms) / len(hash_ms), "candidates": candidates}
+
+
+def insert_random(app_module, conn, rng, start, count, nbytes):
+    stored = []
+    for n in range(start, start + count):
+        dhash = rng.randbytes(nbytes)
+        slip_id = conn.execute("""
+            INSERT INTO slip_hashes (filename, order_id, content_hash, dhash) VALUES (?, ?, ?, ?)
+        """, (f"bench_{n}.png", n + 1, f"{n:064x}", dhash)).lastrowid
+        conn.executemany("INSERT INTO slip_hash_bands (band_key, slip_id) VALUES (?, ?)",
+                         [(key, slip_id) for key in app_module.slip_hash_bands(dhash)])
+        stored.append(dhash)
+    conn.commit()
+    return stored
+
+
+def flip_spread(rng, dhash, count, bands):
+    """พลิก count บิต บิตละ band (บิตที่ k นับจากซ้ายอยู่ band k % bands) ให้เหลือ band ที่ตรงกันน้อยที่สุด"""
+    nbits = len(dhash) * 8
+    value = int.from_bytes(dhash, "big")
+    for band in rng.sample(range(bands), count):
+        k = rng.randrange(band, nbits, bands)
+        value ^= 1 << (nbits - 1 - k)
+    return value.to_bytes(len(dhash), "big")
+
+
+def scan(app_module, conn, dhash):
+    best = None
+    for (other,) in conn.execute("SELECT dhash FROM slip_hashes"):
+        distance = app_module.slip_hash_distance(dhash, other)
+        if distance <= app_module.SLIP_HASH_MAX_DISTANCE and (best is None or distance < best):
+            best = distance
+    return best
+
+
+def timed(fn, queries):
+    found = 0
+    start = time.perf_counter()
+    for value in queries:
+        if fn(value) is not None:
+            found += 1
+    return (time.perf_counter() - start) / len(queries) * 1000, found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--templates", type=int, default=3)
+    parser.add_argument("--per-template", type=int, default=40)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=2024)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    work_dir = tempfile.mkdtemp(prefix="bakery-sliphash-")
+    results = []
+    try:
+        db_path = copy_database(work_dir)
+        app_module = load_app(db_path, work_dir)
+        conn = sqlite3.connect(db_path)
+        print("วาดและ hash สลิปสังเคราะห์ ...", flush=True)
+        quality = measure_quality(app_module, conn, work_dir, rng, args.templates, args.per_template)
+
+        conn.execute("DELETE FROM slip_hash_bands")
+        conn.execute("DELETE FROM slip_hashes")
+        nbytes = app_module.SLIP_HASH_SIZE * app_module.SLIP_HASH_SIZE // 8
+        stored = []
+        for size in sorted(args.sizes):
+            stored += insert_random(app_module, conn, rng, len(stored), size - len(stored), nbytes)
+            near = [(None, flip_spread(rng, dhash, rng.randint(1, app_module.SLIP_HASH_MAX_DISTANCE),
+                                       app_module.SLIP_HASH_BANDS))
+                    for dhash in rng.sample(stored, args.queries // 2)]
+            queries = near + [(None, rng.randbytes(nbytes)) for _ in range(args.queries - len(near))]
+            band_ms, band_found = timed(lambda q: app_module.find_similar_slip(conn, q, 0), queries)
+            scan_ms, scan_found = timed(lambda q: scan(app_module, conn, q[1]), queries)
+            results.append((size, band_ms, scan_ms, band_found, scan_found, len(near)))
+            print(f"  {size:,} slips done", flush=True)
+        conn.close()
+    finally:
+        remove_tree(work_dir)
+
+    print(f"\nสลิปสังเคราะห์ {quality['slips']} ใบ ({args.templates} template) hash เฉลี่ย {quality['hash_ms']:.1f} ms/ใบ")
+    print(f"  false flag ระหว่างสลิปต่างใบ: {quality['false_flags']}")
+    print(f"  ระยะต่ำสุดระหว่างสลิปต่างใบบน template เดียวกัน: {quality['distinct_min']} บิต "
+          f"(threshold {app_module.SLIP_HASH_MAX_DISTANCE})")
+    print(f"  ไฟล์เดิมตรงทุก byte เจอด้วย sha256: {quality['exact']}/{quality['slips']}")
+    print(f"  คู่สลิปต่างใบบน template เดียวกันที่เป็น candidate ({app_module.SLIP_HASH_BANDS} band): "
+          f"{quality['candidates']:.1%}")
+    print(f"\n{'variant':18} {'recall':>9} {'max bits':>9}")
+    for name, (found, total, worst) in quality["recall"].items():
+        print(f"{name:18} {found:>4}/{total:<4} {worst:>9}")
+
+    print(f"\n{'slips':>10} {'band ms':>9} {'scan ms':>9} {'found band/scan':>16}")
+    for size, band_ms, scan_ms, band_found, scan_found, _ in results:
+        print(f"{size:>10,} {band_ms:>9.3f} {scan_ms:>9.3f} {band_found:>7}/{scan_found:<8}")
+    recalled = all(found == total for found, total, _ in quality["recall"].values())
+    indexed = all(band_found == scan_found == near for *_, band_found, scan_found, near in results)
+    if not indexed:
+        print("❌ index ราย band หา hash ที่อยู่ใน threshold ไม่ครบ")
+    return 0 if quality["false_flags"] == 0 and recalled and indexed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""วัดหน่วยความจำและเวลาถึง byte แรกของหน้ารายการแอดมินที่ render แบบ stream
+
+สร้างฐานข้อมูลสังเคราะห์หลายขนาดแล้วดึง /admin/orders, /admin/order_history และ
+/admin/payments ทีละ chunk ผ่าน test client โดยวัด peak ของ tracemalloc ระหว่างส่ง
+ถ้า stream ถูกต้อง peak ต้องแทบไม่โตตามจำนวน order จบด้วย exit code 1 ถ้า peak ของขนาดใหญ่สุด
+โตเกิน --max-growth เท่าของขนาดเล็กสุด
+
+ใช้งาน:
+    python benchmarks/stream_memory.py                        # 1,000 / 10,000 / 100,000 orders
+    python benchmarks/stream_memory.py --sizes 1000,100000 --max-growth 2
+"""
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import generate_data
+from common import load_app, remove_tree
+
+PAGES = ("/admin/orders", "/admin/order_history", "/admin/payments")
+SIZES = (1000, 10000, 100000)
+
+
+def measure_page(client, path):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    resp = client.get(path, buffered=False)
+    first_chunk_ms = None
+    total_bytes = 0
+    for chunk in resp.response:
+        if first_chunk_ms is None:
+            first_chunk_ms = (time.perf_counter() - start) * 1000
+        total_bytes += len(chunk)
+    resp.close()
+    total_ms = (time.perf_counter() - start) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert resp.status_code == 200, (path, resp.status_code)
+    return {"first_chunk_ms": first_chunk_ms or total_ms, "total_ms": total_ms,
+            "bytes": total_bytes, "peak_kb": peak / 1024}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)))
+    parser.add_argument("--max-growth", type=float, default=3,
+                        help="ล้มเหลวถ้า peak ของขนาดใหญ่สุดโตเกินกี่เท่าของขนาดเล็กสุด (ค่าเริ่มต้น 3)")
+    args = parser.parse_args(argv)
+
+    sizes = sorted(int(s) for s in args.sizes.split(",") if s)
+    if len(sizes) < 2:
+        parser.error("--sizes ต้องมีอย่างน้อยสองขนาดจึงเทียบการโตของหน่วยความจำได้")
+    work_dir = tempfile.mkdtemp(prefix="bakery-stream-")
+    results = {}
+    try:
+        for size in sizes:
+            path = f"{work_dir}/orders-{size}.db"
+            print(f"สร้างฐานข้อมูล {size:,} orders ...", flush=True)
+            generate_data.main([path, "--orders", str(size), "--users", str(max(100, size // 20)),
+                                "--products", "100"])
+            app_module = load_app(path, work_dir)
+            client = app_module.app.test_client()
+            with client.session_transaction() as sess:
+                sess["user_id"] = 1
+                sess["role"] = "admin"
+            for page in PAGES:
+                measure_page(client, page)  # warm up template cache
+                results[(page, size)] = measure_page(client, page)
+    finally:
+        remove_tree(work_dir)
+
+    print(f"\n{'page':22} {'orders':>9} {'first chunk':>12} {'total':>10} {'size':>10} {'peak mem':>10}")
+    failed = False
+    for page in PAGES:
+        for size in sizes:
+            r = results[(page, size)]
+            print(f"{page:22} {size:>9,} {r['first_chunk_ms']:>9.1f} ms {r['total_ms']:>7.0f} ms "
+                  f"{r['bytes'] / 1024 / 1024:>7.1f} MB {r['peak_kb']:>7.0f} KB")
+        growth = results[(page, sizes[-1])]["peak_kb"] / results[(page, sizes[0])]["peak_kb"]
+        line = f"{'':22} peak {sizes[-1]:,} / {sizes[0]:,} orders = {growth:.2f}x"
+        if growth > args.max_growth:
+            line += "  หน่วยความจำโตตามจำนวนแถว"
+            failed = True
+        print(line)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""เปรียบเทียบ throughput ของ checkout แบบ commit เอง (ค่าเริ่มต้น) กับ write queue + group commit
+
+หลาย thread เรียก app.run_write(place_order, ...) พร้อมกันบนสำเนาชั่วคราวของ bakery.db
+  - direct: ทุก checkout เปิด connection แล้ว commit เอง (แย่ง write lock กันและ fsync ทุกครั้ง)
+  - queue:  WRITE_QUEUE=1 ส่งเข้า writer thread เดียวที่ commit หลาย checkout ต่อ transaction
+รายงาน checkout/วินาที, latency p50/p95/max, จำนวนที่ล้มเหลว (database is locked) และขนาด batch เฉลี่ย
+
+ใช้งาน:
+    python benchmarks/write_queue.py
+    python benchmarks/write_queue.py --threads 32 --orders 200 --max-batch 128
+"""
+import argparse
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from common import copy_database, load_app, percentile, remove_tree
+
+
+def worker(app_module, items, count, latencies, failures, barrier):
+    barrier.wait()
+    for _ in range(count):
+        start = time.perf_counter()
+        try:
+            app_module.run_write(app_module.place_order, 1, items, 10000, "benchmark", "0800000000",
+                                 "รับที่ร้าน Sweet Dreams Bakery", "", "pickup", "cod")
+            latencies.append((time.perf_counter() - start) * 1000)
+        except Exception as e:
+            failures.append(str(e))
+
+
+def run_mode(app_module, items, threads, per_thread):
+    latencies, failures = [], []
+    barrier = threading.Barrier(threads + 1)
+    pool = [threading.Thread(target=worker, args=(app_module, items, per_thread, latencies, failures, barrier))
+            for _ in range(threads)]
+    for t in pool:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {"seconds": elapsed, "ok": len(latencies), "failed": len(failures),
+            "per_second": len(latencies) / elapsed, "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95), "max": latencies[-1] if latencies else 0.0,
+            "errors": sorted(set(failures))[:3]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--orders", type=int, default=100, help="จำนวน checkout ต่อ thread")
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-delay-ms", type=float, default=2)
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="bakery-writeq-")
+    results = {}
+    try:
+        db_path = copy_database(work_dir)
+        app_module = load_app(db_path, work_dir)
+        conn = sqlite3.connect(db_path)
+        conn.execute("UPDATE products SET stock_quantity = 10000000")
+        conn.commit()
+        rows = conn.execute("SELECT id, price FROM products WHERE is_available = 1 LIMIT 3").fetchall()
+        conn.close()
+        items = [{"id": pid, "price": price, "quantity": 1} for pid, price in rows]
+
+        app_module.app.config["WRITE_QUEUE_MAX_BATCH"] = args.max_batch
+        app_module.app.config["WRITE_QUEUE_MAX_DELAY_MS"] = args.max_delay_ms
+        for mode in ("direct", "queue"):
+            app_module.app.config["WRITE_QUEUE"] = mode == "queue"
+            print(f"{mode}: {args.threads} threads x {args.orders} checkouts ...", flush=True)
+            results[mode] = run_mode(app_module, items, args.threads, args.orders)
+        coordinator = app_module.get_write_coordinator()
+        avg_batch = coordinator.units / coordinator.batches if coordinator.batches else 0
+        coordinator.shutdown()
+    finally:
+        remove_tree(work_dir)
+
+    print(f"\n{'mode':8} {'checkouts/s':>12} {'ok':>6} {'failed':>7} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    for mode, r in results.items():
+        print(f"{mode:8} {r['per_second']:>12.0f} {r['ok']:>6} {r['failed']:>7} {r['p50']:>8.1f} "
+              f"{r['p95']:>8.1f} {r['max']:>8.1f}")
+        for error in r["errors"]:
+            print(f"{'':8} ! {error}")
+    print(f"\nqueue: เฉลี่ย {avg_batch:.1f} checkout ต่อ transaction")
+    speedup = results["queue"]["per_second"] / results["direct"]["per_second"]
+    print(f"queue / direct throughput = {speedup:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
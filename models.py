@@ -0,0 +1,153 @@
+"""โมเดลแถวแบบ __slots__ สำหรับผลลัพธ์ sqlite3 (แทน dict(row)) และ converter ของคอลัมน์เวลา
+
+connection ที่เปิดด้วย detect_types=sqlite3.PARSE_DECLTYPES (get_db_connection(parse_types=True)
+และ connection อ่านอย่างเดียว) แปลงคอลัมน์ที่ประกาศเป็น TIMESTAMP/DATETIME เป็น datetime (UTC แบบ naive)
+ครั้งเดียวตอน fetch จากนั้น row factory ของโมเดลสร้าง object จากแถวโดยตรง ไม่ผ่าน dict
+
+    order = Order.query(conn, "SELECT * FROM orders WHERE id = ?", (order_id,)).fetchone()
+    order.created_at        # datetime
+    order['status']         # อ่านแบบ subscript ได้เหมือน sqlite3.Row (template เดิมใช้ต่อได้)
+
+คอลัมน์ที่ไม่มีใน __slots__ ถูกข้าม และ slot ที่ query ไม่ได้เลือกมาอ่านได้เป็น None
+"""
+import sqlite3
+from datetime import datetime
+
+
+def parse_timestamp(value):
+    """converter ของ TIMESTAMP/DATETIME: 'YYYY-MM-DD HH:MM:SS[.fff]' -> datetime ค่าที่อ่านไม่ได้คืนเป็นข้อความเดิม"""
+    text = value.decode()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return text
+
+
+for _decltype in ('TIMESTAMP', 'DATETIME'):
+    sqlite3.register_converter(_decltype, parse_timestamp)
+
+
+def format_address(address, city=None, province=None, postal_code=None):
+    """ที่อยู่บรรทัดเดียว: ที่อยู่, อำเภอ/เขต, จังหวัด, รหัสไปรษณีย์ (ข้ามส่วนที่ว่าง)"""
+    return ', '.join(part for part in (address, city, province, postal_code) if part)
+
+
+class Model:
+    __slots__ = ()
+    _fields = frozenset()
+    _columns = (None, ())
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        fields = set()
+        for klass in cls.__mro__:
+            fields.update(klass.__dict__.get('__slots__', ()))
+        cls._fields = frozenset(fields)
+        cls._columns = (None, ())
+
+    def __init__(self, **values):
+        for name, value in values.items():
+            setattr(self, name, value)
+
+    def __getattr__(self, name):
+        # เรียกเฉพาะเมื่อหา attribute ปกติไม่เจอ: slot ที่ยังไม่ถูกตั้งค่าคืน None
+        if name in self._fields:
+            return None
+        raise AttributeError(f"{type(self).__name__} has no field {name!r}")
+
+    def __getitem__(self, key):
+        if key not in self._fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self._fields
+
+    def _is_set(self, name):
+        try:
+            object.__getattribute__(self, name)
+        except AttributeError:
+            return False
+        return True
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self._fields and self._is_set(key) else default
+
+    def keys(self):
+        return [name for name in self._fields if self._is_set(name)]
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.keys()}
+
+    def __repr__(self):
+        return f"<{type(self).__name__} id={getattr(self, 'id', None)!r}>"
+
+    @classmethod
+    def from_row(cls, cursor, row):
+        """row factory: จับคู่ชื่อคอลัมน์กับ slot ครั้งเดียวต่อ cursor.description แล้วตั้งค่าตรงลง slot"""
+        description, names = cls._columns
+        if description is not cursor.description:
+            description = cursor.description
+            names = tuple(c[0] if c[0] in cls._fields else None for c in description)
+            cls._columns = (description, names)
+        obj = cls.__new__(cls)
+        for name, value in zip(names, row):
+            if name is not None:
+                setattr(obj, name, value)
+        return obj
+
+    @classmethod
+    def query(cls, conn, sql, parameters=()):
+        """execute บน cursor ใหม่ที่คืนแถวเป็นโมเดลนี้ (ใช้ fetchone/fetchall หรือวนอ่านแบบ stream)"""
+        cursor = conn.cursor()
+        cursor.row_factory = cls.from_row
+        return cursor.execute(sql, parameters)
+
+
+class Product(Model):
+    __slots__ = ('id', 'name', 'name_en', 'description', 'price', 'image', 'category_id', 'is_available',
+                 'is_featured', 'stock_quantity', 'created_at', 'updated_at', 'is_orderable', 'category_name')
+
+
+class Order(Model):
+    __slots__ = ('id', 'user_id', 'total_amount', 'status', 'customer_name', 'customer_phone',
+                 'customer_address', 'cancelled_at', 'payment_method', 'notes', 'delivery_method',
+                 'created_at', 'archived',
+                 # snapshot ที่อยู่จัดส่ง ณ ตอนสั่ง (address_id ชี้สมุดที่อยู่ซึ่งอาจถูกแก้/ลบภายหลัง)
+                 'address_id', 'ship_recipient_name', 'ship_phone', 'ship_address', 'ship_city',
+                 'ship_province', 'ship_postal_code',
+                 # คอลัมน์จาก JOIN / subquery ของหน้าแอดมิน
+                 'customer_email', 'username', 'item_count', 'payment_status')
+
+    @property
+    def shipping_address(self):
+        """ที่อยู่จัดส่งจาก snapshot ของคำสั่งซื้อ (รับที่ร้าน/ข้อมูลที่ไม่มี snapshot ใช้ customer_address)"""
+        if self.ship_address:
+            return format_address(self.ship_address, self.ship_city, self.ship_province, self.ship_postal_code)
+        return self.customer_address
+
+
+class OrderItem(Model):
+    __slots__ = ('id', 'order_id', 'product_id', 'quantity', 'unit_price', 'total_price', 'options',
+                 'archived', 'product_name', 'product_price', 'product_image')
+
+
+class Payment(Model):
+    __slots__ = ('id', 'order_id', 'payment_method', 'amount', 'status', 'slip_image', 'paid_at', 'archived',
+                 # คอลัมน์ของ PAYMENTS_LIST_SQL (payments JOIN orders)
+                 'payment_id', 'payment_status', 'customer_name', 'customer_phone', 'customer_address',
+                 'delivery_method', 'total_amount', 'order_status', 'order_created',
+                 # flag สลิปคล้ายกับสลิปของคำสั่งซื้ออื่น (ดู record_slip_hash)
+                 'slip_duplicate_order_id', 'slip_duplicate_distance')
+
+
+class Address(Model):
+    __slots__ = ('id', 'user_id', 'recipient_name', 'phone', 'address', 'city', 'province', 'postal_code',
+                 'created_at')
+
+    @property
+    def full_address(self):
+        return format_address(self.address, self.city, self.province, self.postal_code)
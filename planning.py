@@ -0,0 +1,162 @@
+"""แผนการอบรายวัน: รวมยอดขายรายสินค้าตามวันทำการ (เวลากรุงเทพฯ) แล้วพยากรณ์ด้วยค่าเฉลี่ยเคลื่อนที่ x ฤดูกาลรายวันในสัปดาห์
+
+ใช้งาน:
+    flask --app app plan-production                   # รวมเฉพาะวันใหม่ แล้วคำนวณแผน 7 วันข้างหน้า (ตั้ง cron รายคืน)
+    flask --app app plan-production --horizon 3 --window 28
+    flask --app app plan-production --rebuild         # รวมยอดขายใหม่ทั้งหมด เช่นหลังแก้ข้อมูลย้อนหลัง
+
+ขั้นตอน
+1. aggregate_new_days: รวม order_items ของ order ที่ไม่ถูกยกเลิกเป็น daily_product_sales (สินค้า, วัน, จำนวน)
+   เฉพาะวันที่ปิดแล้ว (ก่อนวันนี้) และยังไม่เคยรวม งานรายคืนจึงอ่านแค่ order ของวันใหม่ผ่าน index ของ created_at
+   ฐานหลักและ archive รวมแยกกันแล้วบวกเข้าแถวเดียวกัน (GROUP BY บน view all_orders ทำให้ SQLite
+   materialize ทั้ง view และสแกน order_items ทุกแถว)
+2. compute_plan: โหลด daily_product_sales ทั้งหมดเป็นเมทริกซ์ สินค้า x วัน ด้วย NumPy (นับเฉพาะวันตั้งแต่สินค้าขายครั้งแรก)
+   - seasonality[p, w] = ค่าเฉลี่ยของวัน w ในสัปดาห์ / ค่าเฉลี่ยทุกวัน ของสินค้า p ตลอดประวัติ
+   - moving average ของยอดที่ถอดฤดูกาลแล้ว ย้อนหลัง `window` วัน (ข้ามวันที่ seasonality เป็น 0 เช่นวันร้านปิด)
+   - forecast = moving average x seasonality ของวันเป้าหมาย, quantity = forecast ปัดขึ้น
+3. เขียนแผนของวันนี้เป็นต้นไปลง production_plan แทนของเดิม และบันทึก planning_runs
+"""
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+BANGKOK = ZoneInfo('Asia/Bangkok')
+UTC = ZoneInfo('UTC')
+# ประเทศไทยไม่มี DST วันทำการของ created_at (UTC) จึงเป็น date(created_at, '+7 hours') เสมอ
+BANGKOK_OFFSET_SQL = '+7 hours'
+# julianday('0001-01-01') - 1 ทำให้ได้ ordinal แบบเดียวกับ date.toordinal()
+JULIAN_DAY_OF_ORDINAL_ZERO = 1721424.5
+DEFAULT_HORIZON = 7
+DEFAULT_WINDOW = 28
+
+
+def bangkok_today(now=None):
+    return (now or datetime.now(UTC)).astimezone(BANGKOK).date()
+
+
+def day_start_utc(day):
+    """00:00 ของวันตามเวลากรุงเทพฯ เป็นข้อความ UTC รูปแบบเดียวกับ CURRENT_TIMESTAMP"""
+    start = datetime(day.year, day.month, day.day, tzinfo=BANGKOK).astimezone(UTC)
+    return start.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def aggregated_through(conn):
+    value = conn.execute("SELECT MAX(through_date) FROM planning_runs").fetchone()[0]
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
+def aggregate_new_days(conn, today, schemas=('main',)):
+    """รวมยอดขายของวันที่ปิดแล้วแต่ยังไม่ถูกรวม คืน (วันแรก, วันสุดท้าย) ที่รวม หรือ None ถ้าไม่มีวันใหม่"""
+    last = aggregated_through(conn)
+    if last is None:
+        firsts = [conn.execute(f"SELECT date(MIN(created_at), '{BANGKOK_OFFSET_SQL}') FROM {schema}.orders").fetchone()[0]
+                  for schema in schemas]
+        firsts = [first for first in firsts if first]
+        if not firsts:
+            return None
+        start = datetime.strptime(min(firsts), '%Y-%m-%d').date()
+    else:
+        start = last + timedelta(days=1)
+    end = today - timedelta(days=1)
+    if start > end:
+        return None
+    bounds = (day_start_utc(start), day_start_utc(end + timedelta(days=1)))
+    for schema in schemas:
+        conn.execute(f"""
+            INSERT INTO main.daily_product_sales (product_id, sales_date, quantity)
+            SELECT oi.product_id, date(o.created_at, '{BANGKOK_OFFSET_SQL}') AS sales_date, SUM(oi.quantity)
+            FROM {schema}.orders o
+            JOIN {schema}.order_items oi ON oi.order_id = o.id
+            WHERE o.created_at >= ? AND o.created_at < ? AND o.status != 'cancelled'
+            GROUP BY oi.product_id, sales_date
+            ON CONFLICT (product_id, sales_date) DO UPDATE SET quantity = quantity + excluded.quantity
+        """, bounds)
+    return start, end
+
+
+def compute_plan(conn, today, horizon=DEFAULT_HORIZON, window=DEFAULT_WINDOW):
+    """พยากรณ์ยอดของ `horizon` วันตั้งแต่ today จาก daily_product_sales คืน list ของแถว production_plan"""
+    cursor = conn.cursor()
+    cursor.row_factory = None  # tuple ล้วนแปลงเป็น array ได้เร็วกว่า sqlite3.Row มาก
+    rows = cursor.execute(f"""
+        SELECT product_id, CAST(julianday(sales_date) - {JULIAN_DAY_OF_ORDINAL_ZERO} AS INTEGER), quantity
+        FROM daily_product_sales
+        WHERE sales_date < ?
+    """, (today.isoformat(),)).fetchall()
+    if not rows:
+        return []
+    data = np.array(rows, dtype=np.int64)
+    products, product_index = np.unique(data[:, 0], return_inverse=True)
+    first_day = int(data[:, 1].min())
+    last_day = today.toordinal() - 1
+    day_index = data[:, 1] - first_day
+    n_days = last_day - first_day + 1
+
+    sales = np.zeros((len(products), n_days))
+    sales[product_index, day_index] = data[:, 2]
+    # วันก่อนขายครั้งแรกของสินค้าไม่นับเป็นยอด 0
+    launched = np.full(len(products), n_days)
+    np.minimum.at(launched, product_index, day_index)
+    active = np.arange(n_days) >= launched[:, None]
+
+    weekdays = (np.arange(first_day, last_day + 1) - 1) % 7  # ordinal 1 = วันจันทร์
+    one_hot = (weekdays[:, None] == np.arange(7)).astype(float)
+    weekday_totals = sales @ one_hot
+    weekday_days = active.astype(float) @ one_hot
+    weekday_mean = np.divide(weekday_totals, weekday_days, out=np.zeros_like(weekday_totals), where=weekday_days > 0)
+    overall_mean = sales.sum(axis=1) / np.maximum(active.sum(axis=1), 1)
+    seasonality = np.divide(weekday_mean, overall_mean[:, None], out=np.ones_like(weekday_mean),
+                            where=(overall_mean[:, None] > 0) & (weekday_days > 0))
+
+    daily_factor = seasonality[:, weekdays]
+    deseasonalized = np.divide(sales, daily_factor, out=np.zeros_like(sales), where=daily_factor > 0)
+    # วันที่ seasonality เป็น 0 (ร้านปิด หรือสินค้าไม่เคยขายวันนั้น) ถอดฤดูกาลไม่ได้ ไม่นับเข้าค่าเฉลี่ย
+    recent = active[:, -window:] & (daily_factor[:, -window:] > 0)
+    moving_average = (deseasonalized[:, -window:] * recent).sum(axis=1) / np.maximum(recent.sum(axis=1), 1)
+
+    targets = [today + timedelta(days=n) for n in range(horizon)]
+    factors = seasonality[:, [day.weekday() for day in targets]]
+    forecast = moving_average[:, None] * factors
+    quantity = np.ceil(forecast - 1e-9).astype(np.int64)
+
+    plan = []
+    for p, product_id in enumerate(products.tolist()):
+        for t, day in enumerate(targets):
+            plan.append((product_id, day.isoformat(), round(float(forecast[p, t]), 2), int(quantity[p, t]),
+                         round(float(moving_average[p]), 2), round(float(factors[p, t]), 3)))
+    return plan
+
+
+def run_planning(conn, today=None, horizon=DEFAULT_HORIZON, window=DEFAULT_WINDOW, rebuild=False,
+                 schemas=('main',)):
+    """รวมวันใหม่ + คำนวณแผน + เขียน production_plan ใน transaction เดียว คืนสรุปของรอบนี้"""
+    started = time.perf_counter()
+    today = today or bangkok_today()
+    if rebuild:
+        conn.execute("DELETE FROM daily_product_sales")
+        conn.execute("DELETE FROM planning_runs")
+    aggregated = aggregate_new_days(conn, today, schemas)
+    available = {row[0] for row in conn.execute("SELECT id FROM products WHERE is_available = 1")}
+    plan = [row for row in compute_plan(conn, today, horizon, window) if row[0] in available]
+    conn.execute("DELETE FROM production_plan WHERE plan_date >= ?", (today.isoformat(),))
+    conn.executemany("""
+        INSERT INTO production_plan (product_id, plan_date, forecast, quantity, moving_average, seasonality)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, plan)
+    through = aggregated[1] if aggregated else aggregated_through(conn)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    conn.execute("""
+        INSERT INTO planning_runs (through_date, aggregated_from, products, horizon, window_days, elapsed_ms)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (through.isoformat() if through else None, aggregated[0].isoformat() if aggregated else None,
+          len({row[0] for row in plan}), horizon, window, elapsed_ms))
+    conn.commit()
+    return {
+        'aggregated': aggregated,
+        'through': through,
+        'products': len({row[0] for row in plan}),
+        'rows': len(plan),
+        'elapsed_ms': elapsed_ms,
+    }
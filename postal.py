@@ -0,0 +1,150 @@
+"""ดัชนีรหัสไปรษณีย์ไทยในหน่วยความจำ สำหรับ typeahead ของฟอร์มที่อยู่และการตรวจ/ปรับรูปแบบก่อนบันทึก
+
+ข้อมูลมาจากไฟล์ CSV ที่มากับโปรเจกต์ (data/thai_postal_codes.csv: postal_code,district,province,complete)
+แต่ละแถวคือรหัสไปรษณีย์หนึ่งรหัสของอำเภอ/เขตหนึ่ง โหลดครั้งเดียวตอนเริ่มแอปเป็น tuple เรียงลำดับ
+complete = 1 เมื่อไฟล์มีทุกอำเภอ/เขตของจังหวัดนั้น (0 = มีบางอำเภอ ใช้ได้แค่ typeahead และตรวจรหัสกับจังหวัด)
+ไฟล์ที่ไม่มีคอลัมน์ complete ถือว่าครบทุกจังหวัด
+ค้นแบบขึ้นต้นด้วย (prefix) ด้วย bisect จึงไม่ต้องวนทั้งตาราง และชื่อซ้ำ (จังหวัด/อำเภอ) ใช้ string ตัวเดียวกัน
+
+    index = load_index('data/thai_postal_codes.csv')
+    index.search('571')          # [{'postal_code': '57100', 'district': 'เมืองเชียงราย', ...}, ...]
+    index.search('แม่')          # ค้นจากชื่ออำเภอ/เขตหรือจังหวัด
+    index.normalize('อ.เมือง', 'จ.เชียงราย', '57000')   # ('เมืองเชียงราย', 'เชียงราย', '57000')
+"""
+import bisect
+import csv
+import re
+
+DEFAULT_LIMIT = 10
+# ตัวอักษรที่มากกว่าทุกตัวในชื่อ/รหัส ใช้เป็นขอบบนของช่วง prefix
+_MAX_CHAR = '\U0010ffff'
+_POSTAL_CODE_RE = re.compile(r'^\d{5}$')
+_DISTRICT_PREFIX_RE = re.compile(r'^(อำเภอ|อ\.|เขต|ข\.)\s*')
+_PROVINCE_PREFIX_RE = re.compile(r'^(จังหวัด|จ\.)\s*')
+PROVINCE_ALIASES = {
+    'กทม': 'กรุงเทพมหานคร',
+    'กทม.': 'กรุงเทพมหานคร',
+    'กรุงเทพ': 'กรุงเทพมหานคร',
+    'กรุงเทพฯ': 'กรุงเทพมหานคร',
+}
+
+
+class AddressError(ValueError):
+    """ที่อยู่ไม่ผ่านการตรวจ ข้อความเป็นภาษาไทยพร้อมแสดงผู้ใช้"""
+
+
+def clean_province(name):
+    name = _PROVINCE_PREFIX_RE.sub('', (name or '').strip())
+    return PROVINCE_ALIASES.get(name, name)
+
+
+def clean_district(name, province=None):
+    """ตัดคำนำหน้า อ./อำเภอ/เขต และขยาย 'เมือง' เป็น 'เมือง<จังหวัด>'"""
+    name = _DISTRICT_PREFIX_RE.sub('', (name or '').strip())
+    if name == 'เมือง' and province:
+        return f'เมือง{province}'
+    return name
+
+
+class PostalIndex:
+    """tuple เรียงตามรหัสไปรษณีย์ + ดัชนีชื่อเรียงตามตัวอักษร ค้นแบบ prefix ด้วย bisect"""
+
+    __slots__ = ('_codes', '_districts', '_provinces', '_names', '_name_rows', '_province_names',
+                 '_complete_provinces')
+
+    def __init__(self, rows):
+        """rows: (postal_code, district, province, complete)"""
+        strings, incomplete = {}, set()
+        entries = set()
+        for code, district, province, complete in rows:
+            district, province = district.strip(), province.strip()
+            entries.add((code.strip(), strings.setdefault(district, district), strings.setdefault(province, province)))
+            if not complete:
+                incomplete.add(province)
+        entries = sorted(entries)
+        self._codes = tuple(e[0] for e in entries)
+        self._districts = tuple(e[1] for e in entries)
+        self._provinces = tuple(e[2] for e in entries)
+        names = sorted({(name, i) for i, e in enumerate(entries) for name in (e[1], e[2])})
+        self._names = tuple(name for name, _ in names)
+        self._name_rows = tuple(i for _, i in names)
+        self._province_names = frozenset(self._provinces)
+        self._complete_provinces = self._province_names - incomplete
+
+    def __len__(self):
+        return len(self._codes)
+
+    def _row(self, i):
+        return {'postal_code': self._codes[i], 'district': self._districts[i], 'province': self._provinces[i]}
+
+    def _code_range(self, prefix):
+        return range(bisect.bisect_left(self._codes, prefix), bisect.bisect_left(self._codes, prefix + _MAX_CHAR))
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """ค้นด้วยตัวเลขขึ้นต้นของรหัสไปรษณีย์ หรือคำขึ้นต้นของชื่ออำเภอ/เขต/จังหวัด"""
+        query = (query or '').strip()
+        if not query:
+            return []
+        if query.isdigit():
+            rows = self._code_range(query)
+        else:
+            name = clean_district(clean_province(query))
+            lo = bisect.bisect_left(self._names, name)
+            hi = bisect.bisect_left(self._names, name + _MAX_CHAR)
+            rows = (self._name_rows[n] for n in range(lo, hi))
+        results, seen = [], set()
+        for i in rows:
+            if i in seen:
+                continue
+            seen.add(i)
+            results.append(self._row(i))
+            if len(results) >= limit:
+                break
+        return results
+
+    def lookup(self, postal_code):
+        """แถวทั้งหมดของรหัสไปรษณีย์ (ตรงทั้งรหัส)"""
+        return [self._row(i) for i in self._code_range(postal_code) if self._codes[i] == postal_code]
+
+    def provinces_for(self, postal_code):
+        """จังหวัดที่ใช้รหัสนี้ ถ้าไม่มีรหัสในข้อมูลใช้จังหวัดที่มีรหัสขึ้นต้นสองหลักเดียวกัน"""
+        rows = self.lookup(postal_code) or [self._row(i) for i in self._code_range(postal_code[:2])]
+        return list(dict.fromkeys(row['province'] for row in rows))
+
+    def normalize(self, city, province, postal_code):
+        """ตรวจและปรับ (อำเภอ/เขต, จังหวัด, รหัสไปรษณีย์) ให้เป็นชื่อมาตรฐาน ไม่ผ่านโยน AddressError"""
+        postal_code = re.sub(r'\s+', '', postal_code or '')
+        if not _POSTAL_CODE_RE.match(postal_code):
+            raise AddressError('รหัสไปรษณีย์ต้องเป็นตัวเลข 5 หลัก')
+        candidates = self.provinces_for(postal_code)
+        if not candidates:
+            raise AddressError(f'ไม่พบรหัสไปรษณีย์ {postal_code}')
+
+        province = clean_province(province)
+        if not province:
+            if len(candidates) > 1:
+                raise AddressError('กรุณาระบุจังหวัด')
+            province = candidates[0]
+        elif province not in self._province_names:
+            raise AddressError(f'ไม่พบจังหวัด {province}')
+        elif province not in candidates:
+            raise AddressError(f'รหัสไปรษณีย์ {postal_code} ไม่ใช่ของจังหวัด{province}')
+
+        district = clean_district(city, province)
+        if province not in self._complete_provinces:
+            # ข้อมูลมีแค่บางอำเภอของจังหวัดนี้ อำเภออื่นที่ใช้รหัสเดียวกันก็ถูกต้อง จึงไม่ตรวจอำเภอ
+            return district, province, postal_code
+        districts = [row['district'] for row in self.lookup(postal_code) if row['province'] == province]
+        if districts:
+            if not district and len(districts) == 1:
+                district = districts[0]
+            elif district not in districts:
+                raise AddressError(f'รหัสไปรษณีย์ {postal_code} ใช้กับอำเภอ/เขต: {", ".join(districts)}')
+        return district, province, postal_code
+
+
+def load_index(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        reader = csv.DictReader(f)
+        return PostalIndex((row['postal_code'], row['district'], row['province'], row.get('complete', '1').strip() != '0')
+                           for row in reader)
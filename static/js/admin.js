@@ -43,9 +43,10 @@ $(document).ready(function () {
             $('#product_name').val(data.name);
             $('#product_name_en').val(data.name_en);
             $('#product_description').val(data.description);
-            $('#product_price').val(data.price);
+            $('#product_price').val(data.price / 100);  // สตางค์ -> บาท
             $('#product_category').val(data.category_id);
             $('#product_stock').val(data.stock_quantity);
+            $('#product_original_stock').val(data.stock_quantity);
             $('#product_available').prop('checked', data.is_available == 1);
             $('#product_featured').prop('checked', data.is_featured == 1);
 
@@ -196,6 +197,54 @@ $(document).ready(function () {
             });
     });
 
+    // เลือกหลายสินค้าแล้วเปิด/ปิดจำหน่ายหรือแนะนำพร้อมกัน
+    function selectedProductIds() {
+        return $('.product-select:checked').map(function () { return parseInt(this.value); }).get();
+    }
+
+    function updateBulkBar() {
+        const count = selectedProductIds().length;
+        $('#bulk-selected-count').text(count);
+        $('.btn-bulk-flag').prop('disabled', count === 0);
+    }
+
+    $('#select-all-products').change(function () {
+        $('tbody tr:visible .product-select').prop('checked', this.checked);
+        updateBulkBar();
+    });
+    $(document).on('change', '.product-select', updateBulkBar);
+
+    $(document).on('click', '.btn-bulk-flag', function () {
+        const productIds = selectedProductIds();
+        if (!productIds.length) return;
+        const rows = $('.product-select:checked').closest('tr');
+        $('.btn-bulk-flag').prop('disabled', true);
+        rows.addClass('loading-row');
+        $.ajax({
+            url: '/admin/bulk/product_flags',
+            type: 'POST',
+            contentType: 'application/json',
+            data: JSON.stringify({
+                product_ids: productIds,
+                field: $(this).data('field'),
+                value: parseInt($(this).data('value'))
+            })
+        })
+            .done(function (response) {
+                if (response.failed) {
+                    showAdminToast(response.message, 'warning');
+                } else {
+                    showAdminToast(response.message || 'อัปเดตสินค้าเรียบร้อย', 'success');
+                }
+                setTimeout(() => location.reload(), 600);
+            })
+            .fail(function (xhr) {
+                showAdminToast((xhr.responseJSON && xhr.responseJSON.message) || 'เกิดข้อผิดพลาดในการอัปเดต', 'error');
+                rows.removeClass('loading-row');
+                updateBulkBar();
+            });
+    });
+
     // Preview image before upload
     $('#product_image').change(function () {
         const input = this;
@@ -38,13 +38,13 @@ function debounce(func, wait) {
 }
 
 /**
- * Format price in Thai Baht format
+ * Format price in Thai Baht format (ราคาจาก server เป็นสตางค์)
  */
-function formatPrice(price) {
+function formatPrice(satang) {
     return new Intl.NumberFormat('th-TH', {
         minimumFractionDigits: 0,
         maximumFractionDigits: 2
-    }).format(price) + ' บาท';
+    }).format(satang / 100) + ' บาท';
 }
 
 /**
@@ -425,7 +425,7 @@ function updateCartQuantity(cartKey, quantity) {
                 $(`#quantity-${cartKey}`).text(quantity);
                 
                 // Update item total
-                const itemPrice = parseFloat($(`[data-cart-key="${cartKey}"]`).data('price'));
+                const itemPrice = parseInt($(`[data-cart-key="${cartKey}"]`).data('price'));
                 const itemTotal = itemPrice * quantity;
                 $(`#total-${cartKey}`).text(formatPrice(itemTotal));
                 